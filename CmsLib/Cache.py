@@ -0,0 +1,91 @@
+# CmsLib/Cache.py
+import threading
+import time
+from collections import OrderedDict
+
+# @brief Small thread-safe cache whose entries expire after a fixed TTL.
+#        invalidate() bumps a version so a load that started before the
+#        invalidation cannot store its (now stale) value.
+class TtlCache:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.__lock = threading.Lock()
+        self.__entries = {}     # key -> (expires_at, value)
+        self.__version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key, loader):
+        now = time.monotonic()
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            version = self.__version
+
+        value = loader()
+
+        with self.__lock:
+            if version == self.__version:
+                self.__entries[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def invalidate(self, key=None):
+        with self.__lock:
+            self.__version += 1
+            if key is None:
+                self.__entries.clear()
+            else:
+                self.__entries.pop(key, None)
+
+
+# @brief Thread-safe least-recently-used cache with a size limit and an
+#        optional TTL. Same versioned invalidation as TtlCache; loaders that
+#        return None are not cached, so misses are always re-checked.
+class LruCache:
+    def __init__(self, max_size, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.__lock = threading.Lock()
+        self.__entries = OrderedDict()   # key -> (expires_at, value)
+        self.__version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key, loader):
+        now = time.monotonic()
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > now):
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            version = self.__version
+
+        value = loader()
+
+        if value is not None:
+            with self.__lock:
+                if version == self.__version:
+                    expires_at = time.monotonic() + self.ttl if self.ttl else None
+                    self.__entries[key] = (expires_at, value)
+                    self.__entries.move_to_end(key)
+                    while len(self.__entries) > self.max_size:
+                        self.__entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key=None):
+        with self.__lock:
+            self.__version += 1
+            if key is None:
+                self.__entries.clear()
+            else:
+                self.__entries.pop(key, None)
+
+    def stats(self):
+        with self.__lock:
+            return {"size": len(self.__entries), "max_size": self.max_size,
+                    "hits": self.hits, "misses": self.misses, "version": self.__version}
@@ -0,0 +1,47 @@
+# CatalogImporter.py
+# -------------------------------------------------
+# Shree Laxmi Collection
+# Streams a CSV or JSONL catalog file into
+# ProductManager.add_products_bulk
+# -------------------------------------------------
+
+import csv
+import json
+from CmsLib.ProductManager import ProductManager
+
+COLUMNS = ("ProductID", "Name", "Description", "UnitPrice", "Size", "Color", "Discount")
+
+IMPORT_ERRORS = {
+    1: "Duplicate ProductID/Size/Color",
+    2: "Invalid UnitPrice",
+    3: "Invalid discount",
+    4: "Product not allowed",
+    5: "Malformed ProductID, Size, Color, Name or Description",
+    6: "Rejected by the database",
+}
+
+
+def read_catalog(path):
+    """
+    Yields one (ProductID, Name, Description, UnitPrice, Size, Color, Discount)
+    tuple per record. CSV files need a header row with those column names;
+    .jsonl/.json files hold one JSON object per line. Unreadable records
+    are yielded as None so row numbers stay aligned.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as catalog_file:
+        if path.lower().endswith((".jsonl", ".json")):
+            for line in catalog_file:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    yield tuple(record.get(column) for column in COLUMNS)
+                except (ValueError, AttributeError):
+                    yield None
+        else:
+            for record in csv.DictReader(catalog_file):
+                yield tuple(record.get(column) for column in COLUMNS)
+
+
+def import_catalog(pysql, path, chunk_size=1000):
+    return ProductManager.add_products_bulk(pysql, read_catalog(path), chunk_size)
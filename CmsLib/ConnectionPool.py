@@ -0,0 +1,166 @@
+# CmsLib/ConnectionPool.py
+import os
+import threading
+import time
+from collections import deque
+
+# @brief Bounded pool of DB-API connections shared by all request threads.
+#        Connections are checked out per thread and returned when the
+#        request (or script) is done with them.
+#        A forked child starts with an empty pool of its own.
+class ConnectionPool:
+    def __init__(self, connect, min_size=1, max_size=10, idle_timeout=300, checkout_timeout=10):
+        """
+        :param connect: zero-argument callable returning a new DB-API connection
+        :param min_size: connections kept open even when idle
+        :param max_size: hard limit on open connections
+        :param idle_timeout: seconds an idle connection may live above min_size
+        :param checkout_timeout: seconds to wait for a free connection
+        """
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size: min=%s max=%s" % (min_size, max_size))
+        self.__connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+
+        self.__lock = threading.Condition()
+        self.__idle = deque()           # (connection, last_used)
+        self.__size = 0                 # open connections (idle + in use)
+        self.__closed = False
+        self.__pid = os.getpid()
+
+        # Counters for stats()
+        self.__checkouts = 0
+        self.__created = 0
+        self.__evicted = 0
+        self.__waits = 0
+        self.__timeouts = 0
+
+    # ----------------- Internal Helpers -----------------
+    def __check_pid(self):
+        if self.__pid != os.getpid():
+            # Forked child: the idle connections share their sockets with
+            # the parent. Forget them without close(), which would end the
+            # parent's sessions, and start over.
+            self.__lock = threading.Condition()
+            self.__idle = deque()
+            self.__size = 0
+            self.__pid = os.getpid()
+
+    def __open(self):
+        conn = self.__connect()
+        with self.__lock:
+            self.__created += 1
+        return conn
+
+    @staticmethod
+    def __close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def __is_alive(conn):
+        try:
+            conn.ping()
+            return True
+        except Exception:
+            return False
+
+    def __evict_idle(self):
+        # Caller holds the lock. Oldest idle connections sit on the left.
+        now = time.monotonic()
+        expired = []
+        while self.__idle and self.__size > self.min_size:
+            conn, last_used = self.__idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self.__idle.popleft()
+            self.__size -= 1
+            self.__evicted += 1
+            expired.append(conn)
+        return expired
+
+    # ----------------- Checkout / Checkin -----------------
+    def checkout(self):
+        self.__check_pid()
+        deadline = time.monotonic() + self.checkout_timeout
+        with self.__lock:
+            if self.__closed:
+                raise RuntimeError("Connection pool is closed")
+            expired = self.__evict_idle()
+            conn = None
+            while True:
+                if self.__idle:
+                    conn, _ = self.__idle.pop()     # most recently used first
+                    break
+                if self.__size < self.max_size:
+                    self.__size += 1                # reserve the slot
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.__timeouts += 1
+                    raise RuntimeError("Timed out waiting for a database connection "
+                                       "(pool max_size=%d)" % self.max_size)
+                self.__waits += 1
+                self.__lock.wait(remaining)
+            self.__checkouts += 1
+
+        for stale in expired:
+            self.__close_quietly(stale)
+
+        if conn is not None and self.__is_alive(conn):
+            return conn
+        if conn is not None:
+            self.__close_quietly(conn)
+
+        try:
+            return self.__open()
+        except Exception:
+            with self.__lock:
+                self.__size -= 1
+                self.__lock.notify()
+            raise
+
+    def checkin(self, conn, discard=False):
+        self.__check_pid()
+        with self.__lock:
+            if discard or self.__closed:
+                self.__size -= 1
+            else:
+                self.__idle.append((conn, time.monotonic()))
+                conn = None
+            self.__lock.notify()
+        if conn is not None:
+            self.__close_quietly(conn)
+
+    def close(self):
+        self.__check_pid()
+        with self.__lock:
+            self.__closed = True
+            idle = [conn for conn, _ in self.__idle]
+            self.__size -= len(idle)
+            self.__idle.clear()
+            self.__lock.notify_all()
+        for conn in idle:
+            self.__close_quietly(conn)
+
+    # ----------------- Stats -----------------
+    def stats(self):
+        self.__check_pid()
+        with self.__lock:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "open": self.__size,
+                "idle": len(self.__idle),
+                "in_use": self.__size - len(self.__idle),
+                "checkouts": self.__checkouts,
+                "created": self.__created,
+                "evicted": self.__evicted,
+                "waits": self.__waits,
+                "timeouts": self.__timeouts,
+            }
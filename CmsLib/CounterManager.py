@@ -1,7 +1,10 @@
 # CmsLib/CounterManager.py
 import re
+import math
 from CmsLib.InventoryManager import *
 from CmsLib.TokenManager import *
+from CmsLib.ProductManager import *
+from CmsLib.DashboardManager import DashboardManager
 
 class CounterManager:
 
@@ -9,66 +12,121 @@ class CounterManager:
     @staticmethod
     def __add_counter_to_token(pysql, token_id, product_id, quantity, size, color):
 
-        # Fetch name from ProductID for validation
-        sql = "SELECT Name FROM Products WHERE ProductID=%s AND Size=%s AND Color=%s"
-        pysql.run(sql, (product_id, size, color))
-        product_name = pysql.scalar_result
-
-        if not product_name:
+        if math.isfinite(quantity) and quantity > 0:
+            # Deduct from displayed inventory only if the token is assigned and
+            # enough stock is on the counter; the check and the write are one
+            # statement, so two counters cannot both take the last piece
+            sql_stmt = """UPDATE Inventory
+                          JOIN Tokens ON Tokens.TokenID = %s AND Tokens.Assigned = TRUE
+                          SET Inventory.DisplayedQuantity = Inventory.DisplayedQuantity - %s
+                          WHERE Inventory.ProductID=%s AND Inventory.Size=%s AND Inventory.Color=%s
+                            AND Inventory.DisplayedQuantity >= %s"""
+            pysql.run(sql_stmt, (token_id, quantity, product_id, size, color, quantity))
+
+            if pysql.rowcount:
+                pysql.low_stock.touch([(product_id, size, color)], only_if_low=True)
+
+                # Add to TokensSelectProducts
+                sql_stmt = """INSERT INTO TokensSelectProducts
+                              (TokenID, ProductID, Quantity, Size, Color)
+                              VALUES (%s, %s, %s, %s, %s)
+                              ON DUPLICATE KEY UPDATE Quantity = Quantity + VALUES(Quantity)"""
+                pysql.run(sql_stmt, (token_id, product_id, quantity, size, color))
+
+                InventoryManager._InventoryManager__log_transaction(pysql, "COUNTER_SUB", product_id, size, color, quantity)
+                return 0
+
+        # Nothing was deducted: find out why in one round trip
+        sql_stmt = """SELECT
+                        (SELECT COUNT(*) FROM Products
+                         WHERE ProductID=%s AND Size=%s AND Color=%s),
+                        (SELECT Assigned FROM Tokens WHERE TokenID=%s)"""
+        pysql.run(sql_stmt, (product_id, size, color, token_id))
+        product_found, token_assigned = pysql.first_result
+
+        if not product_found:
             return 3  # Product not found
-
-        # Token assigned check
-        token_assigned = TokenManager.is_token_assigned(pysql, token_id)
         if not token_assigned:
             return 1
+        if not math.isfinite(quantity) or quantity <= 0:
+            return 2
+        return 4  # Not enough stock on the counter
 
-        # Check displayed inventory
-        displayed_quantity, _ = InventoryManager.get_displayed_quantity(pysql, product_id, size, color)
-        # Ensure it is a number
-        if isinstance(displayed_quantity, tuple):
-            displayed_quantity = displayed_quantity[0]
-
-        if quantity <= 0:
+    # ------------------- ADD ITEMS TO TOKEN (BATCH) -------------------
+    @staticmethod
+    def __add_items_to_token(pysql, token_id, items):
+        """
+        items = [(ProductID, Size, Color, Quantity)]
+        All items are added or none are; return codes match add_counter_to_token.
+        """
+
+        # Merge repeated scans of the same variant (compared as the database
+        # collation compares keys, so 'Red' and 'red' are one variant)
+        merged = {}
+        for product_id, size, color, quantity in items:
+            if not math.isfinite(quantity) or quantity <= 0:
+                return 2
+            line = merged.setdefault(variant_key(product_id, size, color), [(product_id, size, color), 0])
+            line[1] += quantity
+
+        if not merged:
             return 2
-        if displayed_quantity < quantity:
-            return 4
 
-        # Deduct from displayed inventory
-        sql_stmt = """UPDATE Inventory 
-                      SET DisplayedQuantity = DisplayedQuantity - %s
-                      WHERE ProductID=%s AND Size=%s AND Color=%s"""
-        pysql.run(sql_stmt, (quantity, product_id, size, color))
+        # Lock the token so it cannot be billed or returned mid-burst
+        sql_stmt = "SELECT Assigned FROM Tokens WHERE TokenID=%s FOR UPDATE"
+        pysql.run(sql_stmt, (token_id,))
+        if not pysql.scalar_result:
+            return 1
+
+        # Validate every variant and lock its inventory row in one query;
+        # the rows come back in their stored spelling
+        scanned_keys = [key for key, _ in merged.values()]
+        sql_stmt = """SELECT ProductID, Size, Color, DisplayedQuantity
+                      FROM Inventory
+                      WHERE (ProductID, Size, Color) IN (%s)
+                      FOR UPDATE""" % ", ".join(["(%s, %s, %s)"] * len(scanned_keys))
+        pysql.run(sql_stmt, [value for key in scanned_keys for value in key])
+        displayed = {variant_key(*row[:3]): (tuple(row[:3]), row[3]) for row in pysql.result}
+
+        for collated, (key, _) in merged.items():
+            if collated not in displayed and not ProductManager._ProductManager__product_exists(pysql, *key):
+                return 3  # Product not found
+        for collated, (_, quantity) in merged.items():
+            if collated not in displayed or displayed[collated][1] < quantity:
+                return 4  # Not enough stock on the counter (or no inventory row yet)
+
+        # Stored spelling -> quantity for the writes below
+        merged = {displayed[collated][0]: quantity for collated, (_, quantity) in merged.items()}
+        keys = list(merged)
+
+        # Deduct all variants from displayed inventory in one statement
+        scanned = " UNION ALL ".join(["SELECT %s AS ProductID, %s AS Size, %s AS Color, %s AS Quantity"] * len(keys))
+        sql_stmt = """UPDATE Inventory
+                      JOIN (%s) Scanned ON Inventory.ProductID = Scanned.ProductID
+                                     AND Inventory.Size = Scanned.Size
+                                     AND Inventory.Color = Scanned.Color
+                      SET Inventory.DisplayedQuantity = Inventory.DisplayedQuantity - Scanned.Quantity""" % scanned
+        pysql.run(sql_stmt, [value for key in keys for value in (*key, merged[key])])
+        pysql.low_stock.touch(keys, only_if_low=True)
 
         # Add to TokensSelectProducts
-        sql_stmt = """SELECT 1 FROM TokensSelectProducts 
-                      WHERE TokenID=%s AND ProductID=%s AND Size=%s AND Color=%s"""
-        pysql.run(sql_stmt, (token_id, product_id, size, color))
-        product_present = pysql.scalar_result
-
-        if product_present:
-            sql_stmt = """UPDATE TokensSelectProducts
-                          SET Quantity = Quantity + %s
-                          WHERE TokenID=%s AND ProductID=%s AND Size=%s AND Color=%s"""
-            pysql.run(sql_stmt, (quantity, token_id, product_id, size, color))
-        else:
-            sql_stmt = """INSERT INTO TokensSelectProducts
-                          (TokenID, ProductID, Quantity, Size, Color)
-                          VALUES (%s, %s, %s, %s, %s)"""
-            pysql.run(sql_stmt, (token_id, product_id, quantity, size, color))
-
-        InventoryManager._InventoryManager__log_transaction(pysql, "COUNTER_SUB", product_id, size, color, quantity)
+        sql_stmt = """INSERT INTO TokensSelectProducts
+                      (TokenID, ProductID, Quantity, Size, Color)
+                      VALUES (%s, %s, %s, %s, %s)
+                      ON DUPLICATE KEY UPDATE Quantity = Quantity + VALUES(Quantity)"""
+        pysql.run_many(sql_stmt, [(token_id, product_id, merged[(product_id, size, color)], size, color)
+                                  for product_id, size, color in keys])
+
+        InventoryManager._InventoryManager__log_transactions(
+            pysql, "COUNTER_SUB", [(*key, merged[key]) for key in keys])
         return 0
 
     # ------------------- ADD INVENTORY TO COUNTER -------------------
     @staticmethod
     def __add_inventory_to_counter(pysql, product_id, quantity, size, color):
 
-         # Fetch name from ProductID for validation
-        sql = "SELECT Name FROM Products WHERE ProductID=%s AND Size=%s AND Color=%s"
-        pysql.run(sql, (product_id, size, color))
-        product_name = pysql.scalar_result
-
-        if not product_name:
+        # Validate the variant against the catalog cache
+        if not ProductManager._ProductManager__product_exists(pysql, product_id, size, color):
             return 3 # Product not found
 
         stored_quantity = InventoryManager._InventoryManager__get_stored_quantity(pysql, product_id, size, color)
@@ -76,7 +134,7 @@ class CounterManager:
         if isinstance(stored_quantity, tuple):
             stored_quantity = stored_quantity[0]
 
-        if quantity <= 0:
+        if not math.isfinite(quantity) or quantity <= 0:
             return 2
         if stored_quantity < quantity:
             return 4
@@ -87,6 +145,7 @@ class CounterManager:
                           StoredQuantity = StoredQuantity - %s
                       WHERE ProductID=%s AND Size=%s AND Color=%s"""
         pysql.run(sql_stmt, (quantity, quantity, product_id, size, color))
+        pysql.low_stock.touch([(product_id, size, color)])
 
         InventoryManager._InventoryManager__log_transaction(pysql, "INVENTORY_TO_COUNTER", product_id, size, color, quantity)
         return 0
@@ -95,12 +154,8 @@ class CounterManager:
     @staticmethod
     def __add_token_to_counter(pysql, token_id, product_id, size, color):
 
-        # Get ProductName
-        sql = "SELECT Name FROM Products WHERE ProductID=%s AND Size=%s AND Color=%s"
-        pysql.run(sql, (product_id, size, color))
-        product_name = pysql.scalar_result
-
-        if not product_name:
+        # Validate the variant against the catalog cache
+        if not ProductManager._ProductManager__product_exists(pysql, product_id, size, color):
             return 3 # Product not found
     
       
@@ -126,6 +181,7 @@ class CounterManager:
                       SET DisplayedQuantity = DisplayedQuantity + %s
                       WHERE ProductID=%s AND Size=%s AND Color=%s"""
         pysql.run(sql_stmt, (quantity, product_id, size, color))
+        pysql.low_stock.touch([(product_id, size, color)], only_if_low=True)
 
         InventoryManager._InventoryManager__log_transaction(pysql, "COUNTER_ADD", product_id, size, color, quantity)
         return 0
@@ -133,15 +189,34 @@ class CounterManager:
     # ------------------- PUBLIC METHODS -------------------
     @staticmethod
     def add_counter_to_token(pysql, token_id, product_id, quantity, size, color):
-        return pysql.run_transaction(CounterManager.__add_counter_to_token,
-                                     token_id, product_id, quantity, size, color)
+        retval = pysql.run_transaction(CounterManager.__add_counter_to_token,
+                                       token_id, product_id, quantity, size, color)
+        InventoryManager.refresh_low_stock(pysql)
+        DashboardManager.invalidate(pysql)
+        TokenManager.publish_tokens(pysql, (token_id,))
+        return retval
+
+    @staticmethod
+    def add_items_to_token(pysql, token_id, items):
+        retval = pysql.run_transaction(CounterManager.__add_items_to_token, token_id, items)
+        InventoryManager.refresh_low_stock(pysql)
+        DashboardManager.invalidate(pysql)
+        TokenManager.publish_tokens(pysql, (token_id,))
+        return retval
 
     @staticmethod
     def add_inventory_to_counter(pysql, product_id, quantity, size, color):
-        return pysql.run_transaction(CounterManager.__add_inventory_to_counter,
-                                     product_id, quantity, size, color)
+        retval = pysql.run_transaction(CounterManager.__add_inventory_to_counter,
+                                       product_id, quantity, size, color)
+        InventoryManager.refresh_low_stock(pysql)
+        DashboardManager.invalidate(pysql)
+        return retval
 
     @staticmethod
     def add_token_to_counter(pysql, token_id, product_id, size, color):
-        return pysql.run_transaction(CounterManager.__add_token_to_counter,
-                                     token_id, product_id, size, color)
+        retval = pysql.run_transaction(CounterManager.__add_token_to_counter,
+                                       token_id, product_id, size, color)
+        InventoryManager.refresh_low_stock(pysql)
+        DashboardManager.invalidate(pysql)
+        TokenManager.publish_tokens(pysql, (token_id,))
+        return retval
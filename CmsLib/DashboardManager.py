@@ -0,0 +1,84 @@
+# DashboardManager.py
+# -------------------------------------------------
+# Shree Laxmi Collection
+# Computes the index page cards in one round trip
+# and keeps them in a short-lived cache
+# -------------------------------------------------
+
+from datetime import datetime, date, time, timedelta
+
+
+class DashboardManager:
+
+    # ---------- PRIVATE METHODS ----------
+
+    @staticmethod
+    def __get_dashboard_metrics(pysql, today):
+        day = timedelta(days=1)
+        today_start = datetime.combine(today, time.min)
+        tomorrow_start = today_start + day
+        yesterday_start = today_start - day
+        last_7_days_start = today_start - 7 * day
+        last_month_start = datetime.combine((today.replace(day=1) - day).replace(day=1), time.min)
+
+        sql_stmt = """
+            SELECT inv.TotalInvoices, inv.SalesToday, inv.SalesYesterday,
+                   inv.SalesLast7Days, inv.SalesLastMonth,
+                   ord.Placed, ord.Received, ord.Cancelled,
+                   (SELECT COUNT(*) FROM Products),
+                   (SELECT COUNT(*) FROM Inventory
+                    WHERE StoredQuantity <= StoreThreshold),
+                   (SELECT COUNT(DISTINCT TokenID) FROM TokensSelectProducts),
+                   (SELECT COUNT(*) FROM TokensSelectProducts),
+                   (SELECT COUNT(*) FROM Tokens t
+                    WHERE t.Assigned = TRUE
+                      AND NOT EXISTS (SELECT 1 FROM TokensSelectProducts tsp
+                                      WHERE tsp.TokenID = t.TokenID))
+            FROM (SELECT COUNT(*) AS TotalInvoices,
+                         COALESCE(SUM(InvoiceDate >= %s AND InvoiceDate < %s), 0) AS SalesToday,
+                         COALESCE(SUM(InvoiceDate >= %s AND InvoiceDate < %s), 0) AS SalesYesterday,
+                         COALESCE(SUM(InvoiceDate >= %s), 0) AS SalesLast7Days,
+                         COALESCE(SUM(InvoiceDate >= %s AND InvoiceDate < %s), 0) AS SalesLastMonth
+                  FROM Invoices) inv
+            CROSS JOIN
+                 (SELECT COALESCE(SUM(Delivered = FALSE AND Cancelled = FALSE), 0) AS Placed,
+                         COALESCE(SUM(Delivered = TRUE), 0) AS Received,
+                         COALESCE(SUM(Cancelled = TRUE), 0) AS Cancelled
+                  FROM Orders) ord
+        """
+        pysql.run(sql_stmt, (today_start, tomorrow_start,
+                             yesterday_start, today_start,
+                             last_7_days_start,
+                             last_month_start, tomorrow_start))
+        row = [int(value or 0) for value in pysql.first_result]
+
+        return {
+            "total_invoices": row[0],
+            "sales_data": row[1:5],     # today, yesterday, last 7 days, since last month
+            "total_placed": row[5],
+            "total_received": row[6],
+            "total_cancelled": row[7],
+            "total_products": row[8],
+            "low_stock_count": row[9],
+            "token_assigned_products": row[10],
+            "total_assigned_products": row[11],
+            "empty_tokens": row[12],
+        }
+
+    # ---------- PUBLIC WRAPPERS ----------
+
+    @staticmethod
+    def get_dashboard_metrics(pysql):
+        today = date.today()
+        metrics = pysql.dashboard_cache.get_or_load(
+            today,
+            lambda: pysql.run_transaction(DashboardManager.__get_dashboard_metrics, today, commit=False)
+        )
+        if not pysql.low_stock.stale():
+            # The low-stock index is kept current by every stock move
+            metrics = dict(metrics, low_stock_count=pysql.low_stock.count())
+        return metrics
+
+    @staticmethod
+    def invalidate(pysql):
+        pysql.dashboard_cache.invalidate()
@@ -0,0 +1,13 @@
+# CmsLib/DateRange.py
+from datetime import datetime, time, timedelta
+
+# @brief Turns a calendar day into the half-open range [start, next day)
+#        so queries can compare the raw DATETIME column and use its index
+#        instead of wrapping it in DATE().
+def day_range(day):
+    if isinstance(day, str):
+        day = datetime.strptime(day.strip(), "%Y-%m-%d").date()
+    elif isinstance(day, datetime):
+        day = day.date()
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
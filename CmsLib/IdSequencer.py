@@ -0,0 +1,119 @@
+# CmsLib/IdSequencer.py
+import os
+import threading
+
+# Value handed out first when a sequence has never been used, and the
+# statement that finds the next free value in an existing database.
+SEQUENCES = {
+    "InvoiceID": (0, "SELECT MAX(CAST(SUBSTRING(InvoiceID, 5) AS UNSIGNED)) + 1 FROM Invoices"),
+    "TransactionID": (0, "SELECT MAX(CAST(SUBSTRING(TransactionID, 5) AS UNSIGNED)) + 1 FROM InventoryTransactions"),
+    "OrderID": (1, "SELECT MAX(CAST(SUBSTRING(OrderID, 5) AS UNSIGNED)) + 1 FROM Orders"),
+}
+
+# @brief Hi-lo ID generator backed by the Sequences table.
+#        Each process reserves a block of values with one short,
+#        separately committed UPDATE and then hands them out from memory,
+#        so IDs never collide across workers and need no query per call.
+#        Reservations run on a connection of the sequencer's own, never a
+#        request pool slot: a request thread that needs a new block while
+#        every slot is held would otherwise stall all ID allocation.
+class IdSequencer:
+    def __init__(self, connect, block_size=50):
+        """
+        :param connect: zero-argument callable returning a new connection
+                        (autocommit on MySQL); reopened after an error
+        """
+        self.block_size = block_size
+        self.__connect = connect
+        self.__conn = None
+        self.__lock = threading.Lock()
+        self.__blocks = {}      # name -> [next_value, end_value]
+        self.__pid = os.getpid()
+
+    def __connection(self):
+        if self.__conn is not None:
+            try:
+                self.__conn.ping()
+            except Exception:
+                # Idle past the server's wait_timeout: reconnect
+                self.__drop_connection()
+        if self.__conn is None:
+            self.__conn = self.__connect()
+        return self.__conn
+
+    def __drop_connection(self):
+        conn, self.__conn = self.__conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    # ----------------- Block Reservation -----------------
+    def __reserve_block(self, name, floor, size=None):
+        size = size or self.block_size
+        start, seed_sql = SEQUENCES[name]
+        # The sequencer's own connection keeps the reservation out of the
+        # caller's transaction: a rollback there must not give the block back.
+        # (Where it can, e.g. SQLite savepoints, floor still keeps the new
+        # block above every value this process has handed out.)
+        conn = self.__connection()
+        try:
+            cursor = conn.cursor()
+            try:
+                reserve_stmt = """UPDATE Sequences
+                                  SET NextValue = LAST_INSERT_ID(GREATEST(NextValue, %s) + %s)
+                                  WHERE Name = %s"""
+                cursor.execute(reserve_stmt, (floor, size, name))
+                if cursor.rowcount == 0:
+                    # First use: seed from the IDs already in the table
+                    sql_stmt = ("INSERT IGNORE INTO Sequences (Name, NextValue) "
+                                "SELECT %s, GREATEST(%s, COALESCE((" + seed_sql + "), 0))")
+                    cursor.execute(sql_stmt, (name, start))
+                    cursor.execute(reserve_stmt, (floor, size, name))
+                cursor.execute("SELECT LAST_INSERT_ID()")
+                end_value = int(cursor.fetchall()[0][0])
+                conn.commit()
+            finally:
+                cursor.close()
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            self.__drop_connection()
+            raise RuntimeError(f"Could not reserve {name} block: {e}")
+        return [end_value - size, end_value]
+
+    # ----------------- Public Methods -----------------
+    def __check_pid(self):
+        # Caller holds the lock
+        if self.__pid != os.getpid():
+            # Forked child: blocks reserved by the parent are not ours, and
+            # its connection must not be used (or closed) from here
+            self.__blocks = {}
+            self.__conn = None
+            self.__pid = os.getpid()
+
+    def next_value(self, name):
+        with self.__lock:
+            self.__check_pid()
+            block = self.__blocks.get(name)
+            if block is None or block[0] >= block[1]:
+                floor = block[1] if block else 0
+                block = self.__blocks[name] = self.__reserve_block(name, floor)
+            value = block[0]
+            block[0] += 1
+            return value
+
+    def reserve(self, name, count):
+        """range of `count` consecutive values for bulk loads, never handed out again"""
+        with self.__lock:
+            self.__check_pid()
+            block = self.__reserve_block(name, 0, count)
+            return range(block[0], block[1])
+
+    def close(self):
+        with self.__lock:
+            self.__check_pid()
+            self.__drop_connection()
@@ -4,8 +4,8 @@
 # Handles color & size variants of female clothing
 # -------------------------------------------------
 
-next_transaction_id = None
-next_transaction_id_read = 0
+from CmsLib.DashboardManager import DashboardManager
+from CmsLib.DateRange import day_range
 
 class InventoryManager:
     """
@@ -79,6 +79,7 @@ class InventoryManager:
             WHERE ProductID = %s AND Size = %s AND Color = %s
         """
         pysql.run(sql_stmt, (threshold, product_id, size, color))
+        pysql.low_stock.touch([(product_id, size, color)])
         return 0
 
     @staticmethod
@@ -94,36 +95,51 @@ class InventoryManager:
             WHERE ProductID = %s AND Size = %s AND Color = %s
         """
         pysql.run(sql_stmt, (quantity, product_id, size, color))
+        pysql.low_stock.touch([(product_id, size, color)])
         InventoryManager.__log_transaction(pysql, "INVENTORY_SUB", product_id, size, color, quantity)
         return 0
 
     @staticmethod
     def __log_transaction(pysql, transaction_type, product_id, size, color, quantity):
-        global next_transaction_id, next_transaction_id_read
-
-        if not next_transaction_id_read:
-            sql_stmt = "SELECT COUNT(*) FROM InventoryTransactions"
-            pysql.run(sql_stmt)
-            next_transaction_id = pysql.scalar_result
-            next_transaction_id_read = 1
-
+        """
+        Queues one movement in the transaction log; it is written with the
+        rest of the unit of work at commit. The caller has just updated the
+        variant's Inventory row, so it is not looked up again here.
+        """
         if transaction_type not in ["COUNTER_ADD", "COUNTER_SUB", "INVENTORY_TO_COUNTER", "INVENTORY_ADD", "INVENTORY_SUB"]:
             return 1
+        if quantity <= 0:
+            return 3
+        return InventoryManager.__log_transactions(pysql, transaction_type, [(product_id, size, color, quantity)])
 
-        has_product = InventoryManager._InventoryManager__inventory_has_product(pysql, product_id, size, color)
-        if not has_product:
+    @staticmethod
+    def __log_checked_transaction(pysql, transaction_type, product_id, size, color, quantity):
+        """
+        log_transaction for callers that did not just touch the Inventory row:
+        type (1), variant in inventory (2) and quantity (3) are checked in the
+        same unit of work that queues the row
+        """
+        if transaction_type not in ["COUNTER_ADD", "COUNTER_SUB", "INVENTORY_TO_COUNTER", "INVENTORY_ADD", "INVENTORY_SUB"]:
+            return 1
+        if not InventoryManager.__inventory_has_product(pysql, product_id, size, color):
             return 2
         if quantity <= 0:
             return 3
+        return InventoryManager.__log_transactions(pysql, transaction_type, [(product_id, size, color, quantity)])
 
-        transaction_id = "TRC-" + format(next_transaction_id, "010d")
-        sql_stmt = """
-            INSERT INTO InventoryTransactions
-            (TransactionID, TransactionType, ProductID, Size, Color, Quantity, Timestamp)
-            VALUES (%s, %s, %s, %s, %s, %s, (SELECT CURRENT_TIMESTAMP))
+    @staticmethod
+    def __log_transactions(pysql, transaction_type, items):
+        """
+        Queues several movements of one type for the commit-time executemany.
+        items = [(ProductID, Size, Color, Quantity)], already validated by the caller
         """
-        pysql.run(sql_stmt, (transaction_id, transaction_type, product_id, size, color, quantity))
-        next_transaction_id += 1
+        if transaction_type not in ["COUNTER_ADD", "COUNTER_SUB", "INVENTORY_TO_COUNTER", "INVENTORY_ADD", "INVENTORY_SUB"]:
+            return 1
+
+        pysql.transaction_log.append(
+            [("TRC-" + format(pysql.sequencer.next_value("TransactionID"), "010d"),
+              transaction_type, product_id, size, color, quantity)
+             for product_id, size, color, quantity in items])
         return 0
 
     @staticmethod
@@ -165,6 +181,39 @@ class InventoryManager:
         """
         pysql.run(sql_stmt)
         return pysql.result
+
+    @staticmethod
+    def __get_transactions_page(pysql, after_transaction_id, page_size):
+        """
+        Keyset page of the transaction log: the next page_size rows
+        with TransactionID > after_transaction_id (None for the first page)
+        """
+        sql_stmt = """
+            SELECT
+              InventoryTransactions.TransactionID, 
+              InventoryTransactions.ProductID, 
+              Products.Name, 
+              InventoryTransactions.Size, 
+              InventoryTransactions.Color, 
+              InventoryTransactions.TransactionType, 
+              InventoryTransactions.Quantity, 
+              Products.UnitType, 
+              InventoryTransactions.Timestamp
+            FROM InventoryTransactions
+            JOIN Products ON InventoryTransactions.ProductID = Products.ProductID
+                        AND InventoryTransactions.Size = Products.Size
+                        AND InventoryTransactions.Color = Products.Color
+            {where}
+            ORDER BY InventoryTransactions.TransactionID
+            LIMIT %s
+        """
+        if after_transaction_id is None:
+            pysql.run(sql_stmt.format(where=""), (page_size,))
+        else:
+            pysql.run(sql_stmt.format(where="WHERE InventoryTransactions.TransactionID > %s"),
+                      (after_transaction_id, page_size))
+        return pysql.result
+
     @staticmethod
     def __get_low_stock_notifications(pysql):
         
@@ -175,6 +224,7 @@ class InventoryManager:
                Inventory.Size,
                Inventory.Color,
                Inventory.StoredQuantity,
+               Inventory.DisplayedQuantity,
                Inventory.StoreThreshold
             FROM Inventory
             JOIN Products ON Inventory.ProductID = Products.ProductID
@@ -186,9 +236,38 @@ class InventoryManager:
         pysql.run(sql_stmt)
         return pysql.result
 
+    @staticmethod
+    def __get_inventory_rows(pysql, keys):
+        """
+        Current inventory rows (same columns as __get_low_stock_notifications)
+        of the given (ProductID, Size, Color) variants
+        """
+        rows = []
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            sql_stmt = """
+                SELECT
+                   Inventory.ProductID,
+                   Products.Name,
+                   Inventory.Size,
+                   Inventory.Color,
+                   Inventory.StoredQuantity,
+                   Inventory.DisplayedQuantity,
+                   Inventory.StoreThreshold
+                FROM Inventory
+                JOIN Products ON Inventory.ProductID = Products.ProductID
+                              AND Inventory.Size = Products.Size
+                              AND Inventory.Color = Products.Color
+                WHERE (Inventory.ProductID, Inventory.Size, Inventory.Color) IN (%s)
+            """ % ", ".join(["(%s, %s, %s)"] * len(chunk))
+            pysql.run(sql_stmt, [value for key in chunk for value in key])
+            rows.extend(pysql.result or ())
+        return rows
+
 
     @staticmethod
     def __get_transactions_by_date(pysql, date):
+        start, end = day_range(date)
         sql_stmt = """
             SELECT
               InventoryTransactions.TransactionID, 
@@ -204,13 +283,40 @@ class InventoryManager:
             JOIN Products ON InventoryTransactions.ProductID = Products.ProductID
                         AND InventoryTransactions.Size = Products.Size
                         AND InventoryTransactions.Color = Products.Color
-            WHERE DATE(InventoryTransactions.Timestamp) = %s
+            WHERE InventoryTransactions.Timestamp >= %s AND InventoryTransactions.Timestamp < %s
         """
-        pysql.run(sql_stmt, (date,))
+        pysql.run(sql_stmt, (start, end))
+        return pysql.result
+
+    @staticmethod
+    def __get_transactions_between(pysql, start, end):
+        """
+        Transactions with start <= Timestamp < end
+        """
+        sql_stmt = """
+            SELECT
+              InventoryTransactions.TransactionID, 
+              InventoryTransactions.ProductID, 
+              Products.Name, 
+              InventoryTransactions.Size, 
+              InventoryTransactions.Color, 
+              InventoryTransactions.TransactionType, 
+              InventoryTransactions.Quantity, 
+              Products.UnitType, 
+              InventoryTransactions.Timestamp
+            FROM InventoryTransactions
+            JOIN Products ON InventoryTransactions.ProductID = Products.ProductID
+                        AND InventoryTransactions.Size = Products.Size
+                        AND InventoryTransactions.Color = Products.Color
+            WHERE InventoryTransactions.Timestamp >= %s AND InventoryTransactions.Timestamp < %s
+            ORDER BY InventoryTransactions.Timestamp
+        """
+        pysql.run(sql_stmt, (start, end))
         return pysql.result
 
     @staticmethod
     def __get_transactions_of_product_by_date(pysql, product_id, size, color, date):
+        start, end = day_range(date)
         sql_stmt = """
             SELECT 
               InventoryTransactions.TransactionID, 
@@ -222,9 +328,33 @@ class InventoryManager:
             JOIN Products ON InventoryTransactions.ProductID = Products.ProductID
                         AND InventoryTransactions.Size = Products.Size
                         AND InventoryTransactions.Color = Products.Color
-            WHERE InventoryTransactions.ProductID = %s AND InventoryTransactions.Size = %s AND InventoryTransactions.Color = %s AND DATE(InventoryTransactions.Timestamp) = %s
+            WHERE InventoryTransactions.ProductID = %s AND InventoryTransactions.Size = %s AND InventoryTransactions.Color = %s
+              AND InventoryTransactions.Timestamp >= %s AND InventoryTransactions.Timestamp < %s
         """
-        pysql.run(sql_stmt, (product_id, size, color, date))
+        pysql.run(sql_stmt, (product_id, size, color, start, end))
+        return pysql.result
+
+    @staticmethod
+    def __get_transactions_of_product_between(pysql, product_id, size, color, start, end):
+        """
+        Transactions of one variant with start <= Timestamp < end
+        """
+        sql_stmt = """
+            SELECT 
+              InventoryTransactions.TransactionID, 
+              InventoryTransactions.TransactionType, 
+              InventoryTransactions.Quantity, 
+              Products.UnitType, 
+              InventoryTransactions.Timestamp
+            FROM InventoryTransactions
+            JOIN Products ON InventoryTransactions.ProductID = Products.ProductID
+                        AND InventoryTransactions.Size = Products.Size
+                        AND InventoryTransactions.Color = Products.Color
+            WHERE InventoryTransactions.ProductID = %s AND InventoryTransactions.Size = %s AND InventoryTransactions.Color = %s
+              AND InventoryTransactions.Timestamp >= %s AND InventoryTransactions.Timestamp < %s
+            ORDER BY InventoryTransactions.Timestamp
+        """
+        pysql.run(sql_stmt, (product_id, size, color, start, end))
         return pysql.result
 
     # ---------- PUBLIC WRAPPERS ---------- 
@@ -247,15 +377,22 @@ class InventoryManager:
 
     @staticmethod
     def update_threshold(pysql, product_id, size, color, threshold):
-        return pysql.run_transaction(InventoryManager.__update_threshold, product_id, size, color, threshold)
+        retval = pysql.run_transaction(InventoryManager.__update_threshold, product_id, size, color, threshold)
+        InventoryManager.refresh_low_stock(pysql)
+        DashboardManager.invalidate(pysql)
+        return retval
 
     @staticmethod
     def sub_product_from_inventory(pysql, product_id, size, color, quantity):
-        return pysql.run_transaction(InventoryManager.__sub_product_from_inventory, product_id, size, color, quantity)
+        retval = pysql.run_transaction(InventoryManager.__sub_product_from_inventory, product_id, size, color, quantity)
+        InventoryManager.refresh_low_stock(pysql)
+        DashboardManager.invalidate(pysql)
+        return retval
 
     @staticmethod
     def log_transaction(pysql, transaction_type, product_id, size, color, quantity):
-        return pysql.run_transaction(InventoryManager.__log_transaction, transaction_type, product_id, size, color, quantity, commit=False)
+        return pysql.run_transaction(InventoryManager.__log_checked_transaction,
+                                     transaction_type, product_id, size, color, quantity)
 
     @staticmethod
     def get_inventory_details(pysql):
@@ -265,6 +402,26 @@ class InventoryManager:
     def get_transactions(pysql):
         return pysql.run_transaction(InventoryManager.__get_transactions, commit=False)
 
+    @staticmethod
+    def get_transactions_page(pysql, after_transaction_id=None, page_size=500):
+        return pysql.run_transaction(InventoryManager.__get_transactions_page, after_transaction_id, page_size, commit=False)
+
+    @staticmethod
+    def iter_transactions(pysql, page_size=500):
+        """
+        Yields the whole transaction log one keyset page at a time,
+        so memory stays bounded by page_size
+        """
+        after_transaction_id = None
+        while True:
+            page = InventoryManager.get_transactions_page(pysql, after_transaction_id, page_size)
+            if not page:
+                return
+            yield from page
+            if len(page) < page_size:
+                return
+            after_transaction_id = page[-1][0]
+
     @staticmethod
     def get_transactions_by_date(pysql, date):
         return pysql.run_transaction(InventoryManager.__get_transactions_by_date, date, commit=False)
@@ -272,7 +429,35 @@ class InventoryManager:
     @staticmethod
     def get_transactions_of_product_by_date(pysql, product_id, size, color, date):
         return pysql.run_transaction(InventoryManager.__get_transactions_of_product_by_date, product_id, size, color, date, commit=False)
+
+    @staticmethod
+    def get_transactions_between(pysql, start, end):
+        return pysql.run_transaction(InventoryManager.__get_transactions_between, start, end, commit=False)
+
+    @staticmethod
+    def get_transactions_of_product_between(pysql, product_id, size, color, start, end):
+        return pysql.run_transaction(InventoryManager.__get_transactions_of_product_between, product_id, size, color, start, end, commit=False)
     
     @staticmethod
     def get_low_stock_notifications(pysql):
-        return pysql.run_transaction(InventoryManager.__get_low_stock_notifications, commit=False)
+        """
+        Variants at or below their StoreThreshold, lowest stock first, from
+        the in-memory low-stock index (reloaded every low_stock_resync seconds)
+        """
+        if pysql.low_stock.stale():
+            pysql.low_stock.load(pysql.run_transaction(InventoryManager.__get_low_stock_notifications, commit=False))
+        return pysql.low_stock.rows()
+
+    @staticmethod
+    def get_low_stock_count(pysql):
+        if pysql.low_stock.stale():
+            InventoryManager.get_low_stock_notifications(pysql)
+        return pysql.low_stock.count()
+
+    @staticmethod
+    def refresh_low_stock(pysql):
+        """Re-reads the variants this thread changed and updates the low-stock index"""
+        keys = pysql.low_stock.take_touched()
+        if keys and pysql.low_stock.loaded:
+            rows = pysql.run_transaction(InventoryManager.__get_inventory_rows, keys, commit=False)
+            pysql.low_stock.update(keys, rows)
@@ -1,87 +1,82 @@
 # CmsLib/InvoiceManager.py
 from CmsLib.TokenManager import *
-from decimal import Decimal, ROUND_HALF_UP
-# Global invoice counters
-next_invoice_id = None
-next_invoice_id_read = 0
+from decimal import Decimal
+from CmsLib import Money
+from CmsLib.DashboardManager import DashboardManager
+from CmsLib.DateRange import day_range
 
 class InvoiceManager:
 
     # ------------------- GENERATE INVOICE -------------------
     @staticmethod
     def __generate_invoice(pysql, token_ids, payment_mode):
-        global next_invoice_id, next_invoice_id_read
-
-        # Initialize next_invoice_id
-        if not next_invoice_id_read:
-            sql_stmt = "SELECT COUNT(*) FROM Invoices"
-            pysql.run(sql_stmt)
-            next_invoice_id = pysql.scalar_result
-            next_invoice_id_read = 1
-
-        invoice_has_products = False
-        invoice_total_with_vat= Decimal('0.00')
-        total_discount_all_products = Decimal('0.00')
-
-        # Validate tokens and calculate invoice total
-        for token in token_ids:
-            if not TokenManager._TokenManager__is_token_assigned(pysql, token):
-                return 1  # Token not assigned
-
-            token_has_products = TokenManager._TokenManager__token_has_products(pysql, token)
-
-            invoice_has_products = invoice_has_products or token_has_products
-
-        if not invoice_has_products:
+        token_ids = tuple(dict.fromkeys(token_ids))    # drop repeats, keep order
+        if not token_ids:
             return 2  # No products to bill
 
-        if payment_mode not in ["cash", "card", "wallet"]:
-            return 3  # Invalid payment mode
-
-        # Generate invoice ID
-        invoice_id = "INV-" + format(next_invoice_id, "010d")
-
-        # Fetch product details (with Size & Color)
+        # Lock the selected tokens: a second bill desk picking any of them
+        # waits here until this invoice commits, then sees them released
+        sql_stmt = "SELECT TokenID, Assigned FROM Tokens WHERE TokenID IN %s FOR UPDATE"
+        pysql.run(sql_stmt, (token_ids,))
+        assigned = {row[0]: row[1] for row in pysql.result}
+        if any(not assigned.get(token) for token in token_ids):
+            return 1  # Token not assigned
+
+        # Lock and fetch every product line of those tokens with its price.
+        # Only the token lines are locked (MySQL 8 FOR UPDATE OF): the product
+        # rows are just read, so desks billing the same popular product
+        # neither queue on nor deadlock over them
         sql_stmt = """
             SELECT p.ProductID, p.Name, p.Size, p.Color,
-                   SUM(tsp.Quantity) AS Quantity, p.UnitPrice, p.CurrentDiscount
+                   tsp.Quantity, p.UnitPrice, p.CurrentDiscount
             FROM TokensSelectProducts tsp
             JOIN Products p ON p.ProductID = tsp.ProductID
               AND p.Size = tsp.Size
               AND p.Color = tsp.Color
             WHERE tsp.TokenID IN %s
-            GROUP BY p.ProductID, p.Name, p.Size, p.Color, p.UnitPrice, p.CurrentDiscount
+            FOR UPDATE OF tsp
         """
-        pysql.run(sql_stmt, (tuple(token_ids),))
-        invoice_details = pysql.result
+        pysql.run(sql_stmt, (token_ids,))
+        token_lines = pysql.result
 
-        invoice_details_with_tax = []
-        for row in invoice_details:
-            product_id, name, size, color, quantity, unit_price, discount = row
-           
-            # Ensure all are Decimal
-            quantity = Decimal(quantity)
-            unit_price = Decimal(unit_price)
-            discount = Decimal(discount)
+        if not token_lines:
+            return 2  # No products to bill
+
+        if payment_mode not in ["cash", "card", "wallet"]:
+            return 3  # Invalid payment mode
 
-            # Discount amount
-            discount_amount = (quantity * unit_price * (discount / Decimal('100'))).quantize(Decimal('0.01'), rounding= ROUND_HALF_UP)
+        # Combine the same variant picked on several tokens
+        grouped = {}
+        for product_id, name, size, color, quantity, unit_price, discount in token_lines:
+            key = (product_id, name, size, color, unit_price, discount)
+            grouped[key] = grouped.get(key, 0) + quantity
+        invoice_details = [(product_id, name, size, color, quantity, unit_price, discount)
+                           for (product_id, name, size, color, unit_price, discount), quantity in grouped.items()]
 
-            # Price after discount
-            price_after_discount = (quantity * unit_price - discount_amount).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        # Generate invoice ID
+        invoice_id = "INV-" + format(pysql.sequencer.next_value("InvoiceID"), "010d")
+
+        # Price all lines in integer paisa (same ROUND_HALF_UP results as Decimal)
+        priced_lines = Money.price_lines((quantity, unit_price, discount)
+                                         for _, _, _, _, quantity, unit_price, discount in invoice_details)
 
-            # Calculate VAT 13%
-            tax_amount = (price_after_discount * Decimal('0.13')).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        invoice_details_with_tax = []
+        invoice_total_paisa = 0
+        total_discount_paisa = 0
+        for row, (discount_paisa, net_paisa, tax_paisa) in zip(invoice_details, priced_lines):
+            product_id, name, size, color, quantity, unit_price, discount = row
 
             # Add VAT to invoice total
-            invoice_total_with_vat += price_after_discount + tax_amount
+            invoice_total_paisa += net_paisa + tax_paisa
+            total_discount_paisa += discount_paisa
 
-            total_discount_all_products += discount_amount
-        
             # Append data with tax_amount
-            invoice_details_with_tax.append((product_id, name, size, color, quantity, unit_price, tax_amount, discount
-        ))
-        
+            invoice_details_with_tax.append((product_id, name, size, color, Decimal(quantity), Decimal(unit_price),
+                                             Money.from_paisa(tax_paisa), Decimal(discount)))
+
+        invoice_total_with_vat = Money.from_paisa(invoice_total_paisa)
+        total_discount_all_products = Money.from_paisa(total_discount_paisa)
+
         # Create invoice record with VAT-inclusive total
         sql_stmt = """
             INSERT INTO Invoices(InvoiceID, InvoiceDate, InvoiceTotal, DiscountGiven, PaymentMode)
@@ -90,10 +85,8 @@ class InvoiceManager:
         pysql.run(sql_stmt, (invoice_id, invoice_total_with_vat, total_discount_all_products, payment_mode))
 
         # Link tokens to invoice
-        token_tuples = [(token,) for token in token_ids]
-        sql_stmt = "UPDATE Tokens SET InvoiceID = %s, Assigned = FALSE WHERE TokenID = %s"
-        pysql.run_many(sql_stmt, [(invoice_id, t[0]) for t in token_tuples])
-
+        sql_stmt = "UPDATE Tokens SET InvoiceID = %s, Assigned = FALSE WHERE TokenID IN %s"
+        pysql.run(sql_stmt, (invoice_id, token_ids))
 
         # Insert into ProductsInInvoices
         sql_stmt = """
@@ -105,10 +98,9 @@ class InvoiceManager:
         pysql.run_many(sql_stmt, [(invoice_id, *row) for row in invoice_details_with_tax])
 
         # Clear TokensSelectProducts
-        sql_stmt = "DELETE FROM TokensSelectProducts WHERE TokenID = %s"
-        pysql.run_many(sql_stmt, token_tuples)
+        sql_stmt = "DELETE FROM TokensSelectProducts WHERE TokenID IN %s"
+        pysql.run(sql_stmt, (token_ids,))
 
-        next_invoice_id += 1
         return invoice_id
 
     # ------------------- ADDITIONAL DISCOUNT -------------------
@@ -145,18 +137,67 @@ class InvoiceManager:
     # ------------------- GET INVOICES BY DATE -------------------
     @staticmethod
     def __get_invoices_by_date(pysql, date):
+        start, end = day_range(date)
         sql_stmt = """
             SELECT InvoiceID, TIME(InvoiceDate), InvoiceTotal, DiscountGiven, PaymentMode
             FROM Invoices
-            WHERE DATE(InvoiceDate) = %s
+            WHERE InvoiceDate >= %s AND InvoiceDate < %s
+        """
+        pysql.run(sql_stmt, (start, end))
+        return pysql.result
+
+    # ------------------- GET INVOICES BETWEEN -------------------
+    @staticmethod
+    def __get_invoices_between(pysql, start, end):
+        """
+        Invoices with start <= InvoiceDate < end
+        """
+        sql_stmt = """
+            SELECT InvoiceID, InvoiceDate, InvoiceTotal, DiscountGiven, PaymentMode
+            FROM Invoices
+            WHERE InvoiceDate >= %s AND InvoiceDate < %s
+            ORDER BY InvoiceDate
+        """
+        pysql.run(sql_stmt, (start, end))
+        return pysql.result
+
+    # ------------------- INVOICE LINES PAGE -------------------
+    @staticmethod
+    def __get_invoice_lines_page(pysql, before_invoice_id, page_size):
+        """
+        Keyset page of invoice lines, newest invoice first: all lines of the
+        next page_size invoices with InvoiceID < before_invoice_id
+        (None for the first page). An invoice without lines gives one row
+        with NULL line columns, so the last row is always the page's oldest
+        invoice and the next page can start after it.
+        """
+        sql_stmt = """
+            SELECT i.InvoiceID, p.ProductID, p.Name, p.Size, p.Color,
+                   p.Quantity, p.UnitPrice, i.InvoiceTotal
+            FROM (SELECT InvoiceID, InvoiceTotal
+                  FROM Invoices
+                  {where}
+                  ORDER BY InvoiceID DESC
+                  LIMIT %s) i
+            LEFT JOIN ProductsInInvoices p ON p.InvoiceID = i.InvoiceID
+            ORDER BY i.InvoiceID DESC, p.ProductID, p.Size, p.Color
         """
-        pysql.run(sql_stmt, (date,))
+        if before_invoice_id is None:
+            pysql.run(sql_stmt.format(where=""), (page_size,))
+        else:
+            pysql.run(sql_stmt.format(where="WHERE InvoiceID < %s"), (before_invoice_id, page_size))
         return pysql.result
 
     # ------------------- PUBLIC WRAPPERS -------------------
     @staticmethod
     def generate_invoice(pysql, token_ids, payment_mode):
-        return pysql.run_transaction(InvoiceManager.__generate_invoice, token_ids, payment_mode)
+        retval = pysql.run_transaction(InvoiceManager.__generate_invoice, token_ids, payment_mode)
+        if retval not in (1, 2, 3):
+            # Billed tokens are free again
+            pysql.token_pool.fill(dict.fromkeys(token_ids))
+        DashboardManager.invalidate(pysql)
+        TokenManager.publish_tokens(pysql, token_ids)
+        return retval
 
     @staticmethod
     def give_additional_discount(pysql, invoice_id, discount):
@@ -169,3 +210,29 @@ class InvoiceManager:
     @staticmethod
     def get_invoices_by_date(pysql, date):
         return pysql.run_transaction(InvoiceManager.__get_invoices_by_date, date, commit=False)
+
+    @staticmethod
+    def get_invoice_lines_page(pysql, before_invoice_id=None, page_size=200):
+        page = pysql.run_transaction(InvoiceManager.__get_invoice_lines_page, before_invoice_id, page_size, commit=False)
+        return [row for row in page if row[1] is not None]
+
+    @staticmethod
+    def iter_invoice_lines(pysql, page_size=200):
+        """
+        Yields every invoice line, newest invoice first, one keyset page
+        of page_size invoices at a time
+        """
+        before_invoice_id = None
+        while True:
+            page = pysql.run_transaction(InvoiceManager.__get_invoice_lines_page, before_invoice_id, page_size,
+                                         commit=False)
+            if not page:
+                return
+            yield from (row for row in page if row[1] is not None)
+            # Advance on the invoice key: a page of invoices without lines
+            # is not the end
+            before_invoice_id = page[-1][0]
+
+    @staticmethod
+    def get_invoices_between(pysql, start, end):
+        return pysql.run_transaction(InvoiceManager.__get_invoices_between, start, end, commit=False)
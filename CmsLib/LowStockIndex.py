@@ -0,0 +1,94 @@
+# CmsLib/LowStockIndex.py
+import threading
+import time
+
+# @brief The inventory rows at or below StoreThreshold, kept in memory.
+#        Writers touch() the variants they change; after commit the
+#        manager re-reads just those rows and update() moves them in or
+#        out of the set. Touches of a transaction that rolls back are
+#        discarded with it. A full reload every `resync` seconds picks up
+#        changes made by other worker processes, so their stock moves show
+#        up here at most that late.
+class LowStockIndex:
+    def __init__(self, resync=60):
+        self.resync = resync
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.__rows = None      # (ProductID, Size, Color) -> row
+        self.__loaded_at = 0.0
+
+    # ----------------- Rows -----------------
+    # row = (ProductID, Name, Size, Color, StoredQuantity, DisplayedQuantity, StoreThreshold)
+    @staticmethod
+    def key(row):
+        return (row[0], row[2], row[3])
+
+    @staticmethod
+    def is_low(row):
+        return row[4] <= row[6]
+
+    # ----------------- Loading -----------------
+    @property
+    def loaded(self):
+        return self.__rows is not None
+
+    def stale(self):
+        with self.__lock:
+            return self.__rows is None or time.monotonic() - self.__loaded_at >= self.resync
+
+    def load(self, rows):
+        low_rows = {self.key(row): row for row in rows if self.is_low(row)}
+        with self.__lock:
+            self.__rows = low_rows
+            self.__loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self.__lock:
+            self.__rows = None
+
+    # ----------------- Changes -----------------
+    def touch(self, keys, only_if_low=False):
+        """
+        Marks (ProductID, Size, Color) variants changed by this thread.
+        only_if_low: the change cannot move the variant into the set
+        (e.g. DisplayedQuantity only), so skip it unless it is already in
+        """
+        if self.__rows is None:
+            return
+        touched = getattr(self.__local, "touched", None)
+        if touched is None:
+            touched = self.__local.touched = set()
+        for key in keys:
+            if not only_if_low or key in self.__rows:
+                touched.add(key)
+
+    def discard(self):
+        """Drops this thread's touches (their transaction rolled back)"""
+        self.__local.touched = None
+
+    def take_touched(self):
+        touched = getattr(self.__local, "touched", None)
+        self.__local.touched = None
+        return list(touched or ())
+
+    def update(self, keys, rows):
+        """rows: the current state of keys; a missing key was deleted"""
+        current = {self.key(row): row for row in rows}
+        with self.__lock:
+            if self.__rows is None:
+                return
+            for key in keys:
+                row = current.get(key)
+                if row is not None and self.is_low(row):
+                    self.__rows[key] = row
+                else:
+                    self.__rows.pop(key, None)
+
+    # ----------------- Readers -----------------
+    def rows(self):
+        with self.__lock:
+            return sorted((self.__rows or {}).values(), key=lambda row: row[4])
+
+    def count(self):
+        with self.__lock:
+            return len(self.__rows or ())
@@ -0,0 +1,119 @@
+# CmsLib/Money.py
+# -------------------------------------------------
+# Integer money engine for invoice pricing
+# Amounts are whole paisa; quantities and prices are
+# thousandths (NUMERIC(9,3)), discounts hundredths of
+# a percent (NUMERIC(4,2)). Rounding is ROUND_HALF_UP,
+# exactly as the Decimal code it replaces.
+# -------------------------------------------------
+
+from decimal import Decimal, ROUND_HALF_UP
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+VAT_RATE_BP = 1300          # 13 % in basis points
+
+QUANTITY_PLACES = 3
+PRICE_PLACES = 3
+DISCOUNT_PLACES = 2
+
+# Largest intermediate product NumPy may compute in int64 (with headroom for 2*n)
+_INT64_SAFE = 2 ** 61
+
+
+# ---------- CONVERSIONS ----------
+
+def to_minor(value, places):
+    """Exact integer count of 10**-places units; ValueError if value has more places"""
+    if isinstance(value, int):
+        return value * 10 ** places
+    scaled = (value if isinstance(value, Decimal) else Decimal(value)).scaleb(places)
+    minor = int(scaled)
+    if minor != scaled:
+        raise ValueError(f"{value} has more than {places} decimal places")
+    return minor
+
+
+def from_paisa(paisa):
+    """Decimal rupees with two places, e.g. 12345 -> Decimal('123.45')"""
+    return Decimal(paisa).scaleb(-2)
+
+
+def div_half_up(numerator, denominator):
+    """Integer division rounding halves away from zero (denominator > 0)"""
+    if numerator >= 0:
+        return (2 * numerator + denominator) // (2 * denominator)
+    return -((-2 * numerator + denominator) // (2 * denominator))
+
+
+# ---------- PRICING ----------
+
+def price_line_decimal(quantity, unit_price, discount, vat_bp=VAT_RATE_BP):
+    """
+    Reference Decimal implementation (the original InvoiceManager code).
+    Returns (discount_amount, price_after_discount, tax_amount) as Decimal.
+    """
+    quantity = Decimal(quantity)
+    unit_price = Decimal(unit_price)
+    discount = Decimal(discount)
+    cent = Decimal('0.01')
+    discount_amount = (quantity * unit_price * (discount / Decimal('100'))).quantize(cent, rounding=ROUND_HALF_UP)
+    price_after_discount = (quantity * unit_price - discount_amount).quantize(cent, rounding=ROUND_HALF_UP)
+    tax_amount = (price_after_discount * Decimal(vat_bp).scaleb(-4)).quantize(cent, rounding=ROUND_HALF_UP)
+    return discount_amount, price_after_discount, tax_amount
+
+
+def price_line(quantity, unit_price, discount, vat_bp=VAT_RATE_BP):
+    """
+    Returns (discount_paisa, price_after_discount_paisa, tax_paisa) for one line
+    """
+    try:
+        q = to_minor(quantity, QUANTITY_PLACES)
+        p = to_minor(unit_price, PRICE_PLACES)
+        d = to_minor(discount, DISCOUNT_PLACES)
+    except ValueError:
+        # Inputs finer than the column scale (e.g. raw floats): use Decimal
+        return tuple(to_minor(amount, 2) for amount in price_line_decimal(quantity, unit_price, discount, vat_bp))
+
+    gross = q * p                                           # 10**-6 rupees
+    discount_paisa = div_half_up(gross * d, 10 ** 8)
+    net_paisa = div_half_up(gross - discount_paisa * 10 ** 4, 10 ** 4)
+    tax_paisa = div_half_up(net_paisa * vat_bp, 10 ** 4)
+    return discount_paisa, net_paisa, tax_paisa
+
+
+def _div_half_up_array(numerator, denominator):
+    up = (2 * numerator + denominator) // (2 * denominator)
+    down = -((-2 * numerator + denominator) // (2 * denominator))
+    return numpy.where(numerator >= 0, up, down)
+
+
+def price_lines(lines, vat_bp=VAT_RATE_BP):
+    """
+    Prices many (quantity, unit_price, discount) lines at once.
+    Uses NumPy int64 arrays when NumPy is installed and the values are small
+    enough to stay exact, plain Python integers otherwise.
+    """
+    lines = list(lines)
+    if numpy is None or len(lines) < 64:
+        return [price_line(*line, vat_bp=vat_bp) for line in lines]
+
+    try:
+        q = [to_minor(line[0], QUANTITY_PLACES) for line in lines]
+        p = [to_minor(line[1], PRICE_PLACES) for line in lines]
+        d = [to_minor(line[2], DISCOUNT_PLACES) for line in lines]
+    except ValueError:
+        return [price_line(*line, vat_bp=vat_bp) for line in lines]
+
+    if max(map(abs, q)) * max(map(abs, p)) * max(max(map(abs, d)), vat_bp, 1) >= _INT64_SAFE:
+        return [price_line(*line, vat_bp=vat_bp) for line in lines]
+
+    gross = numpy.array(q, dtype=numpy.int64) * numpy.array(p, dtype=numpy.int64)
+    discount_paisa = _div_half_up_array(gross * numpy.array(d, dtype=numpy.int64), 10 ** 8)
+    net_paisa = _div_half_up_array(gross - discount_paisa * 10 ** 4, 10 ** 4)
+    tax_paisa = _div_half_up_array(net_paisa * vat_bp, 10 ** 4)
+    return list(zip(discount_paisa.tolist(), net_paisa.tolist(), tax_paisa.tolist()))
+
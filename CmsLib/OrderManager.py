@@ -4,48 +4,24 @@
 # Handles Supplier Orders and Inventory Updates
 # -------------------------------------------------
 
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
+from itertools import islice
 from CmsLib.InventoryManager import *
 from CmsLib.ProductManager import *
-
-# Auto-increment cache
-next_order_id = None
-next_order_id_read = False
+from CmsLib.DashboardManager import DashboardManager
 
 
 class OrderManager:
 
     # ---------- PRIVATE METHODS ----------
 
-    @staticmethod
-    def __load_next_order_id(pysql):
-        """Reads MAX OrderID and sets the next number."""
-        global next_order_id, next_order_id_read
-
-        pysql.run("SELECT OrderID FROM Orders ORDER BY OrderID DESC LIMIT 1")
-        last_id = pysql.scalar_result
-
-        if last_id:
-            num = int(last_id.replace("ORD-", ""))
-            next_order_id = num + 1
-        else:
-            next_order_id = 1  # First order
-
-        next_order_id_read = True
-
     @staticmethod
     def __place_order(pysql, items):
         """
         items = [(ProductID, Size, Color, Quantity)]
         """
 
-        global next_order_id, next_order_id_read
-
-        # Load next order id if not read yet
-        if not next_order_id_read:
-            OrderManager.__load_next_order_id(pysql)
-
-        # Merge duplicate items
+        # Merge duplicate items (compared as the database collation compares keys)
         merged = {}
         for pid, size, color, qty in items:
 
@@ -56,10 +32,11 @@ class OrderManager:
             if qty <= 0:
                 return 2 #Invalid quantity
 
-            merged[(pid, size, color)] = merged.get((pid, size, color), Decimal(0)) + qty
+            line = merged.setdefault(variant_key(pid, size, color), [(pid, size, color), Decimal(0)])
+            line[1] += qty
 
         # Create final order id
-        order_id = f"ORD-{next_order_id:010d}"
+        order_id = f"ORD-{pysql.sequencer.next_value('OrderID'):010d}"
 
         # Insert into Orders
         pysql.run(
@@ -69,14 +46,76 @@ class OrderManager:
         )
 
         # Insert each product
-        rows = [(order_id, pid, size, color, qty) for (pid, size, color), qty in merged.items()]
+        rows = [(order_id, pid, size, color, qty) for (pid, size, color), qty in merged.values()]
         pysql.run_many(
             "INSERT INTO OrdersOfProducts (OrderID, ProductID, Size, Color, Quantity) "
             "VALUES (%s, %s, %s, %s, %s)",
             rows
         )
 
-        next_order_id += 1
+        return (order_id)
+
+    @staticmethod
+    def __place_orders_bulk(pysql, items, chunk_size):
+        """
+        items = iterable of (ProductID, Size, Color, Quantity), e.g. a supplier CSV.
+        All lines go into one order; only chunk_size lines are held in memory.
+        """
+        order_id = f"ORD-{pysql.sequencer.next_value('OrderID'):010d}"
+
+        pysql.run(
+            "INSERT INTO Orders (OrderID, OrderDate, Delivered, Cancelled) "
+            "VALUES (%s, CURRENT_TIMESTAMP, 0, 0)",
+            (order_id,)
+        )
+
+        items = iter(items)
+        line_count = 0
+        while True:
+            chunk = list(islice(items, chunk_size))
+            if not chunk:
+                break
+
+            # Merge duplicate items within the chunk, comparing keys as the
+            # database collation does ('Red' and 'red' are one line)
+            merged = {}
+            for pid, size, color, qty in chunk:
+                try:
+                    qty = Decimal(str(qty).strip())
+                except InvalidOperation:
+                    pysql.rollback()
+                    return 2 #Invalid quantity
+                if not qty.is_finite() or qty <= 0:
+                    pysql.rollback()
+                    return 2 #Invalid quantity
+                key = variant_key(str(pid).strip(), str(size).strip(), str(color).strip())
+                merged[key] = merged.get(key, Decimal(0)) + qty
+
+            # Validate every variant of the chunk in one query; the lines
+            # take the Products spelling of each key
+            product_ids = sorted({key[0].upper() for key in merged})
+            pysql.run(
+                "SELECT ProductID, Size, Color FROM Products "
+                "WHERE ProductID IN (" + ", ".join(["%s"] * len(product_ids)) + ")",
+                product_ids
+            )
+            stored = {variant_key(*row): tuple(row) for row in pysql.result}
+            if any(key not in stored for key in merged):
+                pysql.rollback()
+                return 1 # Product does not exist
+
+            # Lines repeated across chunks add up in the database
+            pysql.run_many(
+                "INSERT INTO OrdersOfProducts (OrderID, ProductID, Size, Color, Quantity) "
+                "VALUES (%s, %s, %s, %s, %s) "
+                "ON DUPLICATE KEY UPDATE Quantity = Quantity + VALUES(Quantity)",
+                [(order_id, *stored[key], qty) for key, qty in merged.items()]
+            )
+            line_count += len(chunk)
+
+        if not line_count:
+            pysql.rollback()
+            return 2 #Invalid quantity
         return (order_id)
 
     @staticmethod
@@ -103,56 +142,81 @@ class OrderManager:
         return 0
 
     @staticmethod
-    def __receive_order(pysql, order_id):
-        status = OrderManager.__get_order_status(pysql, order_id)
+    def __receive_order(pysql, order_id, lines=None):
+        """
+        lines = [(ProductID, Size, Color, Quantity)] received now, or None to
+        receive everything still outstanding. The order is marked delivered
+        once every line has been received in full.
+        """
+        # Lock the order so two receipts cannot post the same delivery
+        pysql.run("SELECT Delivered, Cancelled FROM Orders WHERE OrderID=%s FOR UPDATE", (order_id,))
+        status = pysql.first_result
         if status is None:
             return 4
         delivered, cancelled = status
-        
+
         if delivered:
             return 2
         if cancelled:
             return 3
 
-        # Retrieve order products
+        # Retrieve order products with what is still outstanding
         pysql.run(
-            "SELECT ProductID, Size, Color, Quantity "
-            "FROM OrdersOfProducts WHERE OrderID=%s",
+            "SELECT ProductID, Size, Color, Quantity - ReceivedQuantity "
+            "FROM OrdersOfProducts WHERE OrderID=%s FOR UPDATE",
             (order_id,)
         )
-        rows = pysql.result or []
+        outstanding = {(pid, size, color): Decimal(qty) for pid, size, color, qty in pysql.result or []}
 
-        for pid, size, color, qty in rows:
-
-            qty = Decimal(qty)
-            threshold = max(1, round(qty * Decimal("0.10")))
-
-            pysql.run(
-                "SELECT COUNT(*) FROM Inventory WHERE ProductID=%s AND Size=%s AND Color=%s",
-                (pid, size, color)
+        if lines is None:
+            received = {key: qty for key, qty in outstanding.items() if qty > 0}
+        else:
+            received = {}
+            for pid, size, color, qty in lines:
+                if (pid, size, color) not in outstanding:
+                    return 5  # Product not in this order
+                try:
+                    qty = Decimal(str(qty).strip())
+                except InvalidOperation:
+                    return 6  # Invalid quantity
+                if not qty.is_finite() or qty <= 0:
+                    return 6  # Invalid quantity
+                received[(pid, size, color)] = received.get((pid, size, color), Decimal(0)) + qty
+            if any(qty > outstanding[key] for key, qty in received.items()):
+                return 6  # More than was ordered
+
+        if received:
+            items = [(*key, qty) for key, qty in received.items()]
+
+            # Add everything to stored inventory in one upsert
+            pysql.run_many(
+                "INSERT INTO Inventory "
+                "(ProductID, Size, Color, StoredQuantity, DisplayedQuantity, StoreThreshold) "
+                "VALUES (%s, %s, %s, %s, 0, %s) "
+                "ON DUPLICATE KEY UPDATE StoredQuantity = StoredQuantity + VALUES(StoredQuantity), "
+                "StoreThreshold = GREATEST(StoreThreshold, VALUES(StoreThreshold))",
+                [(pid, size, color, qty, max(1, round(qty * Decimal("0.10")))) for pid, size, color, qty in items]
             )
-            exists = pysql.scalar_result
+            pysql.low_stock.touch(received)
 
-            if exists:
-                pysql.run(
-                    "UPDATE Inventory SET StoredQuantity = StoredQuantity + %s, "
-                    "StoreThreshold = GREATEST(StoreThreshold, %s)"
-                    "WHERE ProductID=%s AND Size=%s AND Color=%s",
-                    (qty, threshold, pid, size, color)
-                )
+            # Record what has arrived against the order lines
+            if lines is None:
+                pysql.run("UPDATE OrdersOfProducts SET ReceivedQuantity = Quantity WHERE OrderID=%s", (order_id,))
             else:
+                arrived = " UNION ALL ".join(["SELECT %s AS ProductID, %s AS Size, %s AS Color, %s AS Quantity"] * len(items))
                 pysql.run(
-                    "INSERT INTO Inventory "
-                    "(ProductID, Size, Color, StoredQuantity, DisplayedQuantity, StoreThreshold) "
-                    "VALUES (%s, %s, %s, %s, 0, %s)",
-                    (pid, size, color, qty, threshold)
+                    "UPDATE OrdersOfProducts "
+                    "JOIN (" + arrived + ") Arrived ON OrdersOfProducts.ProductID = Arrived.ProductID "
+                    "AND OrdersOfProducts.Size = Arrived.Size AND OrdersOfProducts.Color = Arrived.Color "
+                    "SET OrdersOfProducts.ReceivedQuantity = OrdersOfProducts.ReceivedQuantity + Arrived.Quantity "
+                    "WHERE OrdersOfProducts.OrderID=%s",
+                    [value for item in items for value in item] + [order_id]
                 )
 
-            InventoryManager._InventoryManager__log_transaction(
-                pysql, "INVENTORY_ADD", pid, size, color, qty
-            )
+            InventoryManager._InventoryManager__log_transactions(pysql, "INVENTORY_ADD", items)
 
-        pysql.run("UPDATE Orders SET Delivered=1 WHERE OrderID=%s", (order_id,))
+        if all(received.get(key, 0) >= qty for key, qty in outstanding.items()):
+            pysql.run("UPDATE Orders SET Delivered=1 WHERE OrderID=%s", (order_id,))
         return 0
 
     @staticmethod
@@ -182,7 +246,15 @@ class OrderManager:
 
     @staticmethod
     def place_order(pysql, items):
-        return pysql.run_transaction(OrderManager.__place_order, items)
+        retval = pysql.run_transaction(OrderManager.__place_order, items)
+        DashboardManager.invalidate(pysql)
+        return retval
+
+    @staticmethod
+    def place_orders_bulk(pysql, items, chunk_size=1000):
+        retval = pysql.run_transaction(OrderManager.__place_orders_bulk, items, chunk_size)
+        DashboardManager.invalidate(pysql)
+        return retval
 
     @staticmethod
     def get_order_status(pysql, order_id):
@@ -190,11 +262,16 @@ class OrderManager:
 
     @staticmethod
     def cancel_order(pysql, order_id):
-        return pysql.run_transaction(OrderManager.__cancel_order, order_id)
+        retval = pysql.run_transaction(OrderManager.__cancel_order, order_id)
+        DashboardManager.invalidate(pysql)
+        return retval
 
     @staticmethod
-    def receive_order(pysql, order_id):
-        return pysql.run_transaction(OrderManager.__receive_order, order_id)
+    def receive_order(pysql, order_id, lines=None):
+        retval = pysql.run_transaction(OrderManager.__receive_order, order_id, lines)
+        InventoryManager.refresh_low_stock(pysql)
+        DashboardManager.invalidate(pysql)
+        return retval
 
     @staticmethod
     def get_orders(pysql):
@@ -6,6 +6,27 @@
 # -------------------------------------------------
 
 import re
+import unicodedata
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from CmsLib.DashboardManager import DashboardManager
+
+# Product names must contain one of these words (compiled once)
+FEMALE_KEYWORDS = ["Kurthi", "Kurti", "Saree", "Top", "Skirt", "Dress", "Jacket", "Sari",
+                   "T-shirt", "Pant", "Blouse", "Frock", "Ladies", "Women", "Girls", "Lehenga"]
+FEMALE_PRODUCT_RE = re.compile(r"\b(?:" + "|".join(FEMALE_KEYWORDS) + r")\b", flags=re.IGNORECASE)
+
+PRODUCT_ID_RE = re.compile(r"^[A-Z]{3}-[0-9]{3}$")
+SIZES = ("S", "M", "L", "XL", "XXL")
+
+
+def variant_key(product_id, size, color):
+    """
+    (ProductID, Size, Color) as the MySQL utf8mb4_0900_ai_ci collation
+    compares it (case and accents ignored), for duplicate checks in Python
+    """
+    return tuple("".join(ch for ch in unicodedata.normalize("NFKD", str(value)) if not unicodedata.combining(ch))
+                 .casefold() for value in (product_id, size, color))
 
 
 class ProductManager:
@@ -13,10 +34,77 @@ class ProductManager:
     # ---------- PRIVATE METHODS ----------
     @staticmethod
     def __is_female_product(product_name):
-        keywords = ["Kurthi", "Kurti", "Saree", "Top", "Skirt", "Dress", "Jacket", "Sari",
-                    "T-shirt", "Pant", "Blouse", "Frock", "Ladies", "Women", "Girls", "Lehenga"]
-        product = product_name.lower()
-        return any(re.search(rf"\b{kw}\b", product, flags=re.IGNORECASE) for kw in keywords)
+        return FEMALE_PRODUCT_RE.search(product_name) is not None
+
+    @staticmethod
+    def __validate_import_row(row):
+        """
+        Checks one (ProductID, Name, Description, UnitPrice, Size, Color, Discount)
+        row in memory. Returns (code, normalized_row); code uses the add_product
+        return values plus 5 for a malformed ID, size, color or text field.
+        """
+        try:
+            product_id, name, description, unit_price, size, color, discount = row
+        except (TypeError, ValueError):
+            return 5, None
+
+        product_id = (product_id or "").strip()
+        name = (name or "").strip()
+        description = (description or "").strip()
+        size = (size or "").strip()
+        color = (color or "").strip()
+
+        if (not PRODUCT_ID_RE.match(product_id) or size not in SIZES or not color or len(color) > 32
+                or not name or len(name) > 64 or len(description) > 128):
+            return 5, None
+        if not ProductManager.__is_female_product(name):
+            return 4, None
+        try:
+            unit_price = Decimal(str(unit_price).strip())
+        except InvalidOperation:
+            return 2, None
+        if not unit_price.is_finite() or unit_price <= 0:
+            return 2, None
+        try:
+            discount = Decimal(str(discount).strip()) if discount not in (None, "") else Decimal(0)
+        except InvalidOperation:
+            return 3, None
+        if not discount.is_finite() or discount < 0 or discount >= 100:
+            return 3, None
+
+        return 0, (product_id, name, description, unit_price, size, color, discount)
+
+    @staticmethod
+    def __add_products_chunk(pysql, rows):
+        """
+        rows = [(ProductID, Name, Description, UnitPrice, Size, Color, Discount)], validated
+        and without duplicates among themselves.
+        Returns the variant_key of the rows that already exist (nothing is inserted for them).
+        """
+        keys = [(row[0], row[4], row[5]) for row in rows]
+
+        # One query finds every duplicate in the chunk
+        sql_stmt = """SELECT ProductID, Size, Color FROM Products
+                      WHERE (ProductID, Size, Color) IN (%s)""" % ", ".join(["(%s, %s, %s)"] * len(keys))
+        pysql.run(sql_stmt, [value for key in keys for value in key])
+        existing = {variant_key(*row) for row in pysql.result}
+
+        new_rows = [row for row, key in zip(rows, keys) if variant_key(*key) not in existing]
+        if new_rows:
+            sql_stmt = """
+                INSERT INTO Products
+                (ProductID, Name, Description, UnitPrice, UnitType, Size, Color, CurrentDiscount)
+                VALUES (%s, %s, %s, %s, 'pcs', %s, %s, %s)
+            """
+            pysql.run_many(sql_stmt, new_rows)
+
+            sql_stmt = """
+                INSERT INTO Inventory
+                (ProductID, Size, Color, StoredQuantity, DisplayedQuantity, StoreThreshold)
+                VALUES (%s, %s, %s, 0, 0, 0)
+            """
+            pysql.run_many(sql_stmt, [(row[0], row[4], row[5]) for row in new_rows])
+        return existing
 
     @staticmethod
     def __add_product(pysql, product_id, name, description, unit_price, size, color, discount=None):
@@ -99,10 +187,29 @@ class ProductManager:
         return 0
 
     @staticmethod
-    def __product_exists(pysql, product_id, size, color):
-        sql_stmt = "SELECT COUNT(*) FROM Products WHERE ProductID = %s AND Size = %s AND Color = %s"
+    def __load_product(pysql, product_id, size, color):
+        sql_stmt = """
+            SELECT Name, UnitPrice, CurrentDiscount, UnitType
+            FROM Products
+            WHERE ProductID = %s AND Size = %s AND Color = %s
+        """
         pysql.run(sql_stmt, (product_id, size, color))
-        return pysql.scalar_result
+        return pysql.first_result
+
+    @staticmethod
+    def __get_product(pysql, product_id, size, color):
+        """
+        (Name, UnitPrice, CurrentDiscount, UnitType) of a variant from the
+        catalog cache, or None if it does not exist
+        """
+        return pysql.catalog_cache.get_or_load(
+            (product_id, size, color),
+            lambda: ProductManager.__load_product(pysql, product_id, size, color)
+        )
+
+    @staticmethod
+    def __product_exists(pysql, product_id, size, color):
+        return 1 if ProductManager.__get_product(pysql, product_id, size, color) else 0
     
     @staticmethod
     def __product_exists_any(pysql, product_id):
@@ -110,6 +217,12 @@ class ProductManager:
         pysql.run(sql, (product_id,))
         return pysql.scalar_result
 
+    @staticmethod
+    def __get_product_list(pysql):
+        sql_stmt = "SELECT ProductID, Name, Size, Color FROM Products"
+        pysql.run(sql_stmt)
+        return pysql.result
+
     @staticmethod
     def __get_all_products(pysql):
         sql_stmt = "SELECT * FROM Products"
@@ -126,29 +239,137 @@ class ProductManager:
 
     @staticmethod
     def add_product(pysql, product_id, name, description, unit_price, size, color, discount=None):
-        return pysql.run_transaction(
+        retval = pysql.run_transaction(
             ProductManager.__add_product, product_id, name, description, unit_price, size, color, discount
         )
+        ProductManager.invalidate_catalog(pysql, product_id, size, color)
+        if retval == 0:
+            # A new variant starts with nothing in stock and a zero threshold
+            pysql.low_stock.update([(product_id, size, color)],
+                                   [(product_id, name, size, color, Decimal(0), Decimal(0), Decimal(0))])
+        DashboardManager.invalidate(pysql)
+        return retval
+
+    @staticmethod
+    def add_products_bulk(pysql, rows, chunk_size=1000):
+        """
+        Streams (ProductID, Name, Description, UnitPrice, Size, Color, Discount)
+        rows into the catalog, chunk_size rows per transaction.
+        Returns {"imported": count, "errors": [(row_number, code), ...]} with
+        row numbers starting at 1 and codes as in add_product (5 = malformed,
+        6 = row rejected by the database). Keys are compared as the database
+        collation compares them. If the database rejects a chunk, its rows are
+        retried one per transaction, so only the offending rows are reported.
+        """
+        imported = 0
+        errors = []
+        seen = set()
+        rows = iter(rows)
+        row_number = 0
+
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+
+            valid, numbers = [], []
+            for row in chunk:
+                row_number += 1
+                code, normalized = ProductManager.__validate_import_row(row)
+                if code == 0:
+                    key = variant_key(normalized[0], normalized[4], normalized[5])
+                    if key in seen:
+                        code = 1  # Repeated within the file
+                    else:
+                        seen.add(key)
+                if code:
+                    errors.append((row_number, code))
+                    continue
+                valid.append(normalized)
+                numbers.append(row_number)
+
+            if not valid:
+                continue
+            try:
+                results = [(numbers, valid, pysql.run_transaction(ProductManager.__add_products_chunk, valid))]
+            except RuntimeError:
+                # e.g. a row added by someone else meanwhile: find the offending rows
+                results = []
+                for number, row in zip(numbers, valid):
+                    try:
+                        results.append(([number], [row], pysql.run_transaction(ProductManager.__add_products_chunk, [row])))
+                    except RuntimeError:
+                        errors.append((number, 6))
+            for chunk_numbers, chunk_rows, existing in results:
+                for number, row in zip(chunk_numbers, chunk_rows):
+                    if variant_key(row[0], row[4], row[5]) in existing:
+                        errors.append((number, 1))
+                    else:
+                        imported += 1
+
+        errors.sort()
+        ProductManager.invalidate_catalog(pysql)
+        if imported:
+            pysql.low_stock.invalidate()
+        DashboardManager.invalidate(pysql)
+        return {"imported": imported, "errors": errors}
 
     @staticmethod
     def update_product_discount(pysql, product_id, size, color, discount):
-        return pysql.run_transaction(ProductManager.__update_product_discount, product_id, size, color, discount)
+        retval = pysql.run_transaction(ProductManager.__update_product_discount, product_id, size, color, discount)
+        ProductManager.invalidate_catalog(pysql, product_id, size, color)
+        return retval
 
     @staticmethod
     def update_product_price(pysql, product_id, size, color, price):
-        return pysql.run_transaction(ProductManager.__update_product_price, product_id, size, color, price)
+        retval = pysql.run_transaction(ProductManager.__update_product_price, product_id, size, color, price)
+        ProductManager.invalidate_catalog(pysql, product_id, size, color)
+        return retval
     
     @staticmethod
     def update_product_name(pysql, product_id, name):
-        return pysql.run_transaction(ProductManager.__update_product_name, product_id, name)
+        retval = pysql.run_transaction(ProductManager.__update_product_name, product_id, name)
+        ProductManager.invalidate_catalog(pysql)
+        return retval
 
     @staticmethod
     def update_product_description(pysql, product_id, description):
-        return pysql.run_transaction(ProductManager.__update_product_description, product_id, description)
+        retval = pysql.run_transaction(ProductManager.__update_product_description, product_id, description)
+        ProductManager.invalidate_catalog(pysql)
+        return retval
+
+    @staticmethod
+    def invalidate_catalog(pysql, product_id=None, size=None, color=None):
+        """
+        Drops one variant (or, without arguments, everything) from the
+        catalog cache. Call after committing any write to Products.
+        """
+        if product_id is None:
+            pysql.catalog_cache.invalidate()
+        else:
+            pysql.catalog_cache.invalidate((product_id, size, color))
+            pysql.catalog_cache.invalidate("product_list")
+
+    @staticmethod
+    def get_product(pysql, product_id, size, color):
+        return pysql.catalog_cache.get_or_load(
+            (product_id, size, color),
+            lambda: pysql.run_transaction(ProductManager.__load_product, product_id, size, color, commit=False)
+        )
 
     @staticmethod
     def product_exists(pysql, product_id, size, color):
-        return pysql.run_transaction(ProductManager.__product_exists, product_id, size, color, commit=False )
+        return 1 if ProductManager.get_product(pysql, product_id, size, color) else 0
+
+    @staticmethod
+    def get_product_list(pysql):
+        """
+        (ProductID, Name, Size, Color) of every variant, cached with the catalog
+        """
+        return pysql.catalog_cache.get_or_load(
+            "product_list",
+            lambda: pysql.run_transaction(ProductManager.__get_product_list, commit=False)
+        )
     
     @staticmethod
     def product_exists_any(pysql, product_id):
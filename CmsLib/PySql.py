@@ -1,35 +1,156 @@
 # CmsLib/PySql.py
-from flask_mysqldb import MySQL 
+import os
+import threading
+import time
 import yaml
-from MySQLdb import InterfaceError, OperationalError, ProgrammingError
+from flask import request
+try:
+    import MySQLdb
+except ImportError:
+    MySQLdb = None      # only the embedded SQLite backend is available
+from CmsLib.ConnectionPool import ConnectionPool
+from CmsLib.QueryStats import QueryStats
+from CmsLib.IdSequencer import IdSequencer
+from CmsLib.Cache import TtlCache, LruCache
+from CmsLib.TokenPool import TokenPool
+from CmsLib.TokenFeed import TokenFeed
+from CmsLib.LowStockIndex import LowStockIndex
+from CmsLib.TransactionLog import TransactionLog
+from CmsLib.SqliteBackend import SqliteEngine
+
+# MySQL client errors that mean the connection itself is gone (server has
+# gone away, lost connection during query, lost connection to server)
+MYSQL_DISCONNECT_CODES = {2006, 2013, 2055}
 
 # @brief This class connects Python to MySQL and provides
-#        helper methods for queries and transactions
+#        helper methods for queries and transactions.
+#        Connections come from a bounded pool and are held per thread,
+#        so one PySql object can be shared by a threaded server.
+#        With `backend: sqlite` it runs on an embedded SQLite database
+#        instead, for benchmarks and local runs without a MySQL server.
 class PySql:
-    def __init__(self, flask_app, path_to_yaml):
-        # Load DB configuration from YAML
-        db_details = yaml.load(open(path_to_yaml), Loader=yaml.FullLoader)
-        flask_app.config['MYSQL_HOST'] = db_details['mysql_host']
-        flask_app.config['MYSQL_USER'] = db_details['mysql_user']
-        flask_app.config['MYSQL_PASSWORD'] = db_details['mysql_password']
-        flask_app.config['MYSQL_DB'] = db_details['mysql_db']
-        self.mysql = MySQL(flask_app)
-        self.mysql_cursor = None
-        self.__last_result = None
+    def __init__(self, flask_app, path_to_yaml, config=None):
+        # Load DB configuration from YAML; entries in config override it
+        with open(path_to_yaml) as yaml_file:
+            db_details = yaml.load(yaml_file, Loader=yaml.FullLoader)
+        db_details.update(config or {})
+
+        if db_details.get('backend', 'mysql') == 'sqlite':
+            self.backend = SqliteEngine(db_details.get('sqlite_path', ':memory:'))
+            connect = self.backend.connect
+            # The sequencer keeps its own connection: pool slots may all be
+            # held by threads queued on SQLite's single writer lock
+            sequencer_connect = self.backend.connect
+        else:
+            if MySQLdb is None:
+                raise RuntimeError("mysqlclient is not installed; use backend: sqlite in db.yaml")
+            self.backend = MySQLdb
+            flask_app.config['MYSQL_HOST'] = db_details['mysql_host']
+            flask_app.config['MYSQL_USER'] = db_details['mysql_user']
+            flask_app.config['MYSQL_PASSWORD'] = db_details['mysql_password']
+            flask_app.config['MYSQL_DB'] = db_details['mysql_db']
+
+            def connect():
+                return MySQLdb.connect(host=db_details['mysql_host'],
+                                       user=db_details['mysql_user'],
+                                       passwd=db_details['mysql_password'],
+                                       db=db_details['mysql_db'])
+
+            def sequencer_connect():
+                # Each reservation is its own short transaction
+                conn = connect()
+                conn.autocommit(True)
+                return conn
+
+        self.pool = ConnectionPool(connect,
+                                   min_size=db_details.get('pool_min_size', 1),
+                                   max_size=db_details.get('pool_max_size', 10),
+                                   idle_timeout=db_details.get('pool_idle_timeout', 300),
+                                   checkout_timeout=db_details.get('pool_checkout_timeout', 10))
+        self.__local = threading.local()
+        self.__pid = os.getpid()
+
+        # Block-allocated InvoiceID / TransactionID / OrderID values
+        # (on a connection of its own, outside the request pool)
+        self.sequencer = IdSequencer(sequencer_connect, block_size=db_details.get('id_block_size', 50))
+
+        # Index page cards, dropped whenever a manager writes
+        self.dashboard_cache = TtlCache(db_details.get('dashboard_ttl', 10))
+
+        # Product rows keyed by (ProductID, Size, Color); ProductManager
+        # writes invalidate, the TTL bounds staleness across workers
+        self.catalog_cache = LruCache(db_details.get('catalog_cache_size', 50000),
+                                      ttl=db_details.get('catalog_ttl', 60))
+
+        # Free customer tokens known to this process
+        self.token_pool = TokenPool(size=db_details.get('token_pool_size', 100),
+                                    digits=db_details.get('token_digits', 2),
+                                    refill_size=db_details.get('token_refill_size', 32))
+
+        # Live token/counter state for the server-sent event feed
+        self.token_feed = TokenFeed(resync=db_details.get('token_feed_resync', 30))
+
+        # Variants at or below StoreThreshold, updated by the inventory writers
+        self.low_stock = LowStockIndex(resync=db_details.get('low_stock_resync', 60))
+
+        # InventoryTransactions rows, written at commit (or after it by a writer thread)
+        # (SQLite has one writer, so a writer thread would only queue behind requests)
+        self.transaction_log = TransactionLog(connect,
+                                              background=db_details.get('transaction_log_background', False)
+                                                         and self.backend is MySQLdb,
+                                              queue_size=db_details.get('transaction_log_queue_size', 10000))
+
+        # Per-query timing and slow-query log
+        self.stats = QueryStats(slow_query_ms=db_details.get('slow_query_ms', 200),
+                                slow_query_log=db_details.get('slow_query_log'))
+
+        # Set to a QueryRegistry to collect every statement run (plan checks)
+        self.query_registry = None
+
+        # Tag queries with the route that issued them
+        flask_app.before_request(lambda: self.stats.begin_request(request.endpoint))
+
+        # Hand the connection back to the pool at the end of every request
+        flask_app.teardown_appcontext(self.__teardown)
+
+    def __teardown(self, exception):
+        self.stats.end_request()
+        self.release()
+
+    # ----------------- Per-thread State -----------------
+    def __check_pid(self):
+        if self.__pid != os.getpid():
+            # Forked child: a connection the forking thread held is the
+            # parent's; drop it (the pool starts empty in the child too)
+            self.__local = threading.local()
+            self.__pid = os.getpid()
+
+    @property
+    def connection(self):
+        return getattr(self.__local, 'connection', None)
+
+    @property
+    def mysql_cursor(self):
+        return getattr(self.__local, 'cursor', None)
+
+    @mysql_cursor.setter
+    def mysql_cursor(self, cursor):
+        self.__local.cursor = cursor
 
     # ----------------- Cursor Management -----------------
     def init(self):
-        # Check if connection is alive
-        try:
-            if self.mysql.connection:
-                self.mysql.connection.ping(reconnect=True) # Reconnect if needed
-        except:
-            # Recreate connection object if ping fails
-            self.mysql_cursor = None
+        self.__check_pid()
+        # Check out a connection for this thread if it has none
+        if self.connection is None:
+            if self.transaction_depth and getattr(self.__local, 'aborted', False):
+                # The unit of work lost its connection (and its earlier
+                # statements); running on with a fresh one would commit half of it
+                raise RuntimeError("Transaction aborted: its connection was released after an error")
+            self.__local.connection = self.pool.checkout()
 
         # Create cursor if it's None
         if self.mysql_cursor is None:
-            self.mysql_cursor = self.mysql.connection.cursor()
+            self.mysql_cursor = self.connection.cursor()
 
 
     def deinit(self):
@@ -39,41 +160,114 @@ class PySql:
        finally:
          self.mysql_cursor = None
 
+    def release(self, discard=False):
+        """
+        Closes the cursor and returns this thread's connection to the pool
+        :param discard: close the connection instead of reusing it
+        """
+        self.__check_pid()
+        self.deinit()
+        self.transaction_log.discard()
+        self.low_stock.discard()
+        self.__local.savepoints = []
+        connection = self.connection
+        self.__local.connection = None
+        if connection is None:
+            return
+        if not discard:
+            try:
+                # Never hand an open transaction to the next borrower
+                connection.rollback()
+            except (self.backend.InterfaceError, self.backend.OperationalError):
+                discard = True
+        self.pool.checkin(connection, discard=discard)
+
+    def close(self):
+        self.release()
+        self.transaction_log.close()
+        self.sequencer.close()
+        self.pool.close()
+
+    def pool_stats(self):
+        return self.pool.stats()
+
 
     # ----------------- Query Execution -----------------
+    def __lost_connection(self, error):
+        if isinstance(error, self.backend.InterfaceError):
+            return True
+        # SQLite reports syntax errors and lock timeouts as OperationalError too
+        return self.backend is MySQLdb and bool(error.args) and error.args[0] in MYSQL_DISCONNECT_CODES
+
     def run(self, sql_stmt, params=None):
-        
+        start = time.perf_counter()
         try:
-            self.init() 
-            self.mysql_cursor.execute(sql_stmt, params)
-        except (InterfaceError, OperationalError) as e:
-            # Retry once after re-init
-            self.deinit()
             self.init()
             self.mysql_cursor.execute(sql_stmt, params)
-        except ProgrammingError as e:
+        except (self.backend.InterfaceError, self.backend.OperationalError) as e:
+            lost = self.__lost_connection(e)
+            if self.transaction_depth:
+                # Deadlocks, lock-wait timeouts and dropped connections inside
+                # a unit of work: the earlier statements cannot be replayed, so
+                # hand the connection back and let run_transaction roll back
+                self.release(discard=lost)
+                self.__local.aborted = True
+                raise RuntimeError(f"MySQL query failed: {e}")
+            if not lost:
+                raise RuntimeError(f"MySQL query failed: {e}")
+            # Autocommit statement on a dropped connection: retry once on a fresh one
+            self.release(discard=True)
+            try:
+                self.init()
+                self.mysql_cursor.execute(sql_stmt, params)
+            except (self.backend.InterfaceError, self.backend.OperationalError, self.backend.ProgrammingError) as e:
+                self.release(discard=self.__lost_connection(e))
+                raise RuntimeError(f"MySQL query failed after reconnecting: {e}")
+        except self.backend.ProgrammingError as e:
             raise RuntimeError(f"MySQL query failed: {e}")
+        self.stats.record(sql_stmt, time.perf_counter() - start, self.mysql_cursor.rowcount)
+        if self.query_registry is not None:
+            self.query_registry.record(sql_stmt, params, self.stats.current_method or self.stats.current_route)
 
     def run_many(self, sql_stmt, params):
-        self.init() 
+        self.init()
+        start = time.perf_counter()
         try:
             self.mysql_cursor.executemany(sql_stmt, params)
-        except (InterfaceError, OperationalError, ProgrammingError) as e:
+        except (self.backend.InterfaceError, self.backend.OperationalError) as e:
+            lost = self.__lost_connection(e)
+            if self.transaction_depth:
+                # Same as run(): the unit of work cannot go on past a failed batch
+                self.release(discard=lost)
+                self.__local.aborted = True
+            elif lost:
+                self.release(discard=True)
             raise RuntimeError(f"MySQL bulk query failed: {e}")
+        except self.backend.ProgrammingError as e:
+            raise RuntimeError(f"MySQL bulk query failed: {e}")
+        self.stats.record(sql_stmt, time.perf_counter() - start, self.mysql_cursor.rowcount)
+        if self.query_registry is not None:
+            self.query_registry.record(sql_stmt, None, self.stats.current_method or self.stats.current_route,
+                                       bulk=True)
 
     # ----------------- Fetch Results -----------------
     def __result(self):
         try:
-            self.__last_result = self.mysql_cursor.fetchall()
-            return self.__last_result
-        except InterfaceError:
+            self.__local.last_result = self.mysql_cursor.fetchall()
+            return self.__local.last_result
+        except (self.backend.InterfaceError, AttributeError):
             # If result cannot be fetched, return previous result
-            return self.__last_result
+            return getattr(self.__local, 'last_result', None)
 
     @property
     def result(self):
         return self.__result()
 
+    @property
+    def rowcount(self):
+        # Rows matched/changed by the last statement on this thread
+        return self.mysql_cursor.rowcount if self.mysql_cursor else 0
+
     @property
     def scalar_result(self):
         try:
@@ -89,33 +283,101 @@ class PySql:
             return None
 
     # ----------------- Transaction Management -----------------
+    @property
+    def transaction_depth(self):
+        # 0 outside run_transaction, 1 in a unit of work, >1 when nested
+        return getattr(self.__local, 'depth', 0)
+
     def commit(self):
-        if self.mysql.connection:
-            self.mysql.connection.commit()
+        if self.transaction_depth > 1:
+            return      # the outermost unit of work commits
+        if getattr(self.__local, 'aborted', False):
+            raise RuntimeError("Transaction aborted: its connection was released after an error")
+        if self.connection:
+            # Buffered log rows go out with the transaction they describe
+            self.transaction_log.flush(self)
+            self.connection.commit()
+            self.transaction_log.committed()
 
     def rollback(self):
-        if self.mysql.connection:
-            self.mysql.connection.rollback()
+        if getattr(self.__local, 'aborted', False):
+            # run() already handed the connection back: nothing left to undo
+            self.transaction_log.discard()
+            self.low_stock.discard()
+            return
+        depth = self.transaction_depth
+        savepoints = getattr(self.__local, 'savepoints', None)
+        if depth > 1:
+            if not savepoints or savepoints[-1][2] != depth:
+                # A commit=False unit joined the outer transaction without a
+                # savepoint: undoing "its" work would undo the caller's too
+                raise RuntimeError("rollback() in a nested unit of work run with commit=False")
+            # Inside a nested unit of work: undo only its own statements
+            name, log_mark, _ = savepoints[-1]
+            self.run(f"ROLLBACK TO SAVEPOINT {name}")
+            self.transaction_log.truncate(log_mark)
+            return
+        self.transaction_log.discard()
+        self.low_stock.discard()
+        if self.connection:
+            self.connection.rollback()
 
     def run_transaction(self, function, *args, commit=True):
         """
-        Runs a function within a transaction with safe commit/rollback
+        Runs a function within a transaction with safe commit/rollback.
+        Called from inside another run_transaction, the function joins the
+        outer transaction on the same connection and cursor: with commit=True
+        it runs under a savepoint (rolled back on error or pysql.rollback()),
+        with commit=False it simply joins and may not call pysql.rollback().
+        Only the outermost call commits.
         :param function: function(self, *args) to run
         :param args: arguments for function
         :param commit: whether to commit after success
         :return: result of function
         """
+        if self.transaction_depth:
+            return self.__run_nested(function, args, commit)
+
         self.init()
+        self.__local.depth = 1
+        self.__local.savepoints = []
+        self.__local.aborted = False
+        self.stats.push_method(function.__qualname__)
         try:
             result = function(self, *args)
+            if commit:
+                self.commit()
+            return result
         except Exception as e:
             self.rollback()
-            self.deinit()
             print(f"[PySql Transaction Error] {e}")
             raise RuntimeError(f"Transaction failed: {e}")
-        else:
+        finally:
+            self.stats.pop_method()
+            self.__local.depth = 0
+            self.__local.aborted = False
+
+    def __run_nested(self, function, args, commit):
+        savepoints = self.__local.savepoints
+        self.__local.depth += 1
+        self.stats.push_method(function.__qualname__)
+        name = None
+        try:
             if commit:
-                self.commit()
+                name = f"unit_{len(savepoints) + 1}"
+                self.run(f"SAVEPOINT {name}")
+                savepoints.append((name, self.transaction_log.mark(), self.__local.depth))
+            try:
+                result = function(self, *args)
+            except Exception:
+                if name:
+                    self.rollback()
+                raise
+            if name:
+                self.run(f"RELEASE SAVEPOINT {name}")
             return result
         finally:
-            self.deinit()
+            if name and savepoints and savepoints[-1][0] == name:
+                savepoints.pop()
+            self.stats.pop_method()
+            self.__local.depth -= 1
@@ -0,0 +1,136 @@
+# CmsLib/QueryPlan.py
+import ast
+import re
+import threading
+from CmsLib.QueryStats import QueryStats
+from CmsLib.SqliteBackend import SqliteEngine
+
+# String literals that start like a statement (upper case keywords only, so
+# messages such as "Select tokens" are not mistaken for SQL)
+SQL_LITERAL = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\s")
+EXPLAINABLE = re.compile(r"^\s*(SELECT|UPDATE|DELETE|WITH)\b|^\s*INSERT\b.*\bSELECT\b", re.IGNORECASE | re.DOTALL)
+# (FOR UPDATE [OF tsp] is a locking clause, not a table)
+TABLE_REF = re.compile(r"\b(?:FROM|JOIN|(?<!FOR )UPDATE|INTO)\s+`?(\w+)`?(?:\s+(?:AS\s+)?`?(\w+)`?)?", re.IGNORECASE)
+# Leading column of an ORDER BY that a LIMIT applies to (same query level)
+LIMITED_ORDER = re.compile(r"\bORDER\s+BY\s+(?:`?\w+`?\.)?`?(\w+)`?[^()]*?\bLIMIT\b", re.IGNORECASE)
+NOT_ALIASES = {"ON", "WHERE", "SET", "JOIN", "LEFT", "RIGHT", "INNER", "OUTER", "CROSS", "GROUP", "ORDER",
+               "LIMIT", "USING", "VALUES", "SELECT", "FOR", "AND", "UNION", "HAVING", "LOCK"}
+
+
+# @brief Every distinct statement PySql has run, by QueryStats fingerprint,
+#        with one sample of its parameters and the manager methods or
+#        routes that issued it. Filled while PySql.query_registry is set.
+class QueryRegistry:
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__statements = {}
+
+    def record(self, sql_stmt, params, caller, bulk=False):
+        """params: one sample; bulk: an executemany batch (not explained)"""
+        fp = QueryStats.fingerprint(sql_stmt)
+        with self.__lock:
+            entry = self.__statements.get(fp)
+            if entry is None:
+                entry = self.__statements[fp] = {"fingerprint": fp, "sql": sql_stmt, "params": params,
+                                                 "bulk": bulk, "callers": set(), "calls": 0}
+            entry["callers"].add(caller or "?")
+            entry["calls"] += 1
+
+    def statements(self):
+        with self.__lock:
+            return [dict(entry, callers=sorted(entry["callers"]))
+                    for _, entry in sorted(self.__statements.items())]
+
+    @staticmethod
+    def scan_sources(paths):
+        """fingerprint -> "path:line" for every string literal in paths that reads like SQL"""
+        found = {}
+        for path in paths:
+            with open(path) as source:
+                tree = ast.parse(source.read(), path)
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Constant) and isinstance(node.value, str) and SQL_LITERAL.match(node.value):
+                    found.setdefault(QueryStats.fingerprint(node.value), f"{path}:{node.lineno}")
+        return found
+
+
+# @brief Runs EXPLAIN on registered statements and reports full scans of
+#        tables above max_scan_rows rows and sorts that cannot use an index
+#        (MySQL "Using filesort", SQLite "USE TEMP B-TREE FOR ORDER BY").
+class PlanChecker:
+    def __init__(self, pysql, max_scan_rows=1000):
+        self.pysql = pysql
+        self.max_scan_rows = max_scan_rows
+        self.__table_rows = {}
+
+    @staticmethod
+    def explainable(entry):
+        return not entry["bulk"] and EXPLAINABLE.match(entry["sql"]) is not None
+
+    @staticmethod
+    def tables(sql_stmt):
+        """alias (or table name) -> table name for the tables a statement reads"""
+        tables = {}
+        for table, alias in TABLE_REF.findall(sql_stmt):
+            tables[table] = table
+            if alias and alias.upper() not in NOT_ALIASES:
+                tables[alias] = table
+        return tables
+
+    def table_rows(self, table):
+        if table not in self.__table_rows:
+            self.pysql.run(f"SELECT COUNT(*) FROM {table}")
+            self.__table_rows[table] = int(self.pysql.scalar_result or 0)
+        return self.__table_rows[table]
+
+    # ----------------- EXPLAIN -----------------
+    def __explain_mysql(self, sql_stmt, params):
+        self.pysql.run("EXPLAIN " + sql_stmt, params)
+        columns = [column[0] for column in self.pysql.mysql_cursor.description]
+        plan = []
+        for values in self.pysql.result:
+            row = dict(zip(columns, values))
+            extra = row.get("Extra") or ""
+            plan.append({"table": row.get("table"), "rows": int(row.get("rows") or 0),
+                         "full_scan": row.get("type") in ("ALL", "index"),
+                         "filesort": "Using filesort" in extra,
+                         "detail": f"{row.get('table')}: type={row.get('type')} key={row.get('key')} {extra}".strip()})
+        return plan
+
+    def __explain_sqlite(self, sql_stmt, params):
+        tables = self.tables(sql_stmt)
+        plan = []
+        for detail in self.pysql.backend.explain(sql_stmt, params):
+            match = re.match(r"(SCAN|SEARCH) (\w+)", detail)
+            table = tables.get(match.group(2)) if match else None
+            plan.append({"table": table, "rows": self.table_rows(table) if table else 0,
+                         "full_scan": table is not None and match.group(1) == "SCAN",
+                         "filesort": detail.startswith("USE TEMP B-TREE FOR") and "ORDER BY" in detail,
+                         "detail": detail})
+        # An index walked in ORDER BY order under a LIMIT stops early (keyset
+        # pages): only when the scanned index leads with the ORDER BY column
+        limited = {column.lower() for column in LIMITED_ORDER.findall(sql_stmt)}
+        if limited:
+            for step in plan:
+                index = re.match(r"SCAN \w+ USING (?:COVERING )?INDEX (\w+)", step["detail"])
+                if index and step["full_scan"]:
+                    columns = self.pysql.backend.index_columns(index.group(1))
+                    if columns and columns[0].lower() in limited:
+                        step["full_scan"] = False
+        return plan
+
+    def explain(self, sql_stmt, params):
+        if isinstance(self.pysql.backend, SqliteEngine):
+            return self.__explain_sqlite(sql_stmt, params)
+        return self.__explain_mysql(sql_stmt, params)
+
+    def check(self, entry):
+        """(plan, problems) for one registry entry"""
+        plan = self.explain(entry["sql"], entry["params"])
+        problems = []
+        for step in plan:
+            if step["full_scan"] and step["rows"] > self.max_scan_rows:
+                problems.append(f"full scan of {step['table']} ({step['rows']} rows): {step['detail']}")
+            if step["filesort"]:
+                problems.append(f"filesort: {step['detail']}")
+        return plan, problems
@@ -0,0 +1,146 @@
+# CmsLib/QueryStats.py
+import re
+import logging
+import threading
+from functools import lru_cache
+
+slow_query_logger = logging.getLogger("CmsLib.slow_query")
+
+# @brief Collects wall time, row counts and call counts for every statement
+#        run through PySql, aggregated per statement fingerprint, per Flask
+#        route and per manager method. Statements slower than the configured
+#        threshold are written to the slow-query log.
+class QueryStats:
+    def __init__(self, slow_query_ms=200, slow_query_log=None):
+        self.slow_query_ms = slow_query_ms
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.reset()
+
+        if slow_query_log and not slow_query_logger.handlers:
+            handler = logging.FileHandler(slow_query_log)
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            slow_query_logger.addHandler(handler)
+            slow_query_logger.setLevel(logging.INFO)
+
+    # ----------------- Fingerprints -----------------
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def fingerprint(sql_stmt):
+        """Normalizes a statement so calls that differ only in literals group together"""
+        fp = re.sub(r"'(?:[^'\\]|\\.)*'", "?", sql_stmt)
+        fp = re.sub(r"\b\d+(\.\d+)?\b", "?", fp)
+        fp = fp.replace("%s", "?")
+        fp = re.sub(r"\(\s*\?(\s*,\s*\?)*\s*\)", "(?+)", fp)
+        fp = re.sub(r"\s+", " ", fp).strip()
+        # Batched lookups repeat one arm per key: keep one
+        fp = re.sub(r"(SELECT [^()]+?)(?: UNION ALL \1)+", r"\1 UNION ALL ...", fp)
+        return fp
+
+    # ----------------- Context -----------------
+    def begin_request(self, route):
+        self.__local.route = route
+        self.__local.request_queries = {}
+
+    def end_request(self):
+        route = getattr(self.__local, 'route', None)
+        self.__local.route = None
+        self.__local.request_queries = None
+        if route is not None:
+            with self.__lock:
+                self.__bucket(self.__by_route, route)["requests"] += 1
+
+    def push_method(self, method):
+        stack = getattr(self.__local, 'methods', None)
+        if stack is None:
+            stack = self.__local.methods = []
+        stack.append(method)
+
+    def pop_method(self):
+        self.__local.methods.pop()
+
+    @property
+    def current_route(self):
+        return getattr(self.__local, 'route', None)
+
+    def request_queries(self):
+        """fingerprint -> [calls, total_ms, method] for the statements of the current request so far"""
+        return getattr(self.__local, 'request_queries', None) or {}
+
+    @property
+    def current_method(self):
+        stack = getattr(self.__local, 'methods', None)
+        return stack[-1] if stack else None
+
+    # ----------------- Recording -----------------
+    @staticmethod
+    def __bucket(table, key):
+        bucket = table.get(key)
+        if bucket is None:
+            bucket = table[key] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "requests": 0}
+        return bucket
+
+    @staticmethod
+    def __add(bucket, elapsed_ms, rows):
+        bucket["calls"] += 1
+        bucket["total_ms"] += elapsed_ms
+        bucket["rows"] += rows
+        if elapsed_ms > bucket["max_ms"]:
+            bucket["max_ms"] = elapsed_ms
+
+    def record(self, sql_stmt, elapsed, rows):
+        """
+        :param sql_stmt: statement as passed to PySql.run / run_many
+        :param elapsed: wall time in seconds
+        :param rows: cursor.rowcount after execution
+        """
+        elapsed_ms = elapsed * 1000.0
+        rows = max(rows or 0, 0)
+        fp = QueryStats.fingerprint(sql_stmt)
+        route = self.current_route
+        method = self.current_method
+
+        with self.__lock:
+            self.__add(self.__bucket(self.__by_statement, fp), elapsed_ms, rows)
+            if route is not None:
+                self.__add(self.__bucket(self.__by_route, route), elapsed_ms, rows)
+            if method is not None:
+                self.__add(self.__bucket(self.__by_method, method), elapsed_ms, rows)
+
+        request_queries = getattr(self.__local, 'request_queries', None)
+        if request_queries is not None:
+            calls = request_queries.get(fp)
+            if calls is None:
+                request_queries[fp] = [1, elapsed_ms, method]
+            else:
+                calls[0] += 1
+                calls[1] += elapsed_ms
+
+        if self.slow_query_ms is not None and elapsed_ms >= self.slow_query_ms:
+            slow_query_logger.warning("%.1f ms rows=%d route=%s method=%s sql=%s",
+                                      elapsed_ms, rows, route, method, fp)
+
+    # ----------------- Reporting -----------------
+    def reset(self):
+        with self.__lock:
+            self.__by_statement = {}
+            self.__by_route = {}
+            self.__by_method = {}
+
+    @staticmethod
+    def __top(table, top):
+        ordered = sorted(table.items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        if top is not None:
+            ordered = ordered[:top]
+        return [dict(bucket, name=name) for name, bucket in ordered]
+
+    def summary(self, top=20):
+        with self.__lock:
+            return {
+                "slow_query_ms": self.slow_query_ms,
+                "total_queries": sum(b["calls"] for b in self.__by_statement.values()),
+                "total_ms": sum(b["total_ms"] for b in self.__by_statement.values()),
+                "statements": self.__top(self.__by_statement, top),
+                "routes": self.__top(self.__by_route, top),
+                "methods": self.__top(self.__by_method, top),
+            }
@@ -0,0 +1,150 @@
+# CmsLib/RequestProfiler.py
+import hashlib
+import logging
+import threading
+import time
+from flask import request, template_rendered, before_render_template
+
+n_plus_one_logger = logging.getLogger("CmsLib.n_plus_one")
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _statement_key(method, fingerprint):
+    """Short metric label for a statement: issuing method + hash of its fingerprint"""
+    digest = hashlib.sha1(fingerprint.encode()).hexdigest()[:8]
+    return f"{method or 'unknown'}#{digest}"
+
+
+# @brief Per-route request metrics for the Flask app: a latency histogram,
+#        time split into database / template rendering / Python, statements
+#        per request, and N+1 detection - a statement shape run at least
+#        n_plus_one times within one request (a query inside a loop) is
+#        counted and logged once per route. render() serves everything in
+#        the Prometheus text format. Figures are per worker process.
+#        Statements are labelled by method and fingerprint hash so the
+#        label set stays bounded; the log line carries the full SQL.
+class RequestProfiler:
+    def __init__(self, flask_app, pysql, n_plus_one=5, exclude=("static",)):
+        self.pysql = pysql
+        self.n_plus_one = n_plus_one
+        self.exclude = set(exclude)
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.__routes = {}          # route -> totals
+        self.__n_plus_one = {}      # (route, statement key) -> requests where it repeated
+        self.__statements = {}      # statement key -> fingerprint
+
+        flask_app.before_request(self.__begin)
+        flask_app.teardown_request(self.__end)
+        before_render_template.connect(self.__before_render, flask_app)
+        template_rendered.connect(self.__rendered, flask_app)
+
+    # ----------------- Request Hooks -----------------
+    def __begin(self):
+        self.__local.start = time.perf_counter()
+        self.__local.template_time = 0.0
+        self.__local.render_start = None
+
+    def __before_render(self, sender, template, context, **extra):
+        self.__local.render_start = time.perf_counter()
+
+    def __rendered(self, sender, template, context, **extra):
+        start = getattr(self.__local, 'render_start', None)
+        if start is not None:
+            self.__local.template_time += time.perf_counter() - start
+            self.__local.render_start = None
+
+    def __end(self, exception):
+        start = getattr(self.__local, 'start', None)
+        self.__local.start = None
+        route = request.endpoint or "unmatched"
+        if start is None or route in self.exclude:
+            return
+        elapsed = time.perf_counter() - start
+        queries = self.pysql.stats.request_queries()
+        db_time = sum(total_ms for _, total_ms, _ in queries.values()) / 1000.0
+        template_time = self.__local.template_time
+        repeated = [fp for fp, (calls, _, _) in queries.items() if calls >= self.n_plus_one]
+
+        with self.__lock:
+            totals = self.__routes.get(route)
+            if totals is None:
+                totals = self.__routes[route] = {"buckets": [0] * len(LATENCY_BUCKETS), "count": 0, "sum": 0.0,
+                                                 "db": 0.0, "template": 0.0, "python": 0.0,
+                                                 "queries": 0, "errors": 0}
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    totals["buckets"][i] += 1
+            totals["count"] += 1
+            totals["sum"] += elapsed
+            totals["db"] += db_time
+            totals["template"] += template_time
+            totals["python"] += max(elapsed - db_time - template_time, 0.0)
+            totals["queries"] += sum(calls for calls, _, _ in queries.values())
+            if exception is not None:
+                totals["errors"] += 1
+            first_seen = []
+            for fp in repeated:
+                statement = _statement_key(queries[fp][2], fp)
+                self.__statements[statement] = fp
+                key = (route, statement)
+                if key not in self.__n_plus_one:
+                    first_seen.append((statement, fp))
+                self.__n_plus_one[key] = self.__n_plus_one.get(key, 0) + 1
+
+        for statement, fp in first_seen:
+            n_plus_one_logger.warning("N+1: route=%s statement=%s ran %d times in one request: %s",
+                                      route, statement, queries[fp][0], fp)
+
+    # ----------------- Reporting -----------------
+    def n_plus_one_report(self):
+        """[(route, statement key, fingerprint, requests)] for statements repeated within a request"""
+        with self.__lock:
+            return sorted((route, statement, self.__statements[statement], count)
+                          for (route, statement), count in self.__n_plus_one.items())
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self.__lock:
+            routes = {route: dict(totals, buckets=list(totals["buckets"]))
+                      for route, totals in sorted(self.__routes.items())}
+            n_plus_one = sorted(self.__n_plus_one.items())
+
+        lines = ["# HELP cms_request_duration_seconds Request latency by route",
+                 "# TYPE cms_request_duration_seconds histogram"]
+        for route, totals in routes.items():
+            for bound, count in zip(LATENCY_BUCKETS, totals["buckets"]):
+                lines.append(f'cms_request_duration_seconds_bucket{{route="{_label(route)}",le="{bound}"}} {count}')
+            lines.append(f'cms_request_duration_seconds_bucket{{route="{_label(route)}",le="+Inf"}} {totals["count"]}')
+            lines.append(f'cms_request_duration_seconds_sum{{route="{_label(route)}"}} {totals["sum"]:.6f}')
+            lines.append(f'cms_request_duration_seconds_count{{route="{_label(route)}"}} {totals["count"]}')
+
+        counters = [("cms_request_db_seconds_total", "db", "Time spent in database statements"),
+                    ("cms_request_template_seconds_total", "template", "Time spent rendering templates"),
+                    ("cms_request_python_seconds_total", "python", "Remaining request time (Python)"),
+                    ("cms_request_queries_total", "queries", "Statements run through PySql"),
+                    ("cms_request_errors_total", "errors", "Requests that raised an exception")]
+        for name, key, help_text in counters:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for route, totals in routes.items():
+                value = totals[key]
+                value = f"{value:.6f}" if isinstance(value, float) else value
+                lines.append(f'{name}{{route="{_label(route)}"}} {value}')
+
+        lines += ["# HELP cms_n_plus_one_requests_total Requests that ran one statement shape "
+                  f"{self.n_plus_one} or more times",
+                  "# TYPE cms_n_plus_one_requests_total counter"]
+        for (route, statement), count in n_plus_one:
+            lines.append(f'cms_n_plus_one_requests_total{{route="{_label(route)}",statement="{_label(statement)}"}} {count}')
+
+        lines += ["# HELP cms_pool_connections Connection pool state", "# TYPE cms_pool_connections gauge"]
+        for key, value in sorted(self.pysql.pool_stats().items()):
+            if isinstance(value, (int, float)):
+                lines.append(f'cms_pool_connections{{stat="{_label(key)}"}} {value}')
+        return "\n".join(lines) + "\n"
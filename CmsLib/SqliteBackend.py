@@ -0,0 +1,311 @@
+# CmsLib/SqliteBackend.py
+# -------------------------------------------------
+# Embedded SQLite backend for benchmarks and local runs
+# Speaks just enough MySQL for the CmsLib managers:
+# %s placeholders, IN %s tuples, GREATEST/LEAST,
+# INSERT IGNORE, ON DUPLICATE KEY UPDATE ... VALUES(),
+# UPDATE ... JOIN, LAST_INSERT_ID(), FOR UPDATE [OF ...].
+# -------------------------------------------------
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "../sql_src/cms_ddl_sqlite.sql")
+
+# NUMERIC columns come back as Decimal and DATETIME as datetime, like MySQLdb
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("NUMERIC", lambda value: Decimal(value.decode()))
+sqlite3.register_converter("DATETIME", lambda value: datetime.fromisoformat(value.decode()))
+
+_MARKER = re.compile(r"\x00(\d+)\x00")
+
+
+# ---------- SQL TRANSLATION ----------
+
+def _top_level(sql, keyword, start=0):
+    """Position of keyword at parenthesis depth 0 (outside quotes) at or after start"""
+    for match in re.finditer(r"\b" + keyword + r"\b", sql[start:], re.IGNORECASE):
+        position = start + match.start()
+        prefix = re.sub(r"'(?:[^']|'')*'", "", sql[:position])
+        if prefix.count("(") == prefix.count(")"):
+            return position, position + len(match.group())
+    return None
+
+
+def _rewrite_update_join(sql):
+    # UPDATE t JOIN src ON cond SET a = b [WHERE w]
+    #   -> UPDATE t SET a = b FROM src WHERE (cond) [AND (w)]
+    match = re.match(r"\s*UPDATE\s+(\w+)\s+JOIN\b", sql, re.IGNORECASE)
+    if not match:
+        return sql
+    target = match.group(1)
+    on = _top_level(sql, "ON", match.end())
+    set_ = _top_level(sql, "SET", on[1])
+    where = _top_level(sql, "WHERE", set_[1])
+
+    source = sql[match.end():on[0]].strip()
+    condition = sql[on[1]:set_[0]].strip()
+    assignments = sql[set_[1]:where[0] if where else len(sql)].strip()
+    assignments = re.sub(r"\b" + target + r"\.(\w+)\s*=(?!=)", r"\1 =", assignments)
+
+    rewritten = f"UPDATE {target} SET {assignments} FROM {source} WHERE ({condition})"
+    if where:
+        rewritten += f" AND ({sql[where[1]:].strip()})"
+    return rewritten
+
+
+def _rewrite_row_lists(sql):
+    # (a, b) IN ((x, y), ...) -> (a, b) IN (SELECT * FROM (VALUES (x, y), ...))
+    # A bare VALUES list is legal too, but only the subquery form lets
+    # SQLite probe the primary key instead of scanning the table.
+    pattern = re.compile(r"\bIN\s*(\()\s*\((?!\s*SELECT\b)", re.IGNORECASE)
+    match = pattern.search(sql)
+    while match:
+        depth, quoted, end = 0, False, None
+        for i in range(match.start(1), len(sql)):
+            char = sql[i]
+            if char == "'":
+                quoted = not quoted
+            elif not quoted and char == "(":
+                depth += 1
+            elif not quoted and char == ")":
+                depth -= 1
+                if depth == 0:
+                    end = i
+                    break
+        if end is None:
+            return sql
+        rows = sql[match.start(1) + 1:end]
+        replacement = "IN (SELECT * FROM (VALUES " + rows.strip() + "))"
+        sql = sql[:match.start()] + replacement + sql[end + 1:]
+        match = pattern.search(sql, match.start() + len(replacement))
+    return sql
+
+
+@lru_cache(maxsize=1024)
+def translate(sql, has_params=True):
+    """
+    MySQL statement -> list alternating SQLite text and parameter indexes.
+    Parameters are referenced by index so clauses can be reordered.
+    """
+    if has_params:
+        counter = iter(range(10 ** 6))
+        sql = re.sub(r"%s|%%", lambda m: "%" if m.group() == "%%" else f"\x00{next(counter)}\x00", sql)
+
+    sql = re.sub(r"\bFOR\s+UPDATE(\s+OF\s+\w+(\s*,\s*\w+)*)?(\s+SKIP\s+LOCKED)?\b", "", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bINSERT\s+IGNORE\b", "INSERT OR IGNORE", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bGREATEST\s*\(", "MAX(", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bLEAST\s*\(", "MIN(", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bSUBSTRING\s*\(", "SUBSTR(", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bAS\s+UNSIGNED\b", "AS INTEGER", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bCURRENT_TIMESTAMP\b", "datetime('now', 'localtime')", sql, flags=re.IGNORECASE)
+    sql = _rewrite_row_lists(sql)
+
+    upsert = re.search(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", sql, re.IGNORECASE)
+    if upsert:
+        tail = re.sub(r"\bVALUES\s*\(\s*(\w+)\s*\)", r"excluded.\1", sql[upsert.end():], flags=re.IGNORECASE)
+        sql = sql[:upsert.start()] + "ON CONFLICT DO UPDATE SET" + tail
+
+    sql = _rewrite_update_join(sql)
+    parts = _MARKER.split(sql)
+    return tuple(int(part) if i % 2 else part for i, part in enumerate(parts))
+
+
+def bind(sql, params):
+    """(sqlite_sql, sqlite_params) for a MySQLdb-style statement and parameters"""
+    if params is None:
+        return "".join(translate(sql, False)), ()
+    if isinstance(params, dict):
+        raise sqlite3.ProgrammingError("Named parameters are not supported")
+    params = list(params)
+    text, values = [], []
+    for i, part in enumerate(translate(sql)):
+        if not i % 2:
+            text.append(part)
+            continue
+        value = params[part]
+        if isinstance(value, (tuple, list)):
+            # IN %s with a sequence expands to (?, ?, ...)
+            text.append("(" + ", ".join("?" * len(value)) + ")" if value else "(NULL)")
+            values.extend(value)
+        else:
+            text.append("?")
+            values.append(value)
+    return "".join(text), values
+
+
+# ---------- ENGINE ----------
+
+# @brief One SQLite database shared by every connection handed to the pool.
+#        SQLite has a single writer, so units of work are serialised with a
+#        re-entrant lock: a connection takes it on its first statement and
+#        drops it at commit/rollback. A second connection opened by the same
+#        thread inside that unit (the ID sequencer does this) nests as a
+#        savepoint instead of deadlocking.
+class SqliteEngine:
+    InterfaceError = sqlite3.InterfaceError
+    OperationalError = sqlite3.OperationalError
+    ProgrammingError = sqlite3.ProgrammingError
+
+    def __init__(self, path=":memory:", schema_path=SCHEMA_PATH, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self.__open(schema_path)
+
+    def __open(self, schema_path=None):
+        self.__db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                    check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self.__lock = threading.RLock()
+        self.__depth = 0
+        self.__last_insert_id = 0
+        self.__pid = os.getpid()
+
+        self.__db.create_function("LAST_INSERT_ID", 0, lambda: self.__last_insert_id)
+        self.__db.create_function("LAST_INSERT_ID", 1, self.__set_last_insert_id)
+        # MySQL's REGEXP on non-binary strings is case-insensitive
+        self.__db.create_function("REGEXP", 2, lambda pattern, value: None if value is None
+                                  else re.search(pattern, value, re.IGNORECASE) is not None)
+        self.__db.execute("PRAGMA foreign_keys = ON")
+        if self.path != ":memory:":
+            self.__db.execute("PRAGMA journal_mode = WAL")
+
+        has_tables = self.__db.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+        if schema_path and not has_tables:
+            with open(schema_path) as schema_file:
+                self.__db.executescript(schema_file.read())
+
+    def __check_pid(self):
+        if self.__pid != os.getpid():
+            # Forked child: SQLite handles must not cross a fork, so open a
+            # fresh one on the same file (an in-memory database is not shared)
+            self.__open()
+
+    def __set_last_insert_id(self, value):
+        self.__last_insert_id = value
+        return value
+
+    def connect(self):
+        return SqliteConnection(self)
+
+    # ----------------- Units of Work -----------------
+    def begin(self):
+        self.__check_pid()
+        self.__lock.acquire()
+        self.__depth += 1
+        if self.__depth == 1:
+            self.__db.execute("BEGIN IMMEDIATE")
+        else:
+            self.__db.execute(f"SAVEPOINT engine_{self.__depth}")
+        return self.__depth
+
+    def end(self, depth, commit):
+        try:
+            if depth == 1:
+                self.__db.execute("COMMIT" if commit else "ROLLBACK")
+            else:
+                if not commit:
+                    self.__db.execute(f"ROLLBACK TO engine_{depth}")
+                self.__db.execute(f"RELEASE engine_{depth}")
+        finally:
+            self.__depth -= 1
+            self.__lock.release()
+
+    def cursor(self):
+        self.__check_pid()
+        return self.__db.cursor()
+
+    def explain(self, sql_stmt, params=None):
+        """EXPLAIN QUERY PLAN detail lines for a MySQL-style statement"""
+        sql, values = bind(sql_stmt, params)
+        self.__check_pid()
+        with self.__lock:
+            return [row[3] for row in self.__db.execute("EXPLAIN QUERY PLAN " + sql, values)]
+
+    def index_columns(self, index):
+        """Column names of an index, leading column first"""
+        self.__check_pid()
+        with self.__lock:
+            return [row[2] for row in self.__db.execute(f"PRAGMA index_info(`{index}`)")]
+
+    def close(self):
+        self.__db.close()
+
+
+# @brief DB-API connection facade over SqliteEngine with the MySQLdb
+#        methods PySql and ConnectionPool use.
+class SqliteConnection:
+    def __init__(self, engine):
+        self.__engine = engine
+        self.__depth = None     # set while this connection has a unit of work open
+
+    def ensure_transaction(self):
+        if self.__depth is None:
+            self.__depth = self.__engine.begin()
+
+    def __end(self, commit):
+        if self.__depth is not None:
+            depth, self.__depth = self.__depth, None
+            self.__engine.end(depth, commit)
+
+    def cursor(self):
+        return SqliteCursor(self, self.__engine.cursor())
+
+    def commit(self):
+        self.__end(True)
+
+    def rollback(self):
+        self.__end(False)
+
+    def ping(self):
+        return True
+
+    def close(self):
+        self.__end(False)
+
+
+class SqliteCursor:
+    def __init__(self, connection, cursor):
+        self.__connection = connection
+        self.__cursor = cursor
+        self.rowcount = -1
+
+    @property
+    def description(self):
+        return self.__cursor.description
+
+    def execute(self, sql_stmt, params=None):
+        self.__connection.ensure_transaction()
+        self.__cursor.execute(*bind(sql_stmt, params))
+        self.rowcount = self.__cursor.rowcount
+        return self.rowcount
+
+    def executemany(self, sql_stmt, seq_of_params):
+        self.__connection.ensure_transaction()
+        rows = [bind(sql_stmt, params) for params in seq_of_params]
+        self.rowcount = 0
+        if not rows:
+            return 0
+        statement = rows[0][0]
+        if all(row[0] == statement for row in rows):
+            self.__cursor.executemany(statement, [row[1] for row in rows])
+            self.rowcount = self.__cursor.rowcount
+        else:
+            for statement, values in rows:
+                self.__cursor.execute(statement, values)
+                self.rowcount += self.__cursor.rowcount
+        return self.rowcount
+
+    def fetchall(self):
+        return tuple(self.__cursor.fetchall())
+
+    def fetchone(self):
+        return self.__cursor.fetchone()
+
+    def close(self):
+        self.__cursor.close()
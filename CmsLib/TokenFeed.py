@@ -0,0 +1,93 @@
+# CmsLib/TokenFeed.py
+import threading
+import time
+from collections import deque
+
+# @brief In-memory model of every token and the items on it, plus a short
+#        history of changes for server-sent event subscribers.
+#        Managers push the rows of the tokens they touched; the model is
+#        only kept while someone is watching, and it is re-read from the
+#        database every `resync` seconds so changes made by other worker
+#        processes show up too.
+class TokenFeed:
+    def __init__(self, resync=30, history=512):
+        self.resync = resync
+        self.__cond = threading.Condition()
+        self.__tokens = None        # token_id -> {"TokenID", "Assigned", "Items"}
+        self.__events = deque(maxlen=history)   # (seq, event)
+        self.__seq = 0
+        self.__loaded_at = 0.0
+        self.__watched_at = 0.0
+
+    # ----------------- Rows -> Model -----------------
+    @staticmethod
+    def __build(rows):
+        # rows: (TokenID, Assigned, ProductID, Size, Color, Quantity), item columns NULL for empty tokens
+        tokens = {}
+        for token_id, assigned, product_id, size, color, quantity in rows:
+            token = tokens.setdefault(token_id, {"TokenID": token_id, "Assigned": bool(assigned), "Items": []})
+            if product_id is not None:
+                token["Items"].append({"ProductID": product_id, "Size": size,
+                                       "Color": color, "Quantity": str(quantity)})
+        return tokens
+
+    def __publish(self, event):
+        self.__seq += 1
+        self.__events.append((self.__seq, event))
+
+    # ----------------- Updates -----------------
+    @property
+    def active(self):
+        # Nobody has looked for a while: don't spend queries keeping it current
+        with self.__cond:
+            return self.__tokens is not None and time.monotonic() - self.__watched_at < 2 * self.resync
+
+    def stale(self):
+        with self.__cond:
+            return self.__tokens is None or time.monotonic() - self.__loaded_at >= self.resync
+
+    def load(self, rows):
+        tokens = self.__build(rows)
+        with self.__cond:
+            self.__tokens = tokens
+            self.__loaded_at = time.monotonic()
+            self.__publish({"type": "snapshot"})
+            self.__cond.notify_all()
+
+    def update(self, token_ids, rows):
+        tokens = self.__build(rows)
+        with self.__cond:
+            if self.__tokens is None:
+                return
+            for token_id in token_ids:
+                token = tokens.get(token_id)
+                if token is None:
+                    if self.__tokens.pop(token_id, None) is not None:
+                        self.__publish({"type": "removed", "TokenID": token_id})
+                elif self.__tokens.get(token_id) != token:
+                    self.__tokens[token_id] = token
+                    self.__publish({"type": "token", "token": token})
+            self.__cond.notify_all()
+
+    # ----------------- Readers -----------------
+    def snapshot(self):
+        with self.__cond:
+            self.__watched_at = time.monotonic()
+            tokens = [self.__tokens[token_id] for token_id in sorted(self.__tokens or {})]
+            return self.__seq, tokens
+
+    def wait(self, after_seq, timeout=15):
+        """
+        Events newer than after_seq; [] on timeout, None when the client
+        has fallen behind the history (or a snapshot was loaded) and must
+        take a fresh snapshot.
+        """
+        with self.__cond:
+            self.__watched_at = time.monotonic()
+            self.__cond.wait_for(lambda: self.__seq > after_seq, timeout=timeout)
+            events = [(seq, event) for seq, event in self.__events if seq > after_seq]
+            if not events:
+                return []
+            if events[0][0] != after_seq + 1 or any(event["type"] == "snapshot" for _, event in events):
+                return None
+            return events
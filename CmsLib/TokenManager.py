@@ -4,26 +4,36 @@
 # Handles color & size variants of female clothing
 # -------------------------------------------------
 
+from CmsLib.DashboardManager import DashboardManager
+
 class TokenManager:
 
     # ---------- PRIVATE METHODS ----------
 
     @staticmethod
     def __add_token(pysql):
-        sql_stmt = "SELECT `TokenID` FROM `Tokens` ORDER BY `TokenID` ASC"
+        pool = pysql.token_pool
+
+        # Highest token from the primary key; the lock serialises concurrent adds
+        sql_stmt = "SELECT MAX(`TokenID`) FROM `Tokens` FOR UPDATE"
         pysql.run(sql_stmt)
-        tokens = [int(token[0][4:]) for token in pysql.result]
+        top = pysql.scalar_result
+        token_i = pool.number(top) + 1 if top else 0
 
-        token_i = 0
-        for token in tokens:
-            if token_i != token:
-                break
-            token_i += 1
+        if token_i >= pool.size:
+            # Top of the pool reached: reuse the first gap left by remove_token
+            sql_stmt = "SELECT `TokenID` FROM `Tokens` ORDER BY `TokenID` ASC"
+            pysql.run(sql_stmt)
+            token_i = 0
+            for token in pysql.result:
+                if token_i != pool.number(token[0]):
+                    break
+                token_i += 1
 
-        if token_i >= 100:
+        if token_i >= pool.size:
             return 1
 
-        token_id = "TOK-" + format(token_i, "02d")
+        token_id = pool.format(token_i)
         sql_stmt = "INSERT INTO `Tokens` (`TokenID`) VALUES (%s)"
         pysql.run(sql_stmt, (token_id,))
         return token_id
@@ -46,14 +56,34 @@ class TokenManager:
 
     @staticmethod
     def __get_token(pysql):
-        sql_stmt = "SELECT `TokenID` FROM `Tokens` WHERE `Assigned` = 0 LIMIT 1"
-        pysql.run(sql_stmt)
-        token_id = pysql.scalar_result
-        if not token_id:
+        pool = pysql.token_pool
+
+        # Claim from this process's free list; the WHERE makes the claim atomic
+        sql_stmt = "UPDATE `Tokens` SET `Assigned` = true WHERE `TokenID` = %s AND `Assigned` = false"
+        token_id = pool.take()
+        while token_id is not None:
+            pysql.run(sql_stmt, (token_id,))
+            if pysql.rowcount:
+                return token_id
+            token_id = pool.take()    # stale hint, try the next one
+
+        # Free list is dry: lock a batch of free tokens other counters are not holding
+        sql_stmt = """
+            SELECT `TokenID` FROM `Tokens`
+            WHERE `Assigned` = false
+            ORDER BY `TokenID`
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """
+        pysql.run(sql_stmt, (pool.refill_size,))
+        free_tokens = [row[0] for row in pysql.result]
+        if not free_tokens:
             return None
 
+        token_id = free_tokens[0]
         sql_stmt = "UPDATE `Tokens` SET `Assigned` = true WHERE `TokenID` = %s"
         pysql.run(sql_stmt, (token_id,))
+        pool.fill(free_tokens[1:])
         return token_id
 
     @staticmethod
@@ -96,7 +126,7 @@ class TokenManager:
 
     @staticmethod
     def __get_all_tokens_status(pysql):
-        sql_stmt = "SELECT `TokenID`, `Assigned` FROM `Tokens`"
+        sql_stmt = "SELECT `TokenID`, `Assigned` FROM `Tokens` ORDER BY `TokenID`"
         pysql.run(sql_stmt)
         return pysql.result
     
@@ -105,31 +135,89 @@ class TokenManager:
         """
         Returns a list of TokenIDs that have products assigned (i.e., pending tokens)
         """
-        sql_stmt = "SELECT DISTINCT `TokenID` FROM `TokensSelectProducts`"
+        sql_stmt = "SELECT DISTINCT `TokenID` FROM `TokensSelectProducts` ORDER BY `TokenID`"
+        pysql.run(sql_stmt)
+        return [row[0] for row in pysql.result or ()]
+
+    @staticmethod
+    def __get_empty_tokens(pysql):
+        """
+        Returns the TokenIDs handed to customers that have no products yet
+        """
+        sql_stmt = """
+            SELECT t.`TokenID`
+            FROM `Tokens` t
+            LEFT JOIN `TokensSelectProducts` tsp ON t.`TokenID` = tsp.`TokenID`
+            WHERE t.`Assigned` = TRUE AND tsp.`TokenID` IS NULL
+            ORDER BY t.`TokenID`
+        """
+        pysql.run(sql_stmt)
+        return [row[0] for row in pysql.result or ()]
+
+    @staticmethod
+    def __get_assigned_products(pysql):
+        sql_stmt = """
+            SELECT `TokenID`, `ProductID`, `Size`, `Color`, `Quantity`
+            FROM `TokensSelectProducts`
+            ORDER BY `TokenID`
+        """
         pysql.run(sql_stmt)
+        return pysql.result
 
-        if not pysql.result:
-            return []
-        return [row[0] for row in pysql.result]
+    @staticmethod
+    def __get_token_rows(pysql, token_ids=None):
+        """
+        One row per token item (item columns NULL for a token with no items),
+        for all tokens or only token_ids
+        """
+        sql_stmt = """
+            SELECT t.`TokenID`, t.`Assigned`, tsp.`ProductID`, tsp.`Size`, tsp.`Color`, tsp.`Quantity`
+            FROM `Tokens` t
+            LEFT JOIN `TokensSelectProducts` tsp ON tsp.`TokenID` = t.`TokenID`
+        """
+        if token_ids is None:
+            pysql.run(sql_stmt)
+        else:
+            pysql.run(sql_stmt + " WHERE t.`TokenID` IN %s", (tuple(token_ids),))
+        return pysql.result or ()
 
 
     # ---------- PUBLIC WRAPPERS ----------
 
     @staticmethod
     def add_token(pysql):
-        return pysql.run_transaction(TokenManager.__add_token)
+        retval = pysql.run_transaction(TokenManager.__add_token)
+        if retval != 1:
+            pysql.token_pool.put(retval)
+            TokenManager.publish_tokens(pysql, (retval,))
+        DashboardManager.invalidate(pysql)
+        return retval
 
     @staticmethod
     def remove_token(pysql, token_id):
-        return pysql.run_transaction(TokenManager.__remove_token, token_id)
+        retval = pysql.run_transaction(TokenManager.__remove_token, token_id)
+        if retval == 0:
+            pysql.token_pool.discard(token_id)
+            TokenManager.publish_tokens(pysql, (token_id,))
+        DashboardManager.invalidate(pysql)
+        return retval
 
     @staticmethod
     def get_token(pysql):
-        return pysql.run_transaction(TokenManager.__get_token)
+        retval = pysql.run_transaction(TokenManager.__get_token)
+        if retval:
+            TokenManager.publish_tokens(pysql, (retval,))
+        DashboardManager.invalidate(pysql)
+        return retval
 
     @staticmethod
     def return_token(pysql, token_id):
-        return pysql.run_transaction(TokenManager.__return_token, token_id)
+        retval = pysql.run_transaction(TokenManager.__return_token, token_id)
+        if retval == 0:
+            pysql.token_pool.put(token_id)
+            TokenManager.publish_tokens(pysql, (token_id,))
+        DashboardManager.invalidate(pysql)
+        return retval
 
     @staticmethod
     def is_token_assigned(pysql, token_id):
@@ -147,6 +235,39 @@ class TokenManager:
     def get_pending_tokens(pysql):
         return pysql.run_transaction(TokenManager.__get_pending_tokens, commit=False)
 
+    @staticmethod
+    def get_empty_tokens(pysql):
+        return pysql.run_transaction(TokenManager.__get_empty_tokens, commit=False)
+
+    @staticmethod
+    def get_assigned_products(pysql):
+        return pysql.run_transaction(TokenManager.__get_assigned_products, commit=False)
+
+    @staticmethod
+    def get_token_feed_snapshot(pysql):
+        """
+        (seq, tokens) from the in-memory token model, reloading it first if
+        it has not been read from the database for token_feed_resync seconds.
+        Only for the live feed: the model only sees this process's writes, so
+        request/response pages read the database instead.
+        """
+        if pysql.token_feed.stale():
+            pysql.token_feed.load(pysql.run_transaction(TokenManager.__get_token_rows, commit=False))
+        return pysql.token_feed.snapshot()
+
+    @staticmethod
+    def publish_tokens(pysql, token_ids):
+        # Only pay for the re-read while a screen is following the feed
+        if not token_ids or not pysql.token_feed.active:
+            return
+        token_ids = tuple(dict.fromkeys(token_ids))
+        rows = pysql.run_transaction(TokenManager.__get_token_rows, token_ids, commit=False)
+        pysql.token_feed.update(token_ids, rows)
+
+    @staticmethod
+    def get_token_pool_stats(pysql):
+        return pysql.token_pool.stats()
+
     @staticmethod
     def get_token_details(pysql, token_id):
         return pysql.run_transaction(TokenManager.__get_token_details, token_id, commit=False)
@@ -0,0 +1,66 @@
+# CmsLib/TokenPool.py
+import os
+import threading
+from collections import deque
+
+# @brief Per-process free list of customer tokens.
+#        The list is only a hint: TokenManager claims a token with a
+#        conditional UPDATE (or FOR UPDATE SKIP LOCKED when the list runs
+#        dry), so a stale entry costs one statement, never a double hand-out.
+class TokenPool:
+    def __init__(self, size=100, digits=2, refill_size=32):
+        if size > 10 ** digits:
+            raise ValueError(f"Token pool of {size} does not fit in {digits} digits")
+        self.size = size
+        self.digits = digits
+        self.refill_size = refill_size
+        self.__lock = threading.Lock()
+        self.__free = deque()
+        self.__members = set()
+        self.__pid = os.getpid()
+
+    # ----------------- Token IDs -----------------
+    def format(self, number):
+        return "TOK-" + format(number, f"0{self.digits}d")
+
+    @staticmethod
+    def number(token_id):
+        return int(token_id[4:])
+
+    # ----------------- Free List -----------------
+    def __check_pid(self):
+        if self.__pid != os.getpid():
+            # Forked child: the parent's hints are as good as stale
+            self.__free.clear()
+            self.__members.clear()
+            self.__pid = os.getpid()
+
+    def take(self):
+        with self.__lock:
+            self.__check_pid()
+            if not self.__free:
+                return None
+            token_id = self.__free.popleft()
+            self.__members.discard(token_id)
+            return token_id
+
+    def put(self, token_id):
+        with self.__lock:
+            self.__check_pid()
+            if token_id not in self.__members:
+                self.__members.add(token_id)
+                self.__free.append(token_id)
+
+    def fill(self, token_ids):
+        for token_id in token_ids:
+            self.put(token_id)
+
+    def discard(self, token_id):
+        with self.__lock:
+            if token_id in self.__members:
+                self.__members.discard(token_id)
+                self.__free.remove(token_id)
+
+    def stats(self):
+        with self.__lock:
+            return {"size": self.size, "digits": self.digits, "free_hints": len(self.__free)}
@@ -0,0 +1,173 @@
+# CmsLib/TransactionLog.py
+import atexit
+import os
+import queue
+import threading
+import time
+
+INSERT_SQL = """
+    INSERT INTO InventoryTransactions
+    (TransactionID, TransactionType, ProductID, Size, Color, Quantity, Timestamp)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Rows written inside the unit of work take the database clock, like
+# Invoices.InvoiceDate, so day-range reports agree on which day a move was
+LIVE_INSERT_SQL = """
+    INSERT INTO InventoryTransactions
+    (TransactionID, TransactionType, ProductID, Size, Color, Quantity, Timestamp)
+    VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+"""
+
+# @brief Write-behind buffer for InventoryTransactions rows.
+#        Managers append() rows while their unit of work runs; PySql
+#        writes them with one executemany right before COMMIT (so the log
+#        commits or rolls back with the stock move) and drops them on
+#        rollback. With background=True the rows are instead handed to a
+#        writer thread after COMMIT through a bounded queue; close() (also
+#        run at interpreter exit) drains that queue before returning. The
+#        writer has a connection of its own rather than a request pool slot.
+#        Timestamps always come from the database clock.
+class TransactionLog:
+    def __init__(self, connect, background=False, queue_size=10000, batch_size=500, retries=3):
+        """
+        :param connect: zero-argument callable returning a new connection for the writer thread
+        """
+        self.__connect = connect
+        self.__conn = None
+        self.background = background
+        self.batch_size = batch_size
+        self.retries = retries
+        self.__local = threading.local()
+        self.__queue = queue.Queue(maxsize=queue_size) if background else None
+        self.__writer = None
+        self.__lock = threading.Lock()
+        self.__pid = os.getpid()
+        self.written = 0
+        self.failed = 0
+        if background:
+            atexit.register(self.close)
+
+    # ----------------- Unit of Work -----------------
+    def __pending(self):
+        pending = getattr(self.__local, "pending", None)
+        if pending is None:
+            pending = self.__local.pending = []
+        return pending
+
+    def append(self, rows):
+        """rows = [(TransactionID, TransactionType, ProductID, Size, Color, Quantity)]"""
+        self.__pending().extend(rows)
+
+    def discard(self):
+        self.__local.pending = None
+
+    def mark(self):
+        # Position to truncate() back to when a savepoint is rolled back
+        return len(getattr(self.__local, "pending", None) or ())
+
+    def truncate(self, mark):
+        pending = getattr(self.__local, "pending", None)
+        if pending:
+            del pending[mark:]
+
+    def flush(self, pysql):
+        # Called inside the transaction, just before COMMIT
+        pending = getattr(self.__local, "pending", None)
+        if not pending:
+            return
+        if not self.background:
+            self.__local.pending = None
+            pysql.run_many(LIVE_INSERT_SQL, pending)
+            return
+        # Written later by the writer thread: stamp with the database clock now
+        pysql.run("SELECT CURRENT_TIMESTAMP")
+        now = pysql.scalar_result
+        self.__local.pending = [row + (now,) for row in pending]
+
+    def committed(self):
+        # Called after COMMIT; only rows bound for the writer thread remain
+        pending = getattr(self.__local, "pending", None)
+        self.__local.pending = None
+        if pending:
+            self.__start_writer()
+            for start in range(0, len(pending), self.batch_size):
+                # Blocks when the writer falls behind instead of growing without bound
+                self.__queue.put(pending[start:start + self.batch_size])
+
+    # ----------------- Background Writer -----------------
+    def __start_writer(self):
+        if self.__pid != os.getpid():
+            # Forked child: rows queued before the fork are the parent's to
+            # write, and its writer thread did not come along
+            self.__lock = threading.Lock()
+            self.__queue = queue.Queue(maxsize=self.__queue.maxsize)
+            self.__writer = None
+            self.__conn = None
+            self.__pid = os.getpid()
+        with self.__lock:
+            if self.__writer is None or not self.__writer.is_alive():
+                self.__writer = threading.Thread(target=self.__run, name="TransactionLogWriter", daemon=True)
+                self.__writer.start()
+
+    def __drop_connection(self):
+        conn, self.__conn = self.__conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def __write(self, rows):
+        for attempt in range(self.retries):
+            try:
+                if self.__conn is None:
+                    self.__conn = self.__connect()
+                cursor = self.__conn.cursor()
+                try:
+                    cursor.executemany(INSERT_SQL, rows)
+                    self.__conn.commit()
+                finally:
+                    cursor.close()
+                self.written += len(rows)
+                return
+            except Exception as e:
+                # Connect failures included: the writer must outlive them
+                self.__drop_connection()
+                print(f"[TransactionLog] write failed (attempt {attempt + 1}): {e}")
+                time.sleep(0.1 * 2 ** attempt)
+        self.failed += len(rows)
+        print(f"[TransactionLog] dropped {len(rows)} rows: {[row[0] for row in rows]}")
+
+    def __run(self):
+        while True:
+            rows = self.__queue.get()
+            if rows is None:
+                return
+            # Merge whatever else is waiting into one executemany
+            while len(rows) < self.batch_size:
+                try:
+                    more = self.__queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    self.__write(rows)
+                    return
+                rows = rows + more
+            self.__write(rows)
+
+    def close(self):
+        """Waits until every committed row has been written"""
+        if self.__queue is None:
+            return
+        with self.__lock:
+            writer = self.__writer
+        if writer is not None and writer.is_alive():
+            self.__queue.put(None)
+            writer.join()
+        self.__drop_connection()
+
+    def stats(self):
+        return {"background": self.background,
+                "queued": self.__queue.qsize() if self.__queue else 0,
+                "written": self.written, "failed": self.failed}
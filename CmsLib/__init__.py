@@ -1,3 +1,16 @@
+from CmsLib.SqliteBackend import SqliteEngine
+from CmsLib.ConnectionPool import ConnectionPool
+from CmsLib.QueryStats import QueryStats
+from CmsLib.QueryPlan import QueryRegistry, PlanChecker
+from CmsLib.RequestProfiler import RequestProfiler
+from CmsLib.IdSequencer import IdSequencer
+from CmsLib.Cache import TtlCache, LruCache
+from CmsLib.TokenPool import TokenPool
+from CmsLib.TokenFeed import TokenFeed
+from CmsLib.LowStockIndex import LowStockIndex
+from CmsLib.TransactionLog import TransactionLog
+from CmsLib.DateRange import day_range
+from CmsLib import Money
 from CmsLib.PySql import PySql
 from CmsLib.ProductManager import ProductManager
 from CmsLib.TokenManager import TokenManager
@@ -5,5 +18,7 @@ from CmsLib.InventoryManager import InventoryManager
 from CmsLib.CounterManager import CounterManager
 from CmsLib.OrderManager import OrderManager
 from CmsLib.InvoiceManager import InvoiceManager
+from CmsLib.DashboardManager import DashboardManager
+from CmsLib.CatalogImporter import read_catalog, import_catalog
 
 print("Imported CMS module")
@@ -1,33 +1,82 @@
 # py_src/app.py
 
-from flask import Flask, render_template, request, redirect, session, url_for
+from flask import Flask, render_template, request, redirect, session, url_for, jsonify, current_app
+from flask import stream_template, stream_with_context
 from functools import wraps
-from datetime import datetime, timedelta
+from werkzeug.local import LocalProxy
+from decimal import Decimal, InvalidOperation
 import sys
 import re
 import os
 import hashlib
+import ipaddress
+import csv
+import io
+import json
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from CmsLib import *
 
-app = Flask(__name__,
-            template_folder='../html_src/',
-            static_folder='../html_src/')
-app.secret_key = "supersecretkey" #for session
+YAML_PATH = os.path.join(os.path.dirname(__file__), "../CmsLib/db.yaml")
+
 # =========================
-# Global Database Connection
+# App Factory
 # =========================
-yaml_path = os.path.join(os.path.dirname(__file__), "../CmsLib/db.yaml")
-pysql = PySql(app, yaml_path)
+# Views are collected here and added to every app create_app() builds, so
+# nothing mutable lives at module level: each process (e.g. each gunicorn
+# worker) builds its own app, connection pool, caches and ID blocks, and
+# everything shared between processes is in the database.
+_routes = []
+
+
+def route(rule, **options):
+    def decorator(view):
+        _routes.append((rule, view, options))
+        return view
+    return decorator
+
+
+# The PySql and RequestProfiler of the app handling the current request
+pysql = LocalProxy(lambda: current_app.extensions["pysql"])
+profiler = LocalProxy(lambda: current_app.extensions["request_profiler"])
+
+
+def create_app(config=None, yaml_path=YAML_PATH, secret_key=None):
+    """
+    :param config: overrides for db.yaml settings; defaults to the JSON in
+                   CMS_DB_CONFIG, e.g. '{"backend": "sqlite"}'
+    :param secret_key: session signing key; defaults to CMS_SECRET_KEY,
+                       and the app refuses to start without one
+    """
+    if config is None:
+        config = json.loads(os.environ.get("CMS_DB_CONFIG", "{}"))
+    app = Flask(__name__,
+                template_folder='../html_src/',
+                static_folder='../html_src/')
+    # Sessions are signed cookies: every worker must use the same key
+    app.secret_key = secret_key or os.environ.get("CMS_SECRET_KEY")
+    if not app.secret_key:
+        raise RuntimeError("CMS_SECRET_KEY is not set; every worker needs the same session key")
+    # Addresses / networks allowed to scrape /metrics, e.g. "127.0.0.1,10.0.0.0/8"
+    app.config["METRICS_ALLOW"] = [ipaddress.ip_network(entry.strip(), strict=False)
+                                   for entry in os.environ.get("CMS_METRICS_ALLOW", "127.0.0.1,::1").split(",")
+                                   if entry.strip()]
+
+    db = PySql(app, yaml_path, config)
+    app.extensions["pysql"] = db
+    # Per-route latency, DB / template / Python time and N+1 warnings, served at /metrics
+    app.extensions["request_profiler"] = RequestProfiler(app, db, exclude=("static", "token_feed", "metrics"))
+
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+    return app
+
 
-# Global variable for invoices
-invoice_id_global = ""
 # =========================
 # Login Configuration
 # =========================
 
 # Login page
-@app.route("/login", methods=["GET", "POST"])
+@route("/login", methods=["GET", "POST"])
 def login():
     error = None
     if request.method == "POST":
@@ -67,7 +116,7 @@ def login_required(f):
 # =========================
 # Register Page
 # =========================
-@app.route("/register", methods=["GET", "POST"])
+@route("/register", methods=["GET", "POST"])
 def register():
     error = None
     success = None
@@ -140,7 +189,7 @@ def register():
 # =========================
 # forget-password Page
 # =========================
-@app.route("/forgot-password", methods=["GET", "POST"])
+@route("/forgot-password", methods=["GET", "POST"])
 def forgot_password ():
     error = None
     success = None
@@ -206,97 +255,15 @@ def forgot_password ():
 # =========================
 # Index Page
 # =========================
-@app.route("/", methods=["GET"])
-@app.route("/index", methods=["GET"])
+@route("/", methods=["GET"])
+@route("/index", methods=["GET"])
 @login_required
 def index():
     username = session.get("username")  # get from session
-    #notifications
-    
-    low_stock_notifications = InventoryManager.get_low_stock_notifications(pysql)
-    low_stock_count = len(low_stock_notifications)
-    
-    sql= "SELECT COUNT(DISTINCT TokenID) FROM TokensSelectProducts"
-    pysql.run(sql)
-    token_assigned_products = pysql.scalar_result
-    
-    sql= """
-           SELECT COUNT(*) 
-          FROM Tokens t
-          LEFT JOIN TokensSelectProducts tsp ON t.TokenID = tsp.TokenID
-          WHERE t.Assigned = TRUE AND tsp.TokenID IS NULL
-          """
-    pysql.run(sql)
-    empty_tokens=pysql.scalar_result
-    
-    #analytic card
-    today = datetime.today().date()
-    yesterday = today - timedelta(days=1)
-    last_7_days = today - timedelta(days=7)
-    last_month = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
-    #count invoices
-    sql_today = "SELECT COUNT(*) FROM Invoices WHERE DATE(InvoiceDate) = %s"
-    pysql.run(sql_today, (today,))
-    sales_today=pysql.scalar_result
-     
-    sql_yesterday = "SELECT COUNT(*) FROM Invoices WHERE DATE(InvoiceDate) = %s"
-    pysql.run(sql_yesterday, (yesterday,))
-    sales_yesterday=pysql.scalar_result
-    
-    sql_last_7_days = "SELECT COUNT(*) FROM Invoices WHERE DATE(InvoiceDate) >= %s"
-    pysql.run(sql_last_7_days, (last_7_days,))
-    sales_last_7_days=pysql.scalar_result
-    
-    sql_last_month = "SELECT COUNT(*) FROM Invoices WHERE DATE(InvoiceDate) >= %s AND DATE(InvoiceDate) <= %s"
-    pysql.run(sql_last_month, (last_month, today))
-    sales_last_month=pysql.scalar_result
-    
-    sales_data = [sales_today, sales_yesterday, sales_last_7_days, sales_last_month]
-    print(sales_data)
-    
-    #Card Values
-    sql= "SELECT COUNT(*) FROM Products"
-    pysql.run(sql)
-    total_products = pysql.scalar_result
-    
-    sql="SELECT COUNT(*) FROM Invoices"
-    pysql.run(sql)
-    total_invoices = pysql.scalar_result
-    
-    sql= "SELECT COUNT(*) FROM Orders WHERE Delivered = FALSE AND Cancelled = FALSE"
-    pysql.run(sql)
-    total_placed = pysql.scalar_result
-    
-    sql= "SELECT COUNT(*) FROM Orders WHERE Delivered = TRUE"
-    pysql.run(sql)
-    total_received = pysql.scalar_result
-    
-    sql= "SELECT COUNT(*) FROM Orders WHERE Cancelled = TRUE"
-    pysql.run(sql)
-    total_cancelled = pysql.scalar_result
-    
-    sql= "SELECT COUNT(*) FROM TokensSelectProducts"
-    pysql.run(sql)
-    total_assigned_products = pysql.scalar_result
-    
-    
-    
-    
-    return render_template("index.html", 
-                           username=username,
-                           low_stock_count=low_stock_count,
-                           token_assigned_products=token_assigned_products,
-                           empty_tokens=empty_tokens,
-                           total_products=total_products,
-                           total_invoices=total_invoices,
-                           total_placed=total_placed,
-                           total_received=total_received,
-                           total_cancelled=total_cancelled,
-                           total_assigned_products=total_assigned_products,
-                           sales_data=sales_data
-                           )
-
-@app.route("/logout")
+    metrics = DashboardManager.get_dashboard_metrics(pysql)
+    return render_template("index.html", username=username, **metrics)
+
+@route("/logout")
 @login_required
 def logout():
     session.clear()
@@ -305,10 +272,10 @@ def logout():
 # =========================
 # Inventory Manager
 # =========================
-@app.route('/InventoryManager', methods=['GET', 'POST'])
+@route('/InventoryManager', methods=['GET', 'POST'])
 @login_required
 def inventory_manager():
-    options = ["AddProduct", "PlaceOrder", "ReceiveOrder", "CancelOrder",
+    options = ["AddProduct", "PlaceOrder", "UploadOrder", "ReceiveOrder", "CancelOrder",
                "ViewInventory", "ViewProducts", "OrderDetails",
                "OrdersBetweenDates", "TransactionLog", "ProductDateTransactionLog","EditProduct"]
     if request.method == 'POST':
@@ -319,7 +286,7 @@ def inventory_manager():
 
 
 # Add Product
-@app.route('/InventoryManager/AddProduct', methods=['GET', 'POST'])
+@route('/InventoryManager/AddProduct', methods=['GET', 'POST'])
 def inventory_manager_add_product():
     parent_url = request.args.get('parent', '/InventoryManager')
     if request.method == 'POST':
@@ -358,7 +325,7 @@ def inventory_manager_add_product():
 
 
 # View Products
-@app.route('/InventoryManager/ViewProducts', methods=['GET', 'POST'])
+@route('/InventoryManager/ViewProducts', methods=['GET', 'POST'])
 def inventory_manager_view_products():
     parent_url = request.args.get('parent', '/InventoryManager')
     products = ProductManager.get_all_products(pysql)
@@ -368,7 +335,7 @@ def inventory_manager_view_products():
 
 
 # View Inventory
-@app.route('/InventoryManager/ViewInventory', methods=['GET', 'POST'])
+@route('/InventoryManager/ViewInventory', methods=['GET', 'POST'])
 def inventory_manager_view_inventory():
     next_url = request.args.get('parent', '/InventoryManager')
     inventory = InventoryManager.get_inventory_details(pysql)
@@ -377,7 +344,7 @@ def inventory_manager_view_inventory():
     return render_template('/InventoryManager/inventory_manager_view_inventory.html', inventory=inventory, Title="Inventory Details", next_url=next_url)
 
 
-@app.route('/InventoryManager/PlaceOrder', methods=['GET', 'POST'])
+@route('/InventoryManager/PlaceOrder', methods=['GET', 'POST'])
 @login_required
 def place_order():
     if request.method == 'POST':
@@ -403,9 +370,7 @@ def place_order():
             return render_template('/InventoryManager/inventory_manager_failure.html', reason="Invalid Quantity" )
         else:
             return render_template('/InventoryManager/inventory_manager_success.html', result =f"Order ID: {order_id} placed successfully!")
-    pysql.run("SELECT ProductID, Name, Size, Color FROM Products")
-    products = pysql.result
-    print(products)
+    products = ProductManager.get_product_list(pysql)
 
     # Render Place Order form
     return render_template('/InventoryManager/inventory_manager_place_order.html', products = products)
@@ -413,7 +378,31 @@ def place_order():
 
 
 
-@app.route('/InventoryManager/ReceiveOrder', methods=['GET', 'POST'])
+# Upload a supplier order as CSV (ProductID,Size,Color,Quantity)
+@route('/InventoryManager/UploadOrder', methods=['GET', 'POST'])
+@login_required
+def upload_order():
+    if request.method == 'POST':
+        order_file = request.files.get("OrderFile")
+        if not order_file:
+            return render_template('/InventoryManager/inventory_manager_failure.html', reason="Order file is required")
+
+        # Read the upload lazily; lines go to the database chunk by chunk
+        reader = csv.DictReader(io.TextIOWrapper(order_file.stream, encoding="utf-8-sig", newline=""))
+        items = ((row.get("ProductID") or "", row.get("Size") or "", row.get("Color") or "", row.get("Quantity") or "")
+                 for row in reader)
+
+        order_id = OrderManager.place_orders_bulk(pysql, items)
+        if order_id == 1:
+            return render_template('/InventoryManager/inventory_manager_failure.html', reason="One or more products not found")
+        elif order_id == 2:
+            return render_template('/InventoryManager/inventory_manager_failure.html', reason="Invalid Quantity")
+        return render_template('/InventoryManager/inventory_manager_success.html', result=f"Order ID: {order_id} placed successfully!")
+
+    return render_template('/InventoryManager/inventory_manager_upload_order.html')
+
+
+@route('/InventoryManager/ReceiveOrder', methods=['GET', 'POST'])
 @login_required
 def receive_order():
     if request.method == 'POST':
@@ -456,7 +445,30 @@ def receive_order():
     # GET method – show a form to enter OrderID
     return render_template('/InventoryManager/inventory_manager_receive_order.html')
 
-@app.route('/InventoryManager/OrderDetails', methods=['GET', 'POST'])
+# Receive part of a supplier delivery (JSON)
+@route('/InventoryManager/ReceiveOrderLines', methods=['POST'])
+@login_required
+def receive_order_lines():
+    # {"OrderID": "ORD-0000000001", "Lines": [{"ProductID": "SAR-003", "Size": "L", "Color": "Golden", "Quantity": 10}, ...]}
+    data = request.get_json(silent=True) or {}
+    reasons = {2: "Order already delivered", 3: "Order cancelled", 4: "Order does not exist",
+               5: "Product not in this order", 6: "Invalid or excess quantity"}
+    try:
+        order_id = str(data['OrderID']).strip()
+        lines = [(str(line['ProductID']).strip(), str(line['Size']).strip(),
+                  str(line['Color']).strip(), Decimal(str(line['Quantity']).strip()))
+                 for line in data['Lines']]
+    except (KeyError, TypeError, InvalidOperation):
+        return jsonify(result=-1, reason="Invalid request"), 400
+    if any(not line[3].is_finite() or line[3] <= 0 for line in lines):
+        return jsonify(result=-1, reason="Invalid quantity"), 400
+
+    result = OrderManager.receive_order(pysql, order_id, lines)
+    if result == 0:
+        return jsonify(result=0, received=len(lines))
+    return jsonify(result=result, reason=reasons.get(result, "Error receiving order")), 409
+
+@route('/InventoryManager/OrderDetails', methods=['GET', 'POST'])
 @login_required
 def order_details():
     if request.method == 'POST':
@@ -485,7 +497,7 @@ def order_details():
     return render_template('/InventoryManager/inventory_manager_order_details.html')
 
 #cancel order
-@app.route('/InventoryManager/CancelOrder', methods=['GET', 'POST'])
+@route('/InventoryManager/CancelOrder', methods=['GET', 'POST'])
 @login_required
 def cancel_order_route():
     if request.method == 'POST':
@@ -523,7 +535,7 @@ def cancel_order_route():
     # GET request → show a form to input OrderID
     return render_template('/InventoryManager/inventory_manager_cancel_order.html')
 
-@app.route("/InventoryManager/EditProduct/<product_id>", methods=["GET", "POST"])
+@route("/InventoryManager/EditProduct/<product_id>", methods=["GET", "POST"])
 @login_required
 def edit_product(product_id):
     next_url = request.args.get('parent', '/InventoryManager/ViewProducts')
@@ -549,35 +561,41 @@ def edit_product(product_id):
     """
     pysql.run(sql, (name, description, price, discount, product_id, size, color))
     pysql.commit()
+    # Name/description apply to every size and color of the product
+    ProductManager.invalidate_catalog(pysql)
 
     return render_template('/InventoryManager/inventory_manager_success.html', result =f"Changes updated successfully!",  next_url=next_url)
 
 
+# Transaction Log
+@route('/InventoryManager/TransactionLog', methods=['GET', 'POST'])
+@login_required
+def inventory_manager_transaction_log():
+    # Rows are fetched one keyset page at a time while the page streams out
+    transactions = InventoryManager.iter_transactions(pysql)
+    return current_app.response_class(stream_with_context(stream_template(
+        '/InventoryManager/inventory_manager_transaction_log.html',
+        transactions=transactions
+    )))
+
+
 #notifications
-@app.route('/InventoryManager/LowStock', methods=['GET'])
+@route('/InventoryManager/LowStock', methods=['GET'])
 @login_required
 def inventory_manager_low_stock():
     next_url = request.args.get('parent', '/InventoryManager')
-    # Get all inventory details
-    inventory = InventoryManager.get_inventory_details(pysql)
-
-    if not inventory:
-        return render_template('/InventoryManager/inventory_manager_alert.html', result="Inventory empty", next_url=next_url)
-
-    # Filter low stock products: stored quantity <= minimum threshold
-    low_stock_inventory = [row for row in inventory if row[4] <= row[6]]  # row[4] = Stored Quantity, row[6] = Minimum Threshold
+    # Low stock products (stored quantity <= minimum threshold) from the low-stock index
+    low_stock_inventory = InventoryManager.get_low_stock_notifications(pysql)
 
     if not low_stock_inventory:
         return render_template('/InventoryManager/inventory_manager_alert.html', result="No low stock products", next_url=next_url)
 
     return render_template('/InventoryManager/inventory_manager_view_inventory.html', inventory=low_stock_inventory,  Title="Low Stock Products", next_url=next_url)
 
-@app.route("/TokenManager/PendingTokens", methods=["GET"])
+@route("/TokenManager/PendingTokens", methods=["GET"])
 @login_required
 def pending_tokens_dashboard():
-    sql_stmt = "SELECT DISTINCT `TokenID` FROM `TokensSelectProducts`"
-    pysql.run(sql_stmt)
-    pending_tokens = [row[0] for row in pysql.result]
+    pending_tokens = TokenManager.get_pending_tokens(pysql)
     print("Pending Tokens:", pending_tokens)
     return render_template(
         "TokenManager/pending_tokens.html",
@@ -585,17 +603,10 @@ def pending_tokens_dashboard():
         Title="Pending Tokens"
     )
     
-@app.route("/TokenManager/Empty", methods=["GET"])
+@route("/TokenManager/Empty", methods=["GET"])
 @login_required
 def empty_tokens_dashboard():
-    sql_stmt = """
-        SELECT t.TokenID
-        FROM Tokens t
-        LEFT JOIN TokensSelectProducts tsp ON t.TokenID = tsp.TokenID
-        WHERE t.Assigned = TRUE AND tsp.TokenID IS NULL
-    """
-    pysql.run(sql_stmt)
-    empty_tokens = [row[0] for row in pysql.result]
+    empty_tokens = TokenManager.get_empty_tokens(pysql)
     print("Empty Tokens:", empty_tokens)
     return render_template(
         "TokenManager/pending_tokens.html",
@@ -605,39 +616,26 @@ def empty_tokens_dashboard():
     
 #Stat-cards
 
-@app.route("/BillDesk/InvoicesDetails")
+@route("/BillDesk/InvoicesDetails")
 @login_required
 def invoices_details():
-
-    # ---------------------------
-    # 1. Get ALL rows
-    # ---------------------------
-    sql = """
-        SELECT p.InvoiceID, p.ProductID, p.Name, p.Size, p.Color,
-               p.Quantity, p.UnitPrice, i.InvoiceTotal
-        FROM ProductsInInvoices p
-        JOIN Invoices i on i.InvoiceID = p.InvoiceID
-        ORDER BY p.InvoiceID DESC
-        
-    """
-    pysql.run(sql)
-    invoice_products = pysql.result 
-    # list of rows
-    return render_template(
+    # Rows are fetched one keyset page at a time while the page streams out
+    invoice_products = InvoiceManager.iter_invoice_lines(pysql)
+    return current_app.response_class(stream_with_context(stream_template(
         "BillDesk/invoice_details.html",
         invoice_products=invoice_products
-    )
+    )))
 
 # Orders Placed
-@app.route('/Inventory/OrderedPlaced')
+@route('/Inventory/OrderedPlaced')
 @login_required
 def inventory_orders_placed():
     sql_stmt = """
         SELECT op.OrderID, op.ProductID, op.Size, op.Color, op.Quantity
-        FROM OrdersOfProducts op
-        JOIN Orders o ON TRIM(op.OrderID) = TRIM(o.OrderID)
+        FROM Orders o
+        JOIN OrdersOfProducts op ON op.OrderID = o.OrderID
         WHERE o.Delivered = FALSE AND o.Cancelled = FALSE
-        ORDER BY op.OrderID DESC
+        ORDER BY o.OrderID DESC
     """
     pysql.run(sql_stmt)
     items = pysql.result
@@ -646,15 +644,17 @@ def inventory_orders_placed():
 
 
 # Orders Received
-@app.route('/Inventory/OrderedReceived')
+@route('/Inventory/OrderedReceived')
 @login_required
 def inventory_orders_received():
+    # An order is never both delivered and cancelled; naming both flags lets
+    # Orders_Status_IDX hand back the orders already sorted by OrderID
     sql = """
         SELECT op.OrderID, op.ProductID, op.Size, op.Color, op.Quantity
-        FROM OrdersOfProducts op
-        JOIN Orders o ON TRIM(op.OrderID) = TRIM(o.OrderID)
-        WHERE o.Delivered = TRUE
-        ORDER BY op.OrderID DESC
+        FROM Orders o
+        JOIN OrdersOfProducts op ON op.OrderID = o.OrderID
+        WHERE o.Delivered = TRUE AND o.Cancelled = FALSE
+        ORDER BY o.OrderID DESC
     """
     pysql.run(sql)
     items = pysql.result
@@ -662,31 +662,27 @@ def inventory_orders_received():
 
 
 # Cancelled Orders
-@app.route('/Inventory/OrderedCancel')
+@route('/Inventory/OrderedCancel')
 @login_required
 def inventory_orders_cancel():
+    # An order is never both delivered and cancelled; naming both flags lets
+    # Orders_Status_IDX hand back the orders already sorted by OrderID
     sql = """
         SELECT op.OrderID, op.ProductID, op.Size, op.Color, op.Quantity
-        FROM OrdersOfProducts op
-        JOIN Orders o ON TRIM(op.OrderID) = TRIM(o.OrderID)
-        WHERE o.Cancelled = TRUE
-        ORDER BY op.OrderID DESC
+        FROM Orders o
+        JOIN OrdersOfProducts op ON op.OrderID = o.OrderID
+        WHERE o.Delivered = FALSE AND o.Cancelled = TRUE
+        ORDER BY o.OrderID DESC
     """
     pysql.run(sql)
     items = pysql.result
     return render_template('InventoryManager/orders_of_products.html', items=items, Title="Cancelled Orders")
 
 
-@app.route("/TokenManager/AssignedProducts", methods=["GET"])
+@route("/TokenManager/AssignedProducts", methods=["GET"])
 @login_required
 def assigned_products_dashboard():
-    sql_stmt = """
-        SELECT TokenID, ProductID, Size, Color, Quantity
-        FROM TokensSelectProducts
-        ORDER BY TokenID
-    """
-    pysql.run(sql_stmt)
-    assigned_products = pysql.result  # list of tuples
+    assigned_products = TokenManager.get_assigned_products(pysql)
     print("Assigned Products:", assigned_products)
 
     return render_template(
@@ -699,10 +695,10 @@ def assigned_products_dashboard():
 # =========================
 # Token Manager
 # =========================
-@app.route('/TokenManager', methods=['GET', 'POST'])
+@route('/TokenManager', methods=['GET', 'POST'])
 @login_required
 def token_manager():
-    options = ["GetTokenStatuses", "GetToken", "ReturnToken", "GetTokenDetails", "AddToken", "RemoveToken"]
+    options = ["GetTokenStatuses", "LiveTokens", "GetToken", "ReturnToken", "GetTokenDetails", "AddToken", "RemoveToken"]
     if request.method == 'POST':
         for option in options:
             if option in request.form:
@@ -710,7 +706,7 @@ def token_manager():
     return render_template('/TokenManager/token_manager.html')
 
 
-@app.route('/TokenManager/GetTokenStatuses', methods=['GET'])
+@route('/TokenManager/GetTokenStatuses', methods=['GET'])
 def token_manager_statuses():
     statuses = TokenManager.get_all_tokens_status(pysql)
     if not statuses:
@@ -718,7 +714,39 @@ def token_manager_statuses():
     return render_template('/TokenManager/token_manager_token_statuses.html', statuses=statuses)
 
 
-@app.route('/TokenManager/GetToken', methods=['GET'])
+@route('/TokenManager/LiveTokens', methods=['GET'])
+@login_required
+def live_tokens():
+    return render_template('/TokenManager/token_manager_live_tokens.html')
+
+
+# Server-sent events: a snapshot of every token, then one event per change
+@route('/TokenManager/Feed', methods=['GET'])
+@login_required
+def token_feed():
+    seq, tokens = TokenManager.get_token_feed_snapshot(pysql)
+    # The stream can stay open for hours; don't hold a pooled connection
+    pysql.release()
+
+    def events(seq, tokens):
+        yield f"id: {seq}\nevent: snapshot\ndata: {json.dumps(tokens)}\n\n"
+        while True:
+            changes = pysql.token_feed.wait(seq)
+            if changes is None or (not changes and pysql.token_feed.stale()):
+                seq, tokens = TokenManager.get_token_feed_snapshot(pysql)
+                pysql.release()
+                yield f"id: {seq}\nevent: snapshot\ndata: {json.dumps(tokens)}\n\n"
+            elif not changes:
+                yield ": keep-alive\n\n"
+            for seq, change in changes or ():
+                yield f"id: {seq}\nevent: {change['type']}\ndata: {json.dumps(change)}\n\n"
+
+    return current_app.response_class(stream_with_context(events(seq, tokens)),
+                              mimetype="text/event-stream",
+                              headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@route('/TokenManager/GetToken', methods=['GET'])
 def token_manager_get_token():
     next_url = request.args.get('parent', '/TokenManager')
     token_id = TokenManager.get_token(pysql)
@@ -727,7 +755,7 @@ def token_manager_get_token():
     return render_template('/TokenManager/token_manager_success.html', result=f"Token {token_id} assigned", next_url=next_url)
 
 
-@app.route('/TokenManager/ReturnToken', methods=['GET', 'POST'])
+@route('/TokenManager/ReturnToken', methods=['GET', 'POST'])
 def token_manager_return_token():
     if request.method == 'POST':
         token_id = request.form['TokenID']
@@ -745,7 +773,7 @@ def token_manager_return_token():
     return render_template('/TokenManager/token_manager_token_id_input.html')
 
 
-@app.route('/TokenManager/GetTokenDetails', methods=['GET', 'POST'])
+@route('/TokenManager/GetTokenDetails', methods=['GET', 'POST'])
 def token_manager_details():
     if request.method == 'POST':
         token_id = request.form['TokenID']
@@ -757,7 +785,7 @@ def token_manager_details():
     return render_template('TokenManager/token_manager_token_id_input.html')
 
 
-@app.route('/TokenManager/AddToken', methods=['GET'])
+@route('/TokenManager/AddToken', methods=['GET'])
 def token_manager_add_token():
     token_id = TokenManager.add_token(pysql)
     if token_id == 1:
@@ -765,7 +793,7 @@ def token_manager_add_token():
     return render_template('/TokenManager/token_manager_success.html', result=f"Token {token_id} added successfully")
 
 
-@app.route('/TokenManager/RemoveToken', methods=['GET', 'POST'])
+@route('/TokenManager/RemoveToken', methods=['GET', 'POST'])
 def token_manager_remove_token():
     if request.method == 'POST':
         token_id = request.form['TokenID']
@@ -786,7 +814,7 @@ def token_manager_remove_token():
 # =========================
 # Counter Operator
 # =========================
-@app.route('/CounterOperator', methods=['GET', 'POST'])
+@route('/CounterOperator', methods=['GET', 'POST'])
 @login_required
 def counter_operator():
     options = ["AddProductsToToken", "AddInventoryToCounter", "AddTokenToCounter"]
@@ -798,7 +826,7 @@ def counter_operator():
 
 
 # Add products from counter to token (with size/color)
-@app.route('/CounterOperator/AddProductsToToken', methods=['GET', 'POST'])
+@route('/CounterOperator/AddProductsToToken', methods=['GET', 'POST'])
 def counter_add_products_to_token():
     if request.method == 'POST':
         token_id = request.form['TokenID'].strip()
@@ -827,8 +855,28 @@ def counter_add_products_to_token():
     return render_template('/CounterOperator/counter_operator_add_products_to_token.html')
 
 
+# Add a burst of scanned products to a token in one transaction (JSON)
+@route('/CounterOperator/AddItemsToToken', methods=['POST'])
+def counter_add_items_to_token():
+    # {"TokenID": "TOK-01", "Items": [{"ProductID": "KUR-001", "Size": "S", "Color": "Red", "Quantity": 1}, ...]}
+    data = request.get_json(silent=True) or {}
+    reasons = {1: "Token not assigned", 2: "Invalid Quantity", 3: "Product not found", 4: "Insufficient Quantity"}
+    try:
+        token_id = str(data['TokenID']).strip()
+        items = [(str(item['ProductID']).strip(), str(item['Size']).strip(),
+                  str(item['Color']).strip(), float(item.get('Quantity', 1)))
+                 for item in data['Items']]
+    except (KeyError, TypeError, ValueError):
+        return jsonify(result=-1, reason="Invalid request"), 400
+
+    retval = CounterManager.add_items_to_token(pysql, token_id, items)
+    if retval == 0:
+        return jsonify(result=0, added=len(items))
+    return jsonify(result=retval, reason=reasons.get(retval, "Error adding products")), 409
+
+
 # Add products from inventory to counter (with size/color)
-@app.route('/CounterOperator/AddInventoryToCounter', methods=['GET', 'POST'])
+@route('/CounterOperator/AddInventoryToCounter', methods=['GET', 'POST'])
 def counter_add_inventory_to_counter():
     if request.method == 'POST':
         product_id = request.form['ProductID'].strip()
@@ -854,7 +902,7 @@ def counter_add_inventory_to_counter():
 
 
 # Add products from token to counter (return from customer)
-@app.route('/CounterOperator/AddTokenToCounter', methods=['GET', 'POST'])
+@route('/CounterOperator/AddTokenToCounter', methods=['GET', 'POST'])
 def counter_add_token_to_counter():
     if request.method == 'POST':
         token_id = request.form['TokenID'].strip()
@@ -878,7 +926,7 @@ def counter_add_token_to_counter():
 # =========================
 # Bill Desk
 # =========================
-@app.route('/BillDesk', methods=['GET', 'POST'])
+@route('/BillDesk', methods=['GET', 'POST'])
 @login_required
 def bill_desk():
     options = ["GenerateInvoice", "AdditionalDiscount", "ViewInvoice", "DateWiseInvoice"]
@@ -890,7 +938,7 @@ def bill_desk():
 
 
 # Generate Invoice (handles size/color)
-@app.route('/BillDesk/GenerateInvoice', methods=['GET', 'POST'])
+@route('/BillDesk/GenerateInvoice', methods=['GET', 'POST'])
 def generate_invoice():
     next_url = request.args.get('parent', '/BillDesk')
     tokens = TokenManager.get_all_tokens_status(pysql)
@@ -907,7 +955,7 @@ def generate_invoice():
     return render_template('/BillDesk/bill_desk_generate_invoice.html', tokens=tokens, next_url=next_url)
 
 # View Invoice Details
-@app.route('/BillDesk/ViewInvoice', methods=['GET', 'POST'])
+@route('/BillDesk/ViewInvoice', methods=['GET', 'POST'])
 @login_required
 def view_invoice():
     if request.method == 'POST':
@@ -928,7 +976,7 @@ def view_invoice():
     # GET request: show input form
     return render_template('/BillDesk/bill_desk_view_invoice_details.html')
 
-@app.route('/BillDesk/PrintInvoiceCopy', methods=['GET'])
+@route('/BillDesk/PrintInvoiceCopy', methods=['GET'])
 @login_required
 def print_invoice_copy():
     # Get invoice ID from query string
@@ -950,6 +998,40 @@ def print_invoice_copy():
     )
 
 
+# =========================
+# Diagnostics
+# =========================
+@route('/Diagnostics/PoolStats', methods=['GET'])
+@login_required
+def pool_stats():
+    return jsonify({"connections": pysql.pool_stats(),
+                    "tokens": TokenManager.get_token_pool_stats(pysql),
+                    "transaction_log": pysql.transaction_log.stats()})
+
+
+# Prometheus scrape endpoint: no login, only for the CMS_METRICS_ALLOW addresses
+@route('/metrics', methods=['GET'])
+def metrics():
+    try:
+        address = ipaddress.ip_address(request.remote_addr or "")
+    except ValueError:
+        address = None
+    if address is None or not any(address in network for network in current_app.config["METRICS_ALLOW"]):
+        return "Forbidden", 403
+    return current_app.response_class(profiler.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+@route('/Diagnostics/QueryStats', methods=['GET'])
+@login_required
+def query_stats():
+    top = request.args.get('top', 20, type=int)
+    if request.args.get('reset'):
+        summary = pysql.stats.summary(top)
+        pysql.stats.reset()
+        return jsonify(summary)
+    return jsonify(pysql.stats.summary(top))
+
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Development server only: a fixed key when CMS_SECRET_KEY is not set
+    create_app(secret_key=os.environ.get("CMS_SECRET_KEY", "dev")).run(debug=True, threaded=True)
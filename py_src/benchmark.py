@@ -0,0 +1,187 @@
+# py_src/benchmark.py
+#
+# Runs the CmsLib managers against the embedded SQLite backend, so a
+# benchmark or profiling session needs no MySQL server:
+# > python py_src/benchmark.py [--variants 2000] [--tokens 50] [--checkouts 500] [--db bench.sqlite]
+#
+# The helpers here (open_store, seed_store, seed_history, percentile_ms,
+# checkout) are shared by load_test.py and microbench.py.
+
+import sys
+import os
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import product
+from string import ascii_uppercase
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import Flask
+from CmsLib import *
+from CmsLib.TransactionLog import INSERT_SQL
+
+YAML_PATH = os.path.join(os.path.dirname(__file__), "../CmsLib/db.yaml")
+SIZES = ["S", "M", "L", "XL", "XXL"]
+COLORS = ["Red", "Blue", "Black", "Green", "Pink", "Golden", "White", "Maroon"]
+NAMES = ["Women's Kurti", "Silk Saree", "Ladies Top", "Long Skirt", "Party Dress", "Girls Frock"]
+
+
+# ---------- STORE ----------
+
+def open_store(db=":memory:", **config):
+    """(app, pysql) on an embedded SQLite database; config overrides db.yaml"""
+    app = Flask(__name__)
+    settings = {"backend": "sqlite", "sqlite_path": db, "slow_query_log": None}
+    settings.update(config)
+    return app, PySql(app, YAML_PATH, settings)
+
+
+def variant_keys(count):
+    """count distinct (ProductID, Size, Color) keys in a stable order"""
+    keys = []
+    prefixes = ("".join(letters) for letters in product(ascii_uppercase, repeat=3))
+    for prefix in prefixes:
+        for number in range(1000):
+            for size in SIZES:
+                if len(keys) == count:
+                    return keys
+                keys.append((f"{prefix}-{number:03d}", size, COLORS[number % len(COLORS)]))
+    return keys
+
+
+def seed_store(pysql, variants=2000, tokens=50, stock=1000, seed=7):
+    """
+    Catalog of `variants` products, each with `stock` pieces received through
+    a supplier order and half of it moved to the counter, plus `tokens` tokens.
+    Returns the variant keys.
+    """
+    rng = random.Random(seed)
+    keys = variant_keys(variants)
+
+    rows = [(pid, NAMES[i % len(NAMES)], "Benchmark item", str(rng.randint(200, 9000)),
+             size, color, str(rng.choice([0, 0, 5, 10, 12.5])))
+            for i, (pid, size, color) in enumerate(keys)]
+    report = ProductManager.add_products_bulk(pysql, rows)
+    if report["errors"]:
+        raise RuntimeError(f"Seeding rejected {len(report['errors'])} products: {report['errors'][:5]}")
+
+    order_id = OrderManager.place_orders_bulk(pysql, ((*key, stock) for key in keys))
+    OrderManager.receive_order(pysql, order_id)
+
+    # Move half of every variant to the counter in one statement
+    pysql.run("UPDATE Inventory SET DisplayedQuantity = DisplayedQuantity + %s, "
+              "StoredQuantity = StoredQuantity - %s", (stock // 2, stock // 2))
+    pysql.run_many("INSERT INTO Tokens (TokenID) VALUES (%s)",
+                   [(pysql.token_pool.format(i),) for i in range(tokens)])
+    pysql.commit()
+    return keys
+
+
+def seed_history(pysql, keys, invoices=0, log_rows=0, days=365, chunk=10000, seed=11):
+    """
+    Bulk-loads past invoices (1-4 lines each) and inventory transaction log
+    rows spread over the last `days` days, so reports and date-range queries
+    run against tables of a realistic size. IDs come from ranges reserved in
+    the Sequences table, so live checkouts never collide with them.
+    """
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    span = days * 86400
+
+    sql_stmt = "SELECT ProductID, Name, Size, Color, UnitPrice, CurrentDiscount FROM Products"
+    pysql.run(sql_stmt)
+    products = pysql.result
+
+    invoice_ids = pysql.sequencer.reserve("InvoiceID", invoices) if invoices else ()
+    for start in range(0, len(invoice_ids), chunk):
+        headers, lines = [], []
+        for number in invoice_ids[start:start + chunk]:
+            invoice_id = f"INV-{number:010d}"
+            total = Decimal(0)
+            for product_id, name, size, color, price, discount in rng.sample(products, rng.randint(1, 4)):
+                quantity = rng.randint(1, 3)
+                lines.append((invoice_id, product_id, name, size, color, quantity, price, Decimal("0.00"), discount))
+                total += price * quantity
+            headers.append((invoice_id, now - timedelta(seconds=rng.randrange(span)), total,
+                            Decimal(0), rng.choice(["cash", "card", "wallet"])))
+        pysql.run_many("INSERT INTO Invoices(InvoiceID, InvoiceDate, InvoiceTotal, DiscountGiven, PaymentMode) "
+                       "VALUES (%s, %s, %s, %s, %s)", headers)
+        pysql.run_many("INSERT INTO ProductsInInvoices (InvoiceID, ProductID, Name, Size, Color, "
+                       "Quantity, UnitPrice, TaxAmount, Discount) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)", lines)
+        pysql.commit()
+
+    types = ["COUNTER_SUB", "COUNTER_ADD", "INVENTORY_SUB", "INVENTORY_ADD", "INVENTORY_TO_COUNTER"]
+    transaction_ids = pysql.sequencer.reserve("TransactionID", log_rows) if log_rows else ()
+    for start in range(0, len(transaction_ids), chunk):
+        rows = [(f"TRC-{number:010d}", rng.choice(types), *rng.choice(keys), rng.randint(1, 20),
+                 now - timedelta(seconds=rng.randrange(span)))
+                for number in transaction_ids[start:start + chunk]]
+        pysql.run_many(INSERT_SQL, rows)
+        pysql.commit()
+
+
+def percentile_ms(ordered, pct):
+    """Nearest-rank percentile of sorted durations in seconds, in milliseconds"""
+    if not ordered:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(ordered) + 0.5)) - 1, 0)
+    return round(ordered[min(rank, len(ordered) - 1)] * 1000, 3)
+
+
+def checkout(pysql, rng, keys, max_items=6):
+    """One customer: take a token, scan items, bill it. Returns the invoice ID."""
+    token_id = TokenManager.get_token(pysql)
+    if not token_id:
+        raise RuntimeError("No free token")
+    items = [(*rng.choice(keys), rng.randint(1, 2)) for _ in range(rng.randint(1, max_items))]
+    retval = CounterManager.add_items_to_token(pysql, token_id, items)
+    if retval != 0:
+        raise RuntimeError(f"add_items_to_token returned {retval}")
+    invoice_id = InvoiceManager.generate_invoice(pysql, [token_id], "cash")
+    if not str(invoice_id).startswith("INV-"):
+        raise RuntimeError(f"generate_invoice returned {invoice_id}")
+    return invoice_id
+
+
+# ---------- MAIN ----------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the store on embedded SQLite and time it")
+    parser.add_argument("--variants", type=int, default=2000)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--checkouts", type=int, default=500)
+    parser.add_argument("--db", default=":memory:", help="SQLite file (default: in memory)")
+    parser.add_argument("--top", type=int, default=15, help="rows per table in the report")
+    args = parser.parse_args()
+
+    app, pysql = open_store(args.db)
+
+    start = time.perf_counter()
+    keys = seed_store(pysql, args.variants, args.tokens)
+    print(f"Seeded {len(keys)} variants and {args.tokens} tokens in {time.perf_counter() - start:.2f}s")
+
+    pysql.stats.reset()
+    rng = random.Random(13)
+    start = time.perf_counter()
+    for _ in range(args.checkouts):
+        checkout(pysql, rng, keys)
+    elapsed = time.perf_counter() - start
+
+    # Read paths
+    DashboardManager.get_dashboard_metrics(pysql)
+    InventoryManager.get_low_stock_notifications(pysql)
+    sum(1 for _ in InventoryManager.iter_transactions(pysql))
+    sum(1 for _ in InvoiceManager.iter_invoice_lines(pysql))
+
+    summary = pysql.stats.summary(args.top)
+    print(f"{args.checkouts} checkouts in {elapsed:.2f}s "
+          f"({args.checkouts / elapsed:.0f}/s, {summary['total_queries'] / max(args.checkouts, 1):.1f} queries each)")
+    print(f"\n{'method':<55}{'calls':>8}{'total ms':>12}{'max ms':>10}")
+    for bucket in summary["methods"]:
+        print(f"{bucket['name']:<55}{bucket['calls']:>8}{bucket['total_ms']:>12.1f}{bucket['max_ms']:>10.2f}")
+    print(f"\n{'statement':<90}{'calls':>8}{'total ms':>12}")
+    for bucket in summary["statements"]:
+        print(f"{bucket['name'][:88]:<90}{bucket['calls']:>8}{bucket['total_ms']:>12.1f}")
+    pysql.close()
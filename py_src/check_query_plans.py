@@ -0,0 +1,159 @@
+# py_src/check_query_plans.py
+#
+# Query-plan regression check. Seeds a store, records every statement the
+# managers and app routes run (every public manager method once, every GET
+# page, the login and edit-product forms), then EXPLAINs each one and fails
+# when a statement scans a table above --max-scan-rows rows or sorts without
+# an index.
+# > python py_src/check_query_plans.py [--variants 20000] [--max-scan-rows 1000]
+#                                      [--registry queries.json] [--config '{"backend": "mysql", ...}']
+#
+# Exits with status 1 when a statement outside ALLOWED has a problem, or
+# when an SQL literal in CmsLib/*.py or py_src/app.py never ran and is not
+# listed in UNEXERCISED_ALLOWED, so new statements need coverage here.
+
+import sys
+import os
+import glob
+import re
+import hashlib
+import json
+import argparse
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from benchmark import seed_store, seed_history
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SOURCES = [path for path in sorted(glob.glob(os.path.join(ROOT, "CmsLib", "*.py")))
+           if not path.endswith("SqliteBackend.py")] + [os.path.join(ROOT, "py_src", "app.py")]
+
+# Callers (manager method or route endpoint) whose whole-table reads or
+# sorts are the point of the call, with the reason
+ALLOWED = {
+    "ProductManager.__get_all_products": "lists every product",
+    "ProductManager.__get_product_list": "lists every product",
+    "InventoryManager.__get_inventory_details": "lists every inventory row",
+    "InventoryManager.__get_transactions": "exports the whole log; pages use get_transactions_page",
+    "InventoryManager.__get_low_stock_notifications": "reloads the low-stock index every low_stock_resync seconds",
+    "OrderManager.__get_orders": "lists every order, newest first",
+    "DashboardManager.__get_dashboard_metrics": "index page totals, cached for dashboard_ttl seconds",
+    "InvoiceManager.__get_invoice_lines_page": "sorts the lines of one page of invoices",
+}
+
+# SQL literals this check cannot run, as (file, start of the fingerprint),
+# with the reason
+UNEXERCISED_ALLOWED = {
+    ("IdSequencer.py", "UPDATE Sequences"): "ID block reservation, on the sequencer's own connection",
+    ("IdSequencer.py", "INSERT IGNORE INTO Sequences"): "ID block reservation, on the sequencer's own connection",
+    ("IdSequencer.py", "SELECT LAST_INSERT_ID()"): "ID block reservation, on the sequencer's own connection",
+    ("TransactionLog.py", "SELECT CURRENT_TIMESTAMP"): "background writer's own connection (MySQL only)",
+    ("app.py", "UPDATE Users SET PasswordHash"): "forgot_password form; its template is in html_src/Login",
+}
+
+# Endpoints not requested: streams that never end, session teardown, and the
+# login pages (their templates live in html_src/Login, not login/)
+SKIP_ENDPOINTS = {"static", "token_feed", "logout", "login", "register", "forgot_password"}
+
+
+def exercise_routes(flask_app, pysql, product_key, invoice_id):
+    pysql.run("INSERT INTO Users (Username, PasswordHash) VALUES (%s, %s)",
+              ("plancheck", hashlib.sha256(b"plancheck").hexdigest()))
+    pysql.commit()
+    client = flask_app.test_client()
+    client.post("/login", data={"username": "plancheck", "password": "plancheck"})
+
+    samples = {"product_id": product_key[0]}
+    for rule in flask_app.url_map.iter_rules():
+        if rule.endpoint in SKIP_ENDPOINTS or "GET" not in rule.methods or set(rule.arguments) - set(samples):
+            continue
+        url = rule.build({name: samples[name] for name in rule.arguments})[1]
+        response = client.get(url, query_string={"InvoiceID": invoice_id})
+        response.get_data()     # drain streamed pages
+    product_id, size, color = product_key
+    client.post(f"/InventoryManager/EditProduct/{product_id}",
+                data={"name": "Ladies Top", "description": "Plan check", "price": "999",
+                      "size": size, "color": color, "discount": "0"})
+
+
+def exercise_managers(pysql, keys, seed):
+    from microbench import Bench, CASES
+    bench = Bench(pysql, keys, seed)
+    for method, heavy, prepare in CASES:
+        call, args = prepare(bench)
+        call(*args)
+
+
+# ---------- MAIN ----------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN every statement the store runs")
+    parser.add_argument("--variants", type=int, default=20000)
+    parser.add_argument("--invoices", type=int, default=20000)
+    parser.add_argument("--log-rows", type=int, default=100000)
+    parser.add_argument("--max-scan-rows", type=int, default=1000, help="largest table a statement may scan")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", default=":memory:", help="SQLite file (default: in memory)")
+    parser.add_argument("--config", default="{}", help="JSON overrides for db.yaml")
+    parser.add_argument("--registry", help="write every statement with its plan and callers here (JSON)")
+    args = parser.parse_args()
+
+    config = {"backend": "sqlite", "sqlite_path": args.db, "slow_query_log": None, "slow_query_ms": None}
+    config.update(json.loads(args.config))
+    from app import create_app
+    from CmsLib import QueryRegistry, PlanChecker
+    flask_app = create_app(config, secret_key=os.urandom(16).hex())
+    pysql = flask_app.extensions["pysql"]
+
+    keys = seed_store(pysql, args.variants, 60, seed=args.seed)
+    seed_history(pysql, keys, args.invoices, args.log_rows, seed=args.seed)
+    pysql.run("SELECT MIN(InvoiceID) FROM Invoices")
+    invoice_id = pysql.scalar_result
+
+    registry = pysql.query_registry = QueryRegistry()
+    exercise_managers(pysql, keys, args.seed)
+    exercise_routes(flask_app, pysql, keys[0], invoice_id)
+    pysql.query_registry = None
+
+    checker = PlanChecker(pysql, max_scan_rows=args.max_scan_rows)
+    statements = registry.statements()
+    failed = 0
+    for entry in statements:
+        if not checker.explainable(entry):
+            continue
+        entry["plan"], entry["problems"] = checker.check(entry)
+        if not entry["problems"]:
+            continue
+        allowed = [ALLOWED[caller] for caller in entry["callers"] if caller in ALLOWED]
+        if len(allowed) == len(entry["callers"]):
+            entry["allowed"] = allowed
+            continue
+        failed += 1
+        print(f"\n{', '.join(entry['callers'])}\n  {entry['fingerprint'][:160]}")
+        for problem in entry["problems"]:
+            print(f"  -> {problem}")
+    pysql.release()
+
+    # Literals built into larger statements (format(), +) only match up to
+    # their first placeholder
+    seen = [entry["fingerprint"] for entry in statements]
+    unexercised = {fp: location for fp, location in QueryRegistry.scan_sources(SOURCES).items()
+                   if not any(re.split(r"[?{(]", fp)[0].strip() in runtime_fp for runtime_fp in seen)}
+    uncovered = 0
+    if unexercised:
+        print(f"\nSQL literals not run by this check ({len(unexercised)}):")
+        for fp, location in sorted(unexercised.items(), key=lambda item: item[1]):
+            file_name = os.path.basename(location.rsplit(":", 1)[0])
+            reason = next((reason for (allowed_file, start), reason in UNEXERCISED_ALLOWED.items()
+                           if allowed_file == file_name and fp.startswith(start)), None)
+            if reason is None:
+                uncovered += 1
+                reason = "NOT ALLOWED"
+            print(f"  {os.path.relpath(location, ROOT)}  {fp[:100]}\n    -> {reason}")
+
+    if args.registry:
+        with open(args.registry, "w") as out_file:
+            json.dump(statements, out_file, indent=2, sort_keys=True, default=str)
+            out_file.write("\n")
+    print(f"\n{len(statements)} statements recorded, {failed} with plan problems, "
+          f"{uncovered} unexercised SQL literals without a reason")
+    sys.exit(1 if failed or uncovered else 0)
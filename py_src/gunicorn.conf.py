@@ -0,0 +1,44 @@
+# py_src/gunicorn.conf.py
+#
+# Multi-worker deployment. Each worker process calls create_app() after the
+# fork and gets its own connection pool, caches and ID blocks; invoices,
+# tokens and stock are coordinated through the database.
+# > pip install gunicorn
+# > gunicorn -c py_src/gunicorn.conf.py
+#
+# Environment:
+#   CMS_WORKERS     worker processes (default: one per CPU core)
+#   CMS_THREADS     request threads per worker (default 8)
+#   CMS_BIND        address to listen on (default 0.0.0.0:8000)
+#   CMS_DB_CONFIG   JSON overrides for CmsLib/db.yaml
+#   CMS_SECRET_KEY  session key, the same for every worker (required)
+#   CMS_METRICS_ALLOW  addresses / networks that may read /metrics
+#                      (default 127.0.0.1,::1)
+#
+# Each worker opens up to pool_max_size connections (db.yaml), so keep
+# CMS_WORKERS * pool_max_size below the MySQL server's max_connections and
+# pool_max_size at or above CMS_THREADS.
+
+import multiprocessing
+import os
+
+wsgi_app = "app:create_app()"
+chdir = os.path.dirname(os.path.abspath(__file__))
+
+bind = os.environ.get("CMS_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("CMS_WORKERS", multiprocessing.cpu_count()))
+
+# Request threads. Each open live token feed (/TokenManager/Feed, a
+# server-sent event stream) holds one of these threads for as long as the
+# screen stays open, so CMS_THREADS must cover the feed screens per worker
+# plus the counters checking out at the same time; once feeds hold every
+# thread, other requests queue behind them.
+worker_class = "gthread"
+threads = int(os.environ.get("CMS_THREADS", 8))
+
+# Build the app in each worker, not once in the master before forking
+preload_app = False
+
+# The token feed sends a keep-alive at least every 15 seconds
+timeout = 60
+graceful_timeout = 30
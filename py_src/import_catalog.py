@@ -0,0 +1,32 @@
+# py_src/import_catalog.py
+#
+# Bulk-load a season's catalog:
+# > python py_src/import_catalog.py new_season.csv [--chunk-size 1000]
+#
+# CSV header / JSONL keys: ProductID, Name, Description, UnitPrice, Size, Color, Discount
+
+import sys
+import os
+import time
+import argparse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from py_src.app import create_app
+from CmsLib.CatalogImporter import import_catalog, IMPORT_ERRORS
+
+parser = argparse.ArgumentParser(description="Import products from a CSV or JSONL file")
+parser.add_argument("path", help="catalog file (.csv, .jsonl)")
+parser.add_argument("--chunk-size", type=int, default=1000, help="rows per transaction")
+args = parser.parse_args()
+
+# Offline script: no session cookie outlives this process
+app = create_app(secret_key=os.urandom(16).hex())
+pysql = app.extensions["pysql"]
+with app.app_context():
+    start = time.perf_counter()
+    report = import_catalog(pysql, args.path, args.chunk_size)
+    elapsed = time.perf_counter() - start
+
+    for row_number, code in report["errors"]:
+        print(f"Row {row_number}: {IMPORT_ERRORS.get(code, 'Error')}")
+    print(f"Imported {report['imported']} products, {len(report['errors'])} rejected in {elapsed:.2f}s")
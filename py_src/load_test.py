@@ -0,0 +1,236 @@
+# py_src/load_test.py
+#
+# End-to-end checkout load test. Seeds a synthetic store, then simulated
+# counters drive the real Flask routes through the test client:
+#   GetToken -> AddItemsToToken -> GenerateInvoice (or ReturnToken when the
+#   customer walks away without buying)
+# > python py_src/load_test.py [--counters 4] [--checkouts 2000] [--variants 20000] [--tokens 100]
+#                              [--invoices 1000000] [--log-rows 5000000] [--db load.sqlite]
+#                              [--out report.json] [--compare previous.json]
+#
+# Runs on the embedded SQLite backend by default (writes are serialised there,
+# so counters mostly measure per-checkout cost). --config '{"backend": "mysql",
+# "mysql_db": "CMS_LOAD"}' points it at an empty scratch MySQL schema instead.
+# The JSON report has sorted keys so two runs can be diffed or --compare'd.
+
+import sys
+import os
+import re
+import json
+import time
+import random
+import argparse
+import threading
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from benchmark import seed_store, seed_history, percentile_ms
+
+PERCENTILES = [50, 95, 99]
+STEPS = ["checkout", "get_token", "scan", "invoice", "return_token"]
+
+
+def latency_summary(samples):
+    ordered = sorted(samples)
+    summary = {f"p{pct}": percentile_ms(ordered, pct) for pct in PERCENTILES}
+    summary["max"] = round(ordered[-1] * 1000, 3) if ordered else 0.0
+    summary["mean"] = round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0
+    summary["count"] = len(ordered)
+    return summary
+
+
+# ---------- SIMULATED COUNTER ----------
+
+class Counter(threading.Thread):
+    """One till: takes checkouts off the shared budget until it runs out"""
+
+    def __init__(self, flask_app, keys, budget, abandon, max_items, seed):
+        super().__init__(daemon=True)
+        self.client = flask_app.test_client()
+        self.keys = keys
+        self.budget = budget
+        self.abandon = abandon
+        self.max_items = max_items
+        self.rng = random.Random(seed)
+        self.samples = {step: [] for step in STEPS}
+        self.completed = 0
+        self.failures = {}
+
+    def __timed(self, step, call):
+        start = time.perf_counter()
+        response = call()
+        self.samples[step].append(time.perf_counter() - start)
+        return response
+
+    def __fail(self, reason):
+        self.failures[reason] = self.failures.get(reason, 0) + 1
+
+    def checkout(self):
+        start = time.perf_counter()
+        response = self.__timed("get_token", lambda: self.client.get("/TokenManager/GetToken"))
+        match = re.search(r"Token (TOK-\d+) assigned", response.get_data(as_text=True))
+        if not match:
+            self.__fail("no token")
+            time.sleep(0.01)
+            return
+        token_id = match.group(1)
+
+        if self.rng.random() < self.abandon:
+            response = self.__timed("return_token", lambda: self.client.post(
+                "/TokenManager/ReturnToken", data={"TokenID": token_id}))
+            if "successfully" not in response.get_data(as_text=True):
+                self.__fail("return token")
+            return
+
+        items = [{"ProductID": product_id, "Size": size, "Color": color, "Quantity": self.rng.randint(1, 2)}
+                 for product_id, size, color in
+                 (self.rng.choice(self.keys) for _ in range(self.rng.randint(1, self.max_items)))]
+        response = self.__timed("scan", lambda: self.client.post(
+            "/CounterOperator/AddItemsToToken", json={"TokenID": token_id, "Items": items}))
+        if response.status_code != 200:
+            self.__fail(f"scan: {response.get_json().get('reason')}")
+            self.client.post("/TokenManager/ReturnToken", data={"TokenID": token_id})
+            return
+
+        response = self.__timed("invoice", lambda: self.client.post(
+            "/BillDesk/GenerateInvoice", data={"Select[]": token_id, "PaymentMode": "cash"}))
+        if not re.search(r"Invoice INV-\d+ generated", response.get_data(as_text=True)):
+            self.__fail("invoice")
+            return
+        self.samples["checkout"].append(time.perf_counter() - start)
+        self.completed += 1
+
+    def run(self):
+        while self.budget.take():
+            self.checkout()
+
+
+class Budget:
+    def __init__(self, total):
+        self.__left = total
+        self.__lock = threading.Lock()
+
+    def take(self):
+        with self.__lock:
+            if self.__left <= 0:
+                return False
+            self.__left -= 1
+            return True
+
+
+def run_counters(flask_app, keys, checkouts, counters, abandon, max_items, seed):
+    budget = Budget(checkouts)
+    threads = [Counter(flask_app, keys, budget, abandon, max_items, seed + i) for i in range(counters)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return threads, time.perf_counter() - start
+
+
+# ---------- REPORT ----------
+
+def build_report(args, threads, elapsed, summary):
+    samples = {step: [s for thread in threads for s in thread.samples[step]] for step in STEPS}
+    completed = sum(thread.completed for thread in threads)
+    failures = {}
+    for thread in threads:
+        for reason, count in thread.failures.items():
+            failures[reason] = failures.get(reason, 0) + count
+
+    routes = {}
+    for bucket in summary["routes"]:
+        requests = bucket["requests"] or 1
+        routes[bucket["name"]] = {"requests": bucket["requests"],
+                                  "queries_per_request": round(bucket["calls"] / requests, 2),
+                                  "db_ms_per_request": round(bucket["total_ms"] / requests, 3)}
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("out", "compare")},
+        "completed": completed,
+        "failures": failures,
+        "elapsed_s": round(elapsed, 3),
+        "checkouts_per_s": round(completed / elapsed, 2) if elapsed else 0.0,
+        "queries_per_checkout": round(summary["total_queries"] / completed, 2) if completed else 0.0,
+        "db_ms_per_checkout": round(summary["total_ms"] / completed, 3) if completed else 0.0,
+        "latency_ms": {step: latency_summary(samples[step]) for step in STEPS},
+        "routes": routes,
+    }
+
+
+def print_report(report, previous=None):
+    def delta(value, old):
+        if old in (None, 0):
+            return ""
+        return f"  ({(value - old) / old * 100:+.1f}%)"
+
+    previous = previous or {}
+    print(f"\nCompleted {report['completed']} checkouts in {report['elapsed_s']}s, failures: {report['failures'] or 'none'}")
+    for key in ["checkouts_per_s", "queries_per_checkout", "db_ms_per_checkout"]:
+        print(f"{key:<24}{report[key]:>12}{delta(report[key], previous.get(key))}")
+
+    print(f"\n{'latency ms':<16}" + "".join(f"{name:>12}" for name in ["p50", "p95", "p99", "max", "count"]))
+    for step in STEPS:
+        row = report["latency_ms"][step]
+        old = previous.get("latency_ms", {}).get(step, {})
+        print(f"{step:<16}" + "".join(f"{row[name]:>12}" for name in ["p50", "p95", "p99", "max", "count"]))
+        changes = [f"p{pct} {delta(row[f'p{pct}'], old.get(f'p{pct}')).strip()}"
+                   for pct in PERCENTILES if old.get(f"p{pct}")]
+        if changes:
+            print(f"{'':<16}vs previous: " + ", ".join(changes))
+
+    print(f"\n{'route':<45}{'requests':>10}{'queries/req':>14}{'db ms/req':>12}")
+    for name, row in sorted(report["routes"].items()):
+        print(f"{name:<45}{row['requests']:>10}{row['queries_per_request']:>14}{row['db_ms_per_request']:>12}")
+
+
+# ---------- MAIN ----------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive the checkout routes from concurrent simulated counters")
+    parser.add_argument("--counters", type=int, default=4, help="concurrent simulated counters")
+    parser.add_argument("--checkouts", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=50, help="checkouts run before measuring")
+    parser.add_argument("--abandon", type=float, default=0.05, help="share of customers who return the token unbilled")
+    parser.add_argument("--max-items", type=int, default=6, help="most items scanned per customer")
+    parser.add_argument("--variants", type=int, default=20000)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--invoices", type=int, default=20000, help="past invoices to seed (e.g. 1000000)")
+    parser.add_argument("--log-rows", type=int, default=100000, help="past transaction log rows (e.g. 5000000)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", default=":memory:", help="SQLite file (default: in memory)")
+    parser.add_argument("--config", default="{}", help="JSON overrides for db.yaml")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", help="previous JSON report to show changes against")
+    args = parser.parse_args()
+
+    config = {"backend": "sqlite", "sqlite_path": args.db, "slow_query_log": None}
+    config.update(json.loads(args.config))
+    from app import create_app
+    flask_app = create_app(config, secret_key=os.urandom(16).hex())
+    pysql = flask_app.extensions["pysql"]
+    if args.tokens > pysql.token_pool.size:
+        parser.error(f"--tokens is above token_pool_size ({pysql.token_pool.size})")
+
+    start = time.perf_counter()
+    keys = seed_store(pysql, args.variants, args.tokens, seed=args.seed)
+    seed_history(pysql, keys, args.invoices, args.log_rows, seed=args.seed)
+    print(f"Seeded {len(keys)} variants, {args.tokens} tokens, {args.invoices} invoices and "
+          f"{args.log_rows} log rows in {time.perf_counter() - start:.1f}s")
+
+    run_counters(flask_app, keys, args.warmup, args.counters, args.abandon, args.max_items, args.seed)
+    pysql.stats.reset()
+    threads, elapsed = run_counters(flask_app, keys, args.checkouts, args.counters,
+                                    args.abandon, args.max_items, args.seed + 1000)
+    report = build_report(args, threads, elapsed, pysql.stats.summary(None))
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as previous_file:
+            previous = json.load(previous_file)
+    print_report(report, previous)
+    if args.out:
+        with open(args.out, "w") as out_file:
+            json.dump(report, out_file, indent=2, sort_keys=True)
+            out_file.write("\n")
+        print(f"\nReport written to {args.out}")
+    pysql.close()
@@ -4,7 +4,7 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from py_src.app import app        # Import your Flask app
+from py_src.app import create_app  # Import your Flask app factory
 from CmsLib import *              # Import all CMS modules
 import hashlib
 
@@ -17,13 +17,14 @@ import hashlib
 # > source ./sql_src/cms_ddl.sql
 # ============================================================
 
+# Offline script: no session cookie outlives this process
+app = create_app(secret_key=os.urandom(16).hex())
 with app.app_context():
 
     # -----------------------------
     # Initialize PySql
     # -----------------------------
-    yaml_path = os.path.join(os.path.dirname(__file__), "../CmsLib/db.yaml")
-    pysql = PySql(app, yaml_path)
+    pysql = app.extensions["pysql"]
     # -----------------------------
     # 1. Add admin user
     # -----------------------------
@@ -74,7 +75,7 @@ with app.app_context():
     pysql.run("DELETE FROM TokensSelectProducts")
     pysql.run("DELETE FROM Tokens")
     
-    token_ids = [("TOK-" + format(i, "02d"),) for i in range(20)]
+    token_ids = [(pysql.token_pool.format(i),) for i in range(20)]
     pysql.run_many("INSERT INTO Tokens (TokenID) VALUES (%s)", token_ids)
 
     tok1 = TokenManager.get_token(pysql)
@@ -0,0 +1,363 @@
+# py_src/microbench.py
+#
+# Times every public wrapper of the CmsLib managers at several store sizes
+# on the embedded SQLite backend and counts the statements each call sends
+# to the database (round trips, from QueryStats; ID block reservations use
+# their own connection and are not counted).
+# > python py_src/microbench.py [--sizes 1000,10000,50000] [--repeat 30] [--only Token]
+#                               [--out bench.json] [--compare previous.json]
+#
+# Each size gets a fresh store with `size` variants, size * --invoice-ratio
+# past invoices and size * --log-ratio transaction log rows. --compare exits
+# with status 1 when a method needs over half a round trip per call more than
+# in the previous report, and lists methods slower by more than --slower percent.
+
+import sys
+import os
+import json
+import time
+import random
+import argparse
+from datetime import timedelta, date
+from itertools import product
+from string import ascii_uppercase
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from benchmark import open_store, seed_store, seed_history, percentile_ms, SIZES, COLORS, NAMES
+from CmsLib import *
+
+
+# ---------- BENCH STATE ----------
+
+class Bench:
+    """Store under test plus the fixtures the cases draw their arguments from"""
+
+    def __init__(self, pysql, keys, seed):
+        self.pysql = pysql
+        self.keys = keys
+        self.rng = random.Random(seed)
+        self.fresh = (("Z" + "".join(letters) + f"-{number:03d}", size, COLORS[number % len(COLORS)])
+                      for letters in product(ascii_uppercase, repeat=2)
+                      for number in range(1000) for size in SIZES)
+        self.counter_token = None
+        self.taken_token = None
+        self.added_token = None
+
+        pysql.run("SELECT InvoiceID FROM Invoices ORDER BY InvoiceID LIMIT 1000")
+        self.invoice_ids = [row[0] for row in pysql.result]
+
+    def key(self):
+        return self.rng.choice(self.keys)
+
+    def day(self):
+        return date.today() - timedelta(days=self.rng.randrange(365))
+
+    def week(self):
+        start = self.day()
+        return start, start + timedelta(days=7)
+
+    def items(self, count):
+        return [(*self.key(), self.rng.randint(1, 2)) for _ in range(count)]
+
+    def new_product(self):
+        product_id, size, color = next(self.fresh)
+        # (ProductID, Name, Description, UnitPrice, Size, Color, Discount)
+        return (product_id, self.rng.choice(NAMES), "Benchmark item", float(self.rng.randint(200, 9000)),
+                size, color, 5.0)
+
+    def token(self):
+        """An assigned token for the counter cases to scan onto"""
+        if self.counter_token is None:
+            self.counter_token = TokenManager.get_token(self.pysql)
+        return self.counter_token
+
+    def scanned_token(self):
+        token_id = TokenManager.get_token(self.pysql)
+        CounterManager.add_items_to_token(self.pysql, token_id, self.items(4))
+        return token_id
+
+    def placed_order(self):
+        return OrderManager.place_order(self.pysql, self.items(5))
+
+    # Cases that take a token or add one undo the previous call first
+    def free_token_slot(self):
+        if self.added_token is not None:
+            TokenManager.remove_token(self.pysql, self.added_token)
+            self.added_token = None
+
+    def give_back_token(self):
+        if self.taken_token is not None:
+            TokenManager.return_token(self.pysql, self.taken_token)
+            self.taken_token = None
+
+
+def consume(iterator_method):
+    return lambda *args: sum(1 for _ in iterator_method(*args))
+
+
+def add_token(bench):
+    bench.free_token_slot()
+    def call(pysql):
+        bench.added_token = TokenManager.add_token(pysql)
+    return call, (bench.pysql,)
+
+
+def remove_token(bench):
+    bench.free_token_slot()
+    return TokenManager.remove_token, (bench.pysql, TokenManager.add_token(bench.pysql))
+
+
+def add_token_in_gap(bench):
+    # Pool full up to the top: add_token falls back to the first gap
+    bench.free_token_slot()
+    added = []
+    while True:
+        token_id = TokenManager.add_token(bench.pysql)
+        if token_id == 1:
+            break
+        added.append(token_id)
+    if added:
+        TokenManager.remove_token(bench.pysql, added[0])
+    def call(pysql):
+        bench.added_token = TokenManager.add_token(pysql)
+    return call, (bench.pysql,)
+
+
+def get_token(bench):
+    bench.give_back_token()
+    def call(pysql):
+        bench.taken_token = TokenManager.get_token(pysql)
+    return call, (bench.pysql,)
+
+
+def receive_order(bench):
+    return OrderManager.receive_order, (bench.pysql, bench.placed_order())
+
+
+def receive_order_lines(bench):
+    keys = list(dict.fromkeys(bench.key() for _ in range(5)))
+    order_id = OrderManager.place_order(bench.pysql, [(*key, 2) for key in keys])
+    return OrderManager.receive_order, (bench.pysql, order_id, [(*key, 1) for key in keys])
+
+
+def add_counter_to_token(bench):
+    product_id, size, color = bench.key()
+    return CounterManager.add_counter_to_token, (bench.pysql, bench.token(), product_id, 1, size, color)
+
+
+def add_inventory_to_counter(bench):
+    product_id, size, color = bench.key()
+    return CounterManager.add_inventory_to_counter, (bench.pysql, product_id, 1, size, color)
+
+
+def add_token_to_counter(bench):
+    product_id, size, color = bench.key()
+    CounterManager.add_counter_to_token(bench.pysql, bench.token(), product_id, 1, size, color)
+    return CounterManager.add_token_to_counter, (bench.pysql, bench.token(), product_id, size, color)
+
+
+# (method, heavy, prepare): prepare(bench) -> (callable, args), run untimed.
+# Heavy cases read whole tables and run --heavy-repeat times instead of --repeat.
+CASES = [
+    # ProductManager
+    ("ProductManager.add_product", False, lambda b: (ProductManager.add_product, (b.pysql, *b.new_product()))),
+    ("ProductManager.add_products_bulk", False,
+     lambda b: (ProductManager.add_products_bulk, (b.pysql, [b.new_product() for _ in range(100)]))),
+    ("ProductManager.update_product_discount", False,
+     lambda b: (ProductManager.update_product_discount, (b.pysql, *b.key(), b.rng.choice([0, 5, 10])))),
+    ("ProductManager.update_product_price", False,
+     lambda b: (ProductManager.update_product_price, (b.pysql, *b.key(), b.rng.randint(200, 9000)))),
+    ("ProductManager.update_product_name", False,
+     lambda b: (ProductManager.update_product_name, (b.pysql, b.key()[0], b.rng.choice(NAMES)))),
+    ("ProductManager.update_product_description", False,
+     lambda b: (ProductManager.update_product_description, (b.pysql, b.key()[0], "Updated item"))),
+    ("ProductManager.invalidate_catalog", False,
+     lambda b: (ProductManager.invalidate_catalog, (b.pysql, *b.key()))),
+    ("ProductManager.get_product", False, lambda b: (ProductManager.get_product, (b.pysql, *b.key()))),
+    ("ProductManager.product_exists", False, lambda b: (ProductManager.product_exists, (b.pysql, *b.key()))),
+    ("ProductManager.product_exists_any", False,
+     lambda b: (ProductManager.product_exists_any, (b.pysql, b.key()[0]))),
+    ("ProductManager.get_product_id_from_name", False,
+     lambda b: (ProductManager.get_product_id_from_name, (b.pysql, b.rng.choice(NAMES)))),
+    ("ProductManager.get_product_list", True, lambda b: (ProductManager.get_product_list, (b.pysql,))),
+    ("ProductManager.get_all_products", True, lambda b: (ProductManager.get_all_products, (b.pysql,))),
+
+    # InventoryManager
+    ("InventoryManager.get_displayed_quantity", False,
+     lambda b: (InventoryManager.get_displayed_quantity, (b.pysql, *b.key()))),
+    ("InventoryManager.get_stored_quantity", False,
+     lambda b: (InventoryManager.get_stored_quantity, (b.pysql, *b.key()))),
+    ("InventoryManager.is_below_threshold", False,
+     lambda b: (InventoryManager.is_below_threshold, (b.pysql, *b.key()))),
+    ("InventoryManager.inventory_has_product", False,
+     lambda b: (InventoryManager.inventory_has_product, (b.pysql, *b.key()))),
+    ("InventoryManager.update_threshold", False,
+     lambda b: (InventoryManager.update_threshold, (b.pysql, *b.key(), b.rng.randint(5, 50)))),
+    ("InventoryManager.sub_product_from_inventory", False,
+     lambda b: (InventoryManager.sub_product_from_inventory, (b.pysql, *b.key(), 1))),
+    ("InventoryManager.log_transaction", False,
+     lambda b: (InventoryManager.log_transaction, (b.pysql, "INVENTORY_ADD", *b.key(), 1))),
+    ("InventoryManager.get_inventory_details", True, lambda b: (InventoryManager.get_inventory_details, (b.pysql,))),
+    ("InventoryManager.get_transactions", True, lambda b: (InventoryManager.get_transactions, (b.pysql,))),
+    ("InventoryManager.get_transactions_page", False,
+     lambda b: (InventoryManager.get_transactions_page, (b.pysql,))),
+    ("InventoryManager.iter_transactions", True,
+     lambda b: (consume(InventoryManager.iter_transactions), (b.pysql,))),
+    ("InventoryManager.get_transactions_by_date", False,
+     lambda b: (InventoryManager.get_transactions_by_date, (b.pysql, b.day()))),
+    ("InventoryManager.get_transactions_of_product_by_date", False,
+     lambda b: (InventoryManager.get_transactions_of_product_by_date, (b.pysql, *b.key(), b.day()))),
+    ("InventoryManager.get_transactions_between", False,
+     lambda b: (InventoryManager.get_transactions_between, (b.pysql, *b.week()))),
+    ("InventoryManager.get_transactions_of_product_between", False,
+     lambda b: (InventoryManager.get_transactions_of_product_between, (b.pysql, *b.key(), *b.week()))),
+    ("InventoryManager.get_low_stock_notifications", False,
+     lambda b: (InventoryManager.get_low_stock_notifications, (b.pysql,))),
+    ("InventoryManager.get_low_stock_count", False, lambda b: (InventoryManager.get_low_stock_count, (b.pysql,))),
+    ("InventoryManager.refresh_low_stock", False, lambda b: (InventoryManager.refresh_low_stock, (b.pysql,))),
+
+    # CounterManager
+    ("CounterManager.add_counter_to_token", False, add_counter_to_token),
+    ("CounterManager.add_items_to_token", False,
+     lambda b: (CounterManager.add_items_to_token, (b.pysql, b.token(), b.items(5)))),
+    ("CounterManager.add_inventory_to_counter", False, add_inventory_to_counter),
+    ("CounterManager.add_token_to_counter", False, add_token_to_counter),
+
+    # TokenManager
+    ("TokenManager.add_token", False, add_token),
+    ("TokenManager.remove_token", False, remove_token),
+    ("TokenManager.add_token (pool full)", False, add_token_in_gap),
+    ("TokenManager.get_token", False, get_token),
+    ("TokenManager.return_token", False,
+     lambda b: (TokenManager.return_token, (b.pysql, TokenManager.get_token(b.pysql)))),
+    ("TokenManager.is_token_assigned", False, lambda b: (TokenManager.is_token_assigned, (b.pysql, b.token()))),
+    ("TokenManager.token_has_products", False, lambda b: (TokenManager.token_has_products, (b.pysql, b.token()))),
+    ("TokenManager.get_all_tokens_status", False, lambda b: (TokenManager.get_all_tokens_status, (b.pysql,))),
+    ("TokenManager.get_pending_tokens", False, lambda b: (TokenManager.get_pending_tokens, (b.pysql,))),
+    ("TokenManager.get_empty_tokens", False, lambda b: (TokenManager.get_empty_tokens, (b.pysql,))),
+    ("TokenManager.get_assigned_products", False, lambda b: (TokenManager.get_assigned_products, (b.pysql,))),
+    ("TokenManager.get_token_feed_snapshot", False,
+     lambda b: (TokenManager.get_token_feed_snapshot, (b.pysql,))),
+    ("TokenManager.publish_tokens", False, lambda b: (TokenManager.publish_tokens, (b.pysql, (b.token(),)))),
+    ("TokenManager.get_token_pool_stats", False, lambda b: (TokenManager.get_token_pool_stats, (b.pysql,))),
+    ("TokenManager.get_token_details", False, lambda b: (TokenManager.get_token_details, (b.pysql, b.token()))),
+
+    # OrderManager
+    ("OrderManager.place_order", False, lambda b: (OrderManager.place_order, (b.pysql, b.items(5)))),
+    ("OrderManager.place_orders_bulk", False, lambda b: (OrderManager.place_orders_bulk, (b.pysql, b.items(100)))),
+    ("OrderManager.get_order_status", False,
+     lambda b: (OrderManager.get_order_status, (b.pysql, b.placed_order()))),
+    ("OrderManager.cancel_order", False, lambda b: (OrderManager.cancel_order, (b.pysql, b.placed_order()))),
+    ("OrderManager.receive_order", False, receive_order),
+    ("OrderManager.receive_order (lines)", False, receive_order_lines),
+    ("OrderManager.get_orders", True, lambda b: (OrderManager.get_orders, (b.pysql,))),
+    ("OrderManager.get_order_details", False,
+     lambda b: (OrderManager.get_order_details, (b.pysql, b.placed_order()))),
+
+    # InvoiceManager
+    ("InvoiceManager.generate_invoice", False,
+     lambda b: (InvoiceManager.generate_invoice, (b.pysql, [b.scanned_token()], "cash"))),
+    ("InvoiceManager.give_additional_discount", False,
+     lambda b: (InvoiceManager.give_additional_discount, (b.pysql, b.rng.choice(b.invoice_ids), 1))),
+    ("InvoiceManager.get_invoice_details", False,
+     lambda b: (InvoiceManager.get_invoice_details, (b.pysql, b.rng.choice(b.invoice_ids)))),
+    ("InvoiceManager.get_invoices_by_date", False,
+     lambda b: (InvoiceManager.get_invoices_by_date, (b.pysql, b.day()))),
+    ("InvoiceManager.get_invoice_lines_page", False,
+     lambda b: (InvoiceManager.get_invoice_lines_page, (b.pysql,))),
+    ("InvoiceManager.iter_invoice_lines", True,
+     lambda b: (consume(InvoiceManager.iter_invoice_lines), (b.pysql,))),
+    ("InvoiceManager.get_invoices_between", False,
+     lambda b: (InvoiceManager.get_invoices_between, (b.pysql, *b.week()))),
+]
+
+
+# ---------- RUNNER ----------
+
+def run_case(bench, prepare, repeat):
+    pysql = bench.pysql
+    samples, round_trips = [], []
+    for _ in range(repeat):
+        call, args = prepare(bench)
+        before = pysql.stats.summary(0)["total_queries"]
+        start = time.perf_counter()
+        call(*args)
+        samples.append(time.perf_counter() - start)
+        round_trips.append(pysql.stats.summary(0)["total_queries"] - before)
+    samples.sort()
+    return {"calls": repeat,
+            "mean_ms": round(sum(samples) / repeat * 1000, 3),
+            "p50_ms": percentile_ms(samples, 50),
+            "p95_ms": percentile_ms(samples, 95),
+            "round_trips": round(sum(round_trips) / repeat, 2),
+            "max_round_trips": max(round_trips)}
+
+
+def run_size(size, args):
+    app, pysql = open_store()
+    start = time.perf_counter()
+    keys = seed_store(pysql, size, args.tokens, seed=args.seed)
+    seed_history(pysql, keys, int(size * args.invoice_ratio), int(size * args.log_ratio), seed=args.seed)
+    print(f"\n== {size} variants (seeded in {time.perf_counter() - start:.1f}s)")
+    print(f"{'method':<55}{'mean ms':>10}{'p95 ms':>10}{'round trips':>13}")
+
+    bench = Bench(pysql, keys, args.seed)
+    results = {}
+    for method, heavy, prepare in CASES:
+        if args.only and not any(part in method for part in args.only.split(",")):
+            continue
+        result = run_case(bench, prepare, args.heavy_repeat if heavy else args.repeat)
+        results[method] = result
+        print(f"{method:<55}{result['mean_ms']:>10}{result['p95_ms']:>10}{result['round_trips']:>13}")
+    pysql.close()
+    return results
+
+
+def compare(report, previous, slower_pct):
+    """Returns True when some method needs more round trips than before"""
+    more_trips = False
+    print("\n== Changes against the previous report")
+    for size, results in sorted(report["results"].items(), key=lambda item: int(item[0])):
+        for method, result in sorted(results.items()):
+            old = previous.get("results", {}).get(size, {}).get(method)
+            if old is None:
+                continue
+            # Refills and cache loads are amortised over the calls, so allow some noise
+            if result["round_trips"] > old["round_trips"] + 0.5:
+                more_trips = True
+                print(f"{size:>8} {method}: round trips {old['round_trips']} -> {result['round_trips']}")
+            if old["mean_ms"] and (result["mean_ms"] - old["mean_ms"]) / old["mean_ms"] * 100 > slower_pct:
+                print(f"{size:>8} {method}: mean {old['mean_ms']} -> {result['mean_ms']} ms")
+    return more_trips
+
+
+# ---------- MAIN ----------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-method benchmarks of the CmsLib managers")
+    parser.add_argument("--sizes", default="1000,10000,50000", help="comma separated variant counts")
+    parser.add_argument("--repeat", type=int, default=30, help="calls per method")
+    parser.add_argument("--heavy-repeat", type=int, default=3, help="calls per whole-table method")
+    parser.add_argument("--tokens", type=int, default=60, help="seeded tokens (below token_pool_size)")
+    parser.add_argument("--invoice-ratio", type=float, default=1.0, help="past invoices per variant")
+    parser.add_argument("--log-ratio", type=float, default=5.0, help="transaction log rows per variant")
+    parser.add_argument("--only", help="comma separated substrings of the methods to run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", help="previous JSON report")
+    parser.add_argument("--slower", type=float, default=25.0, help="percent slowdown worth reporting")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    report = {"config": {key: value for key, value in vars(args).items() if key not in ("out", "compare")},
+              "results": {str(size): run_size(size, args) for size in sizes}}
+
+    if args.out:
+        with open(args.out, "w") as out_file:
+            json.dump(report, out_file, indent=2, sort_keys=True)
+            out_file.write("\n")
+        print(f"\nReport written to {args.out}")
+    if args.compare:
+        with open(args.compare) as previous_file:
+            if compare(report, json.load(previous_file), args.slower):
+                sys.exit(1)
@@ -18,6 +18,7 @@
         DROP TABLE IF EXISTS Orders;
         DROP TABLE IF EXISTS OrdersOfProducts;
         DROP TABLE IF EXISTS Users;
+        DROP TABLE IF EXISTS Sequences;
 
         -- ============================================================
         -- Products Table
@@ -32,7 +33,8 @@
             Color VARCHAR(32) NOT NULL,
             CurrentDiscount NUMERIC(4,2) UNSIGNED DEFAULT 0,
             CONSTRAINT Products_PK_FMT CHECK (ProductID REGEXP '^[A-Z]{3}-[0-9]{3}$'),
-            CONSTRAINT Products_PK PRIMARY KEY (ProductID, Size, Color)
+            CONSTRAINT Products_PK PRIMARY KEY (ProductID, Size, Color),
+            INDEX Products_Name_IDX (Name)
         );
 
         -- ============================================================
@@ -60,17 +62,18 @@
             DiscountGiven NUMERIC(9,3) UNSIGNED DEFAULT 0,
             PaymentMode ENUM('cash','card','wallet'),
             CONSTRAINT Invoices_PK_FMT CHECK (InvoiceID REGEXP '^INV-[0-9]{10}$'),
-            CONSTRAINT Invoices_PK PRIMARY KEY (InvoiceID)
+            CONSTRAINT Invoices_PK PRIMARY KEY (InvoiceID),
+            INDEX Invoices_InvoiceDate_IDX (InvoiceDate)
         );
 
         -- ============================================================
         -- Tokens Table
         -- ============================================================
         CREATE TABLE IF NOT EXISTS Tokens (
-            TokenID CHAR(6),
+            TokenID CHAR(8),
             Assigned BOOLEAN DEFAULT FALSE,
             InvoiceID CHAR(14) DEFAULT NULL,
-            CONSTRAINT Tokens_PK_FMT CHECK (TokenID REGEXP '^TOK-[0-9]{2}$'),
+            CONSTRAINT Tokens_PK_FMT CHECK (TokenID REGEXP '^TOK-([0-9]{2}|[0-9]{4})$'),
             CONSTRAINT Tokens_PK PRIMARY KEY (TokenID),
             CONSTRAINT Tokens_FK FOREIGN KEY (InvoiceID) REFERENCES Invoices(InvoiceID)
         );
@@ -88,6 +91,8 @@
             Timestamp DATETIME,
             CONSTRAINT InventoryTransactions_PK_FMT CHECK (TransactionID REGEXP '^TRC-[0-9]{10}$'),
             CONSTRAINT InventoryTransactions_PK PRIMARY KEY (TransactionID),
+            INDEX InventoryTransactions_Timestamp_IDX (Timestamp),
+            INDEX InventoryTransactions_Product_Timestamp_IDX (ProductID, Size, Color, Timestamp),
             CONSTRAINT InventoryTransactions_FK FOREIGN KEY (ProductID, Size, Color) 
             REFERENCES Products(ProductID, Size, Color)
         );
@@ -101,7 +106,8 @@
             Delivered BOOLEAN DEFAULT FALSE,
             Cancelled BOOLEAN DEFAULT FALSE,
             CONSTRAINT Orders_PK_FMT CHECK (OrderID REGEXP '^ORD-[0-9]{10}$'),
-            CONSTRAINT Orders_PK PRIMARY KEY (OrderID)
+            CONSTRAINT Orders_PK PRIMARY KEY (OrderID),
+            INDEX Orders_Status_IDX (Delivered, Cancelled, OrderID)
         );
 
         -- ============================================================
@@ -113,6 +119,7 @@
             Size ENUM('S','M','L','XL','XXL') NOT NULL,
             Color VARCHAR(32) NOT NULL,
             Quantity NUMERIC(9,3) UNSIGNED,
+            ReceivedQuantity NUMERIC(9,3) UNSIGNED DEFAULT 0,
             CONSTRAINT OrdersOfProducts_PK PRIMARY KEY (OrderID, ProductID, Size, Color),
             CONSTRAINT OrdersOfProducts_FK1 FOREIGN KEY (OrderID) REFERENCES Orders(OrderID),
             CONSTRAINT OrdersOfProducts_FK2 FOREIGN KEY (ProductID, Size, Color) 
@@ -123,7 +130,7 @@
         -- TokensSelectProducts Table
         -- ============================================================
         CREATE TABLE IF NOT EXISTS TokensSelectProducts (
-            TokenID CHAR(6),
+            TokenID CHAR(8),
             ProductID CHAR(7),
             Size ENUM('S','M','L','XL','XXL') NOT NULL,
             Color VARCHAR(32) NOT NULL,
@@ -161,4 +168,12 @@
             PasswordHash VARCHAR(255) NOT NULL
         
         );
-        
+
+        -- ============================================================
+        -- Sequences Table (hi-lo blocks for InvoiceID/TransactionID/OrderID)
+        -- ============================================================
+        CREATE TABLE IF NOT EXISTS Sequences (
+            Name VARCHAR(32) NOT NULL,
+            NextValue BIGINT UNSIGNED NOT NULL,
+            CONSTRAINT Sequences_PK PRIMARY KEY (Name)
+        );
@@ -0,0 +1,167 @@
+        -- ============================================================
+        -- SQLite version of cms_ddl.sql for the embedded backend
+        -- (backend: sqlite in CmsLib/db.yaml). PySql loads it into an
+        -- empty database; ENUMs become CHECKs and indexes are separate
+        -- statements. Keep in step with cms_ddl.sql.
+        -- ProductID and Color compare case-insensitively (COLLATE NOCASE),
+        -- like MySQL's default collation, so both backends see 'Red' and
+        -- 'red' as one variant.
+        -- ============================================================
+
+        -- ============================================================
+        -- Products Table
+        -- ============================================================
+        CREATE TABLE IF NOT EXISTS Products (
+            ProductID CHAR(7) NOT NULL COLLATE NOCASE,
+            Name VARCHAR(64) NOT NULL,
+            Description VARCHAR(128),
+            UnitPrice NUMERIC(9,3) CHECK (UnitPrice >= 0),
+            UnitType TEXT DEFAULT 'pcs' CHECK (UnitType IN ('pcs')),
+            Size TEXT NOT NULL CHECK (Size IN ('S','M','L','XL','XXL')),
+            Color VARCHAR(32) NOT NULL COLLATE NOCASE,
+            CurrentDiscount NUMERIC(4,2) DEFAULT 0 CHECK (CurrentDiscount >= 0),
+            CONSTRAINT Products_PK_FMT CHECK (ProductID REGEXP '^[A-Z]{3}-[0-9]{3}$'),
+            CONSTRAINT Products_PK PRIMARY KEY (ProductID, Size, Color)
+        );
+        CREATE INDEX IF NOT EXISTS Products_Name_IDX ON Products (Name);
+
+        -- ============================================================
+        -- Inventory Table
+        -- ============================================================
+        CREATE TABLE IF NOT EXISTS Inventory (
+            ProductID CHAR(7) COLLATE NOCASE,
+            Size TEXT NOT NULL CHECK (Size IN ('S','M','L','XL','XXL')),
+            Color VARCHAR(32) NOT NULL COLLATE NOCASE,
+            StoredQuantity NUMERIC(9,3) CHECK (StoredQuantity >= 0),
+            DisplayedQuantity NUMERIC(9,3) CHECK (DisplayedQuantity >= 0),
+            StoreThreshold NUMERIC(9,3) CHECK (StoreThreshold >= 0),
+            CONSTRAINT Inventory_PK PRIMARY KEY (ProductID, Size, Color),
+            CONSTRAINT Inventory_FK FOREIGN KEY (ProductID, Size, Color)
+            REFERENCES Products(ProductID, Size, Color)
+        );
+
+        -- ============================================================
+        -- Invoices Table
+        -- ============================================================
+        CREATE TABLE IF NOT EXISTS Invoices (
+            InvoiceID CHAR(14),
+            InvoiceDate DATETIME,
+            InvoiceTotal NUMERIC(9,3) CHECK (InvoiceTotal >= 0),
+            DiscountGiven NUMERIC(9,3) DEFAULT 0 CHECK (DiscountGiven >= 0),
+            PaymentMode TEXT CHECK (PaymentMode IN ('cash','card','wallet')),
+            CONSTRAINT Invoices_PK_FMT CHECK (InvoiceID REGEXP '^INV-[0-9]{10}$'),
+            CONSTRAINT Invoices_PK PRIMARY KEY (InvoiceID)
+        );
+        CREATE INDEX IF NOT EXISTS Invoices_InvoiceDate_IDX ON Invoices (InvoiceDate);
+
+        -- ============================================================
+        -- Tokens Table
+        -- ============================================================
+        CREATE TABLE IF NOT EXISTS Tokens (
+            TokenID CHAR(8),
+            Assigned BOOLEAN DEFAULT FALSE,
+            InvoiceID CHAR(14) DEFAULT NULL,
+            CONSTRAINT Tokens_PK_FMT CHECK (TokenID REGEXP '^TOK-([0-9]{2}|[0-9]{4})$'),
+            CONSTRAINT Tokens_PK PRIMARY KEY (TokenID),
+            CONSTRAINT Tokens_FK FOREIGN KEY (InvoiceID) REFERENCES Invoices(InvoiceID)
+        );
+
+        -- ============================================================
+        -- InventoryTransactions Table
+        -- ============================================================
+        CREATE TABLE IF NOT EXISTS InventoryTransactions (
+            TransactionID CHAR(14),
+            TransactionType TEXT CHECK (TransactionType IN ('COUNTER_SUB','COUNTER_ADD','INVENTORY_SUB','INVENTORY_ADD','INVENTORY_TO_COUNTER')),
+            ProductID CHAR(7) COLLATE NOCASE,
+            Size TEXT NOT NULL CHECK (Size IN ('S','M','L','XL','XXL')),
+            Color VARCHAR(32) NOT NULL COLLATE NOCASE,
+            Quantity NUMERIC(9,3) CHECK (Quantity >= 0),
+            Timestamp DATETIME,
+            CONSTRAINT InventoryTransactions_PK_FMT CHECK (TransactionID REGEXP '^TRC-[0-9]{10}$'),
+            CONSTRAINT InventoryTransactions_PK PRIMARY KEY (TransactionID),
+            CONSTRAINT InventoryTransactions_FK FOREIGN KEY (ProductID, Size, Color)
+            REFERENCES Products(ProductID, Size, Color)
+        );
+        CREATE INDEX IF NOT EXISTS InventoryTransactions_Timestamp_IDX ON InventoryTransactions (Timestamp);
+        CREATE INDEX IF NOT EXISTS InventoryTransactions_Product_Timestamp_IDX
+            ON InventoryTransactions (ProductID, Size, Color, Timestamp);
+
+        -- ============================================================
+        -- Orders Table
+        -- ============================================================
+        CREATE TABLE IF NOT EXISTS Orders (
+            OrderID CHAR(14),
+            OrderDate DATETIME,
+            Delivered BOOLEAN DEFAULT FALSE,
+            Cancelled BOOLEAN DEFAULT FALSE,
+            CONSTRAINT Orders_PK_FMT CHECK (OrderID REGEXP '^ORD-[0-9]{10}$'),
+            CONSTRAINT Orders_PK PRIMARY KEY (OrderID)
+        );
+        CREATE INDEX IF NOT EXISTS Orders_Status_IDX ON Orders (Delivered, Cancelled, OrderID);
+
+        -- ============================================================
+        -- OrdersOfProducts Table
+        -- ============================================================
+        CREATE TABLE IF NOT EXISTS OrdersOfProducts (
+            OrderID CHAR(14),
+            ProductID CHAR(7) COLLATE NOCASE,
+            Size TEXT NOT NULL CHECK (Size IN ('S','M','L','XL','XXL')),
+            Color VARCHAR(32) NOT NULL COLLATE NOCASE,
+            Quantity NUMERIC(9,3) CHECK (Quantity >= 0),
+            ReceivedQuantity NUMERIC(9,3) DEFAULT 0 CHECK (ReceivedQuantity >= 0),
+            CONSTRAINT OrdersOfProducts_PK PRIMARY KEY (OrderID, ProductID, Size, Color),
+            CONSTRAINT OrdersOfProducts_FK1 FOREIGN KEY (OrderID) REFERENCES Orders(OrderID),
+            CONSTRAINT OrdersOfProducts_FK2 FOREIGN KEY (ProductID, Size, Color)
+            REFERENCES Products(ProductID, Size, Color)
+        );
+
+        -- ============================================================
+        -- TokensSelectProducts Table
+        -- ============================================================
+        CREATE TABLE IF NOT EXISTS TokensSelectProducts (
+            TokenID CHAR(8),
+            ProductID CHAR(7) COLLATE NOCASE,
+            Size TEXT NOT NULL CHECK (Size IN ('S','M','L','XL','XXL')),
+            Color VARCHAR(32) NOT NULL COLLATE NOCASE,
+            Quantity NUMERIC(9,3) CHECK (Quantity >= 0),
+            CONSTRAINT TokensSelectProducts_PK PRIMARY KEY (TokenID, ProductID, Size, Color),
+            CONSTRAINT TokensSelectProducts_FK1 FOREIGN KEY (TokenID) REFERENCES Tokens(TokenID),
+            CONSTRAINT TokensSelectProducts_FK2 FOREIGN KEY (ProductID, Size, Color)
+            REFERENCES Products(ProductID, Size, Color)
+        );
+
+        -- ============================================================
+        -- ProductsInInvoices Table
+        -- ============================================================
+        CREATE TABLE IF NOT EXISTS ProductsInInvoices (
+            InvoiceID CHAR(14),
+            ProductID CHAR(7) COLLATE NOCASE,
+            Name VARCHAR(64),
+            Size TEXT NOT NULL CHECK (Size IN ('S','M','L','XL','XXL')),
+            Color VARCHAR(32) NOT NULL COLLATE NOCASE,
+            Quantity NUMERIC(9,3) CHECK (Quantity >= 0),
+            UnitPrice NUMERIC(9,3) CHECK (UnitPrice >= 0),
+            TaxAmount NUMERIC(9,3) DEFAULT 0.0 CHECK (TaxAmount >= 0),
+            Discount NUMERIC(4,2) CHECK (Discount >= 0),
+            CONSTRAINT ProductsInInvoices_PK PRIMARY KEY (InvoiceID, ProductID, Size, Color),
+            CONSTRAINT ProductsInInvoices_FK1 FOREIGN KEY (InvoiceID) REFERENCES Invoices(InvoiceID),
+            CONSTRAINT ProductsInInvoices_FK2 FOREIGN KEY (ProductID, Size, Color) REFERENCES Products(ProductID, Size, Color)
+        );
+
+        -- ============================================================
+        -- Users Table
+        -- ============================================================
+        CREATE TABLE IF NOT EXISTS Users (
+            UserID INTEGER PRIMARY KEY AUTOINCREMENT,
+            Username VARCHAR(50) UNIQUE NOT NULL,
+            PasswordHash VARCHAR(255) NOT NULL
+        );
+
+        -- ============================================================
+        -- Sequences Table (hi-lo blocks for InvoiceID/TransactionID/OrderID)
+        -- ============================================================
+        CREATE TABLE IF NOT EXISTS Sequences (
+            Name VARCHAR(32) NOT NULL,
+            NextValue BIGINT NOT NULL CHECK (NextValue >= 0),
+            CONSTRAINT Sequences_PK PRIMARY KEY (Name)
+        );
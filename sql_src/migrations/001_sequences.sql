@@ -0,0 +1,19 @@
+        -- ============================================================
+        -- 001: Sequences table for block-allocated IDs
+        -- > mysql -u root -p CMS < ./sql_src/migrations/001_sequences.sql
+        -- ============================================================
+        USE CMS;
+
+        CREATE TABLE IF NOT EXISTS Sequences (
+            Name VARCHAR(32) NOT NULL,
+            NextValue BIGINT UNSIGNED NOT NULL,
+            CONSTRAINT Sequences_PK PRIMARY KEY (Name)
+        );
+
+        -- Continue numbering after the IDs already issued
+        INSERT IGNORE INTO Sequences (Name, NextValue)
+        SELECT 'InvoiceID', COALESCE(MAX(CAST(SUBSTRING(InvoiceID, 5) AS UNSIGNED)) + 1, 0) FROM Invoices;
+        INSERT IGNORE INTO Sequences (Name, NextValue)
+        SELECT 'TransactionID', COALESCE(MAX(CAST(SUBSTRING(TransactionID, 5) AS UNSIGNED)) + 1, 0) FROM InventoryTransactions;
+        INSERT IGNORE INTO Sequences (Name, NextValue)
+        SELECT 'OrderID', COALESCE(MAX(CAST(SUBSTRING(OrderID, 5) AS UNSIGNED)) + 1, 1) FROM Orders;
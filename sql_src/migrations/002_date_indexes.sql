@@ -0,0 +1,15 @@
+        -- ============================================================
+        -- 002: Indexes for date-range reports
+        -- > mysql -u root -p CMS < ./sql_src/migrations/002_date_indexes.sql
+        -- ============================================================
+        USE CMS;
+
+        -- Daily / ranged invoice reports and the index dashboard
+        CREATE INDEX Invoices_InvoiceDate_IDX ON Invoices (InvoiceDate);
+
+        -- Transaction log by date
+        CREATE INDEX InventoryTransactions_Timestamp_IDX ON InventoryTransactions (Timestamp);
+
+        -- Transaction log of one variant by date (also serves InventoryTransactions_FK)
+        CREATE INDEX InventoryTransactions_Product_Timestamp_IDX
+            ON InventoryTransactions (ProductID, Size, Color, Timestamp);
@@ -0,0 +1,14 @@
+        -- ============================================================
+        -- 003: Track received quantity per order line (partial deliveries)
+        -- > mysql -u root -p CMS < ./sql_src/migrations/003_partial_receipts.sql
+        -- ============================================================
+        USE CMS;
+
+        ALTER TABLE OrdersOfProducts
+            ADD COLUMN ReceivedQuantity NUMERIC(9,3) UNSIGNED DEFAULT 0 AFTER Quantity;
+
+        -- Orders delivered before this migration were received in full
+        UPDATE OrdersOfProducts op
+        JOIN Orders o ON o.OrderID = op.OrderID
+        SET op.ReceivedQuantity = op.Quantity
+        WHERE o.Delivered = TRUE;
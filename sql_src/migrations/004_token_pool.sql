@@ -0,0 +1,23 @@
+        -- ============================================================
+        -- 004: Room for up to 10000 tokens (TOK-0000 .. TOK-9999)
+        -- > mysql -u root -p CMS < ./sql_src/migrations/004_token_pool.sql
+        -- Then set token_digits: 4 and token_pool_size in CmsLib/db.yaml
+        -- ============================================================
+        USE CMS;
+
+        ALTER TABLE TokensSelectProducts DROP FOREIGN KEY TokensSelectProducts_FK1;
+        ALTER TABLE Tokens DROP CHECK Tokens_PK_FMT;
+
+        ALTER TABLE Tokens MODIFY TokenID CHAR(8);
+        ALTER TABLE TokensSelectProducts MODIFY TokenID CHAR(8);
+
+        -- All tokens must share one width so MAX(TokenID) is the highest number
+        UPDATE Tokens
+        SET TokenID = CONCAT('TOK-', LPAD(SUBSTRING(TokenID, 5), 4, '0'));
+        UPDATE TokensSelectProducts
+        SET TokenID = CONCAT('TOK-', LPAD(SUBSTRING(TokenID, 5), 4, '0'));
+
+        ALTER TABLE Tokens
+            ADD CONSTRAINT Tokens_PK_FMT CHECK (TokenID REGEXP '^TOK-([0-9]{2}|[0-9]{4})$');
+        ALTER TABLE TokensSelectProducts
+            ADD CONSTRAINT TokensSelectProducts_FK1 FOREIGN KEY (TokenID) REFERENCES Tokens(TokenID);
@@ -0,0 +1,11 @@
+        -- ============================================================
+        -- 005: Indexes found missing by py_src/check_query_plans.py
+        -- > mysql -u root -p CMS < ./sql_src/migrations/005_plan_indexes.sql
+        -- ============================================================
+        USE CMS;
+
+        -- Pending / received / cancelled order pages, newest order first
+        CREATE INDEX Orders_Status_IDX ON Orders (Delivered, Cancelled, OrderID);
+
+        -- ProductManager.get_product_id_from_name
+        CREATE INDEX Products_Name_IDX ON Products (Name);
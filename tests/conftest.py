@@ -0,0 +1,80 @@
+# tests/conftest.py
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from flask import Flask
+
+from CmsLib.PySql import PySql
+from CmsLib.SqliteBackend import SqliteCursor
+
+YAML_PATH = os.path.join(os.path.dirname(__file__), "..", "CmsLib", "db.yaml")
+
+
+@pytest.fixture
+def pysql():
+    """PySql on a fresh in-memory SQLite database"""
+    db = PySql(Flask(__name__), YAML_PATH, {"backend": "sqlite", "sqlite_path": ":memory:",
+                                            "slow_query_log": None})
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def store(pysql):
+    """Six variants with 100 pieces received and 50 on the counter, and 10 free tokens"""
+    from CmsLib.ProductManager import ProductManager
+    from CmsLib.OrderManager import OrderManager
+    keys = [(f"KUR-{number:03d}", size, "Red") for number in range(1, 4) for size in ("S", "M")]
+    report = ProductManager.add_products_bulk(
+        pysql, [(product_id, "Kurti", "Cotton", "1800.00", size, color, "5") for product_id, size, color in keys])
+    assert not report["errors"]
+    order_id = OrderManager.place_orders_bulk(pysql, [(*key, 100) for key in keys])
+    OrderManager.receive_order(pysql, order_id)
+    pysql.run("UPDATE Inventory SET DisplayedQuantity = 50, StoredQuantity = 50")
+    pysql.run_many("INSERT INTO Tokens (TokenID) VALUES (%s)", [(pysql.token_pool.format(i),) for i in range(10)])
+    pysql.commit()
+    return keys
+
+
+@pytest.fixture
+def pysql_file():
+    """pysql_file(path): PySql on an SQLite file, which forked children can share"""
+    opened = []
+
+    def open_file(path):
+        db = PySql(Flask(__name__), YAML_PATH, {"backend": "sqlite", "sqlite_path": str(path),
+                                                "slow_query_log": None})
+        opened.append(db)
+        return db
+
+    yield open_file
+    for db in opened:
+        db.close()
+
+
+@pytest.fixture
+def fail_once(monkeypatch):
+    """fail_once(fragment, error): the next statement containing fragment raises error"""
+    pending = []
+    execute, executemany = SqliteCursor.execute, SqliteCursor.executemany
+
+    def fail(sql_stmt):
+        for fragment, error in list(pending):
+            if fragment in sql_stmt:
+                pending.remove((fragment, error))
+                raise error
+
+    def failing_execute(cursor, sql_stmt, params=None):
+        fail(sql_stmt)
+        return execute(cursor, sql_stmt, params)
+
+    def failing_executemany(cursor, sql_stmt, seq_of_params):
+        fail(sql_stmt)
+        return executemany(cursor, sql_stmt, seq_of_params)
+
+    monkeypatch.setattr(SqliteCursor, "execute", failing_execute)
+    monkeypatch.setattr(SqliteCursor, "executemany", failing_executemany)
+    return lambda fragment, error: pending.append((fragment, error))
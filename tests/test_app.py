@@ -0,0 +1,49 @@
+# tests/test_app.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "py_src")))
+
+from app import create_app
+
+CONFIG = {"backend": "sqlite", "sqlite_path": ":memory:", "slow_query_log": None}
+
+
+def test_secret_key_is_required(monkeypatch):
+    monkeypatch.delenv("CMS_SECRET_KEY", raising=False)
+    with pytest.raises(RuntimeError):
+        create_app(CONFIG)
+    monkeypatch.setenv("CMS_SECRET_KEY", "from-env")
+    app = create_app(CONFIG)
+    assert app.secret_key == "from-env"
+    app.extensions["pysql"].close()
+
+
+@pytest.mark.parametrize("allow, address, status", [
+    (None, "127.0.0.1", 200),
+    (None, "10.1.2.3", 403),
+    ("10.0.0.0/8", "10.1.2.3", 200),
+    ("10.0.0.0/8", "127.0.0.1", 403),
+])
+def test_metrics_allowlist(monkeypatch, allow, address, status):
+    if allow is not None:
+        monkeypatch.setenv("CMS_METRICS_ALLOW", allow)
+    app = create_app(CONFIG, secret_key="test")
+    response = app.test_client().get("/metrics", environ_base={"REMOTE_ADDR": address})
+    assert response.status_code == status
+    app.extensions["pysql"].close()
+
+
+@pytest.mark.parametrize("quantity", ["abc", "NaN", "-Infinity", "0"])
+def test_receive_order_lines_rejects_bad_quantities_before_the_manager(quantity):
+    app = create_app(CONFIG, secret_key="test")
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["logged_in"] = True
+    response = client.post("/InventoryManager/ReceiveOrderLines",
+                           json={"OrderID": "ORD-0000000001",
+                                 "Lines": [{"ProductID": "KUR-001", "Size": "S", "Color": "Red", "Quantity": quantity}]})
+    assert response.status_code == 400
+    app.extensions["pysql"].close()
@@ -0,0 +1,44 @@
+# tests/test_counter_manager.py
+
+import pytest
+
+from CmsLib.CounterManager import CounterManager
+from CmsLib.TokenManager import TokenManager
+
+
+def displayed(pysql, key):
+    pysql.run("SELECT DisplayedQuantity FROM Inventory WHERE ProductID=%s AND Size=%s AND Color=%s", key)
+    return int(pysql.scalar_result)
+
+
+@pytest.mark.parametrize("quantity", [float("nan"), float("inf"), 0, -1])
+def test_non_finite_or_non_positive_quantity_is_invalid(pysql, store, quantity):
+    token_id = TokenManager.get_token(pysql)
+    assert CounterManager.add_items_to_token(pysql, token_id, [(*store[0], 1), (*store[1], quantity)]) == 2
+    assert CounterManager.add_counter_to_token(pysql, token_id, store[0][0], quantity, *store[0][1:]) == 2
+    assert CounterManager.add_inventory_to_counter(pysql, store[0][0], quantity, *store[0][1:]) == 2
+    assert displayed(pysql, store[0]) == 50
+
+
+def test_variant_without_inventory_row_is_out_of_stock(pysql, store):
+    pysql.run("INSERT INTO Products (ProductID, Name, Description, UnitPrice, UnitType, Size, Color, CurrentDiscount) "
+              "VALUES ('KUR-009', 'Kurti', 'Cotton', 1800, 'pcs', 'S', 'Red', 0)")
+    pysql.commit()
+    token_id = TokenManager.get_token(pysql)
+    assert CounterManager.add_counter_to_token(pysql, token_id, "KUR-009", 1, "S", "Red") == 4
+    assert CounterManager.add_items_to_token(pysql, token_id, [(*store[0], 1), ("KUR-009", "S", "Red", 1)]) == 4
+    assert CounterManager.add_items_to_token(pysql, token_id, [(*store[0], 1), ("KUR-099", "S", "Red", 1)]) == 3
+    assert displayed(pysql, store[0]) == 50
+
+
+def test_burst_merges_spellings_and_stores_the_catalog_spelling(pysql, store):
+    pid, size, color = store[0]
+    token_id = TokenManager.get_token(pysql)
+    assert CounterManager.add_items_to_token(
+        pysql, token_id, [(pid, size, color, 1), (pid.lower(), size, color.upper(), 2), (*store[1], 1)]) == 0
+    assert displayed(pysql, store[0]) == 47
+    pysql.run("SELECT ProductID, Size, Color, Quantity FROM TokensSelectProducts WHERE TokenID=%s "
+              "ORDER BY ProductID, Size, Color", (token_id,))
+    assert [(*row[:3], int(row[3])) for row in pysql.result] == sorted([(pid, size, color, 3), (*store[1], 1)])
+    pysql.run("SELECT DISTINCT Color FROM InventoryTransactions WHERE ProductID=%s", (pid,))
+    assert [row[0] for row in pysql.result] == [color]
@@ -0,0 +1,82 @@
+# tests/test_id_sequencer.py
+
+import os
+import threading
+
+import pytest
+
+from CmsLib.IdSequencer import IdSequencer
+
+
+def test_values_are_consecutive_within_a_block(pysql):
+    values = [pysql.sequencer.next_value("InvoiceID") for _ in range(120)]
+    assert values == list(range(values[0], values[0] + 120))
+
+
+def test_reserve_never_overlaps_next_value(pysql):
+    first = pysql.sequencer.next_value("TransactionID")
+    reserved = pysql.sequencer.reserve("TransactionID", 1000)
+    later = [pysql.sequencer.next_value("TransactionID") for _ in range(200)]
+    assert first not in reserved
+    assert not set(later) & set(reserved)
+    assert len(set(later)) == len(later)
+
+
+def test_blocks_do_not_use_request_pool_slots(pysql):
+    pysql.init()        # this thread holds the only slot it needs
+    before = pysql.pool_stats()["checkouts"]
+    for _ in range(3 * pysql.sequencer.block_size):
+        pysql.sequencer.next_value("OrderID")
+    assert pysql.pool_stats()["checkouts"] == before
+
+
+def test_threads_never_share_a_value(pysql):
+    results = []
+
+    def take():
+        results.extend(pysql.sequencer.next_value("InvoiceID") for _ in range(300))
+
+    threads = [threading.Thread(target=take) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(results)) == len(results) == 1200
+
+
+def test_failed_reservation_reconnects(pysql, fail_once):
+    import sqlite3
+    fail_once("UPDATE Sequences", sqlite3.OperationalError("database is locked"))
+    with pytest.raises(RuntimeError):
+        pysql.sequencer.next_value("InvoiceID")
+    assert pysql.sequencer.next_value("InvoiceID") >= 0
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_workers_never_share_a_value(tmp_path, pysql_file):
+    pysql = pysql_file(tmp_path / "ids.sqlite")
+    parent = [pysql.sequencer.next_value("InvoiceID") for _ in range(10)]
+    readers = []
+    for _ in range(3):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(read_fd)
+                values = [pysql.sequencer.next_value("InvoiceID") for _ in range(120)]
+                os.write(write_fd, " ".join(map(str, values)).encode())
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        readers.append((pid, read_fd))
+
+    children = []
+    for pid, read_fd in readers:
+        with os.fdopen(read_fd) as pipe:
+            children.append([int(value) for value in pipe.read().split()])
+        os.waitpid(pid, 0)
+    parent += [pysql.sequencer.next_value("InvoiceID") for _ in range(60)]
+
+    every = parent + [value for values in children for value in values]
+    assert [len(values) for values in children] == [120, 120, 120]
+    assert len(set(every)) == len(every)
@@ -0,0 +1,51 @@
+# tests/test_invoice_manager.py
+
+from decimal import Decimal
+
+from CmsLib.CounterManager import CounterManager
+from CmsLib.InvoiceManager import InvoiceManager
+from CmsLib.TokenManager import TokenManager
+
+
+def fill_token(pysql, items):
+    token_id = TokenManager.get_token(pysql)
+    assert CounterManager.add_items_to_token(pysql, token_id, items) == 0
+    return token_id
+
+
+def test_generate_invoice_combines_tokens_and_clears_them(pysql, store):
+    first = fill_token(pysql, [(*store[0], 2)])
+    second = fill_token(pysql, [(*store[0], 1), (*store[1], 1)])
+
+    invoice_id = InvoiceManager.generate_invoice(pysql, [first, second], "cash")
+    assert invoice_id.startswith("INV-")
+    header, lines = InvoiceManager.get_invoice_details(pysql, invoice_id)
+    assert sorted((line[0], line[2], int(line[4])) for line in lines) == sorted([
+        (store[0][0], store[0][1], 3), (store[1][0], store[1][1], 1)])
+    # 4 x 1800 less 5 %, plus 13 % VAT
+    assert Decimal(header[2]) == Decimal("7729.20")
+
+    pysql.run("SELECT COUNT(*) FROM TokensSelectProducts WHERE TokenID IN %s", ((first, second),))
+    assert pysql.scalar_result == 0
+    assert InvoiceManager.generate_invoice(pysql, [first], "cash") == 1
+
+
+def test_generate_invoice_rejects_bad_payment_mode_without_changes(pysql, store):
+    token_id = fill_token(pysql, [(*store[2], 1)])
+    assert InvoiceManager.generate_invoice(pysql, [token_id], "cheque") == 3
+    pysql.run("SELECT COUNT(*) FROM TokensSelectProducts WHERE TokenID = %s", (token_id,))
+    assert pysql.scalar_result == 1
+
+
+def test_iter_invoice_lines_pages_past_invoices_without_lines(pysql, store):
+    first = InvoiceManager.generate_invoice(pysql, [fill_token(pysql, [(*store[0], 1)])], "cash")
+    second = InvoiceManager.generate_invoice(pysql, [fill_token(pysql, [(*store[1], 1), (*store[2], 1)])], "cash")
+    # Newer invoices without lines fill the first pages
+    pysql.run_many("INSERT INTO Invoices (InvoiceID, InvoiceDate, InvoiceTotal, DiscountGiven, PaymentMode) "
+                   "VALUES (%s, CURRENT_TIMESTAMP, 0, 0, 'cash')",
+                   [(f"INV-{number:010d}",) for number in range(9000000000, 9000000005)])
+    pysql.commit()
+
+    lines = list(InvoiceManager.iter_invoice_lines(pysql, page_size=2))
+    assert [line[0] for line in lines] == [second, second, first]
+    assert InvoiceManager.get_invoice_lines_page(pysql, page_size=2) == []
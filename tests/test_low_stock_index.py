@@ -0,0 +1,31 @@
+# tests/test_low_stock_index.py
+
+import pytest
+
+from CmsLib.InventoryManager import InventoryManager
+
+
+def test_rollback_discards_pending_touches(pysql, store):
+    InventoryManager.get_low_stock_notifications(pysql)
+
+    def touch_and_fail(pysql):
+        pysql.run("UPDATE Inventory SET StoredQuantity = 0 WHERE ProductID=%s AND Size=%s AND Color=%s", store[0])
+        pysql.low_stock.touch([store[0]])
+        raise ValueError("rejected")
+
+    with pytest.raises(RuntimeError):
+        pysql.run_transaction(touch_and_fail)
+    assert pysql.low_stock.take_touched() == []
+
+    def touch_and_roll_back(pysql):
+        pysql.low_stock.touch([store[1]])
+        pysql.rollback()
+
+    pysql.run_transaction(touch_and_roll_back)
+    assert pysql.low_stock.take_touched() == []
+
+
+def test_committed_touches_reach_the_index(pysql, store):
+    assert InventoryManager.get_low_stock_notifications(pysql) == []
+    assert InventoryManager.sub_product_from_inventory(pysql, *store[0], 45) == 0
+    assert [(row[0], row[2], row[3]) for row in pysql.low_stock.rows()] == [store[0]]
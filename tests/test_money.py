@@ -0,0 +1,84 @@
+# tests/test_money.py
+#
+# The integer money engine must price every line exactly as the Decimal
+# code it replaced: same value, same exponent, ROUND_HALF_UP throughout.
+
+import random
+from decimal import Decimal
+
+import pytest
+
+from CmsLib import Money
+from CmsLib.Money import (price_line, price_line_decimal, price_lines, from_paisa, to_minor, div_half_up,
+                          QUANTITY_PLACES, PRICE_PLACES, DISCOUNT_PLACES)
+
+
+def boundary_corpus():
+    corpus = []
+    for quantity in ("0.001", "0.005", "1", "1.5", "2.345", "999999.999"):
+        for unit_price in ("0.001", "0.005", "0.015", "1450", "1800.005", "999999.999"):
+            for discount in ("0", "0.01", "0.5", "5", "12.5", "33.33", "99.99"):
+                corpus.append((Decimal(quantity), Decimal(unit_price), Decimal(discount)))
+    return corpus
+
+
+def random_corpus(samples, seed=13):
+    rng = random.Random(seed)
+    return [(Decimal(rng.randint(1, 50000)).scaleb(-QUANTITY_PLACES),
+             Decimal(rng.randint(1, 10 ** 8)).scaleb(-PRICE_PLACES),
+             Decimal(rng.randint(0, 9999)).scaleb(-DISCOUNT_PLACES))
+            for _ in range(samples)]
+
+
+def assert_matches_decimal(line, result):
+    expected = price_line_decimal(*line)
+    amounts = tuple(from_paisa(paisa) for paisa in result)
+    # Same value and same exponent; Decimal's -0.00 (a line discounted below
+    # zero) has no integer form and compares equal to 0.00
+    assert amounts == expected, line
+    assert [a.as_tuple().exponent for a in amounts] == [e.as_tuple().exponent for e in expected], line
+
+
+@pytest.mark.parametrize("numerator, denominator, expected", [
+    (5, 10, 1), (4, 10, 0), (15, 10, 2), (-5, 10, -1), (-4, 10, 0), (-15, 10, -2), (0, 7, 0)])
+def test_div_half_up_rounds_halves_away_from_zero(numerator, denominator, expected):
+    assert div_half_up(numerator, denominator) == expected
+
+
+def test_to_minor_is_exact():
+    assert to_minor(Decimal("1.005"), 3) == 1005
+    assert to_minor(2, 2) == 200
+    assert to_minor("12.5", 2) == 1250
+    with pytest.raises(ValueError):
+        to_minor(Decimal("1.0005"), 3)
+
+
+def test_price_line_matches_decimal_on_boundaries():
+    for line in boundary_corpus():
+        assert_matches_decimal(line, price_line(*line))
+
+
+def test_price_line_matches_decimal_on_random_lines():
+    for line in random_corpus(20000):
+        assert_matches_decimal(line, price_line(*line))
+
+
+def test_price_line_falls_back_for_raw_floats():
+    line = (1, 0.1 + 0.2, 0)
+    assert price_line(*line) == tuple(to_minor(amount, 2) for amount in price_line_decimal(*line))
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_price_lines_matches_price_line(monkeypatch, use_numpy):
+    if use_numpy and Money.numpy is None:
+        pytest.skip("numpy is not installed")
+    if not use_numpy:
+        monkeypatch.setattr(Money, "numpy", None)
+    # Small enough for int64 throughout, so NumPy prices the whole batch
+    corpus = [line for line in boundary_corpus() if line[0] < 1000] + random_corpus(5000, seed=17)
+    assert price_lines(corpus) == [price_line(*line) for line in corpus]
+
+
+def test_price_lines_falls_back_near_int64_limits():
+    corpus = boundary_corpus()
+    assert price_lines(corpus) == [price_line(*line) for line in corpus]
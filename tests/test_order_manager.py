@@ -0,0 +1,40 @@
+# tests/test_order_manager.py
+
+from CmsLib.OrderManager import OrderManager
+
+
+def order_lines(pysql, order_id):
+    pysql.run("SELECT ProductID, Size, Color, Quantity FROM OrdersOfProducts WHERE OrderID=%s "
+              "ORDER BY ProductID, Size, Color", (order_id,))
+    return [(pid, size, color, int(qty)) for pid, size, color, qty in pysql.result]
+
+
+def test_bulk_order_merges_keys_as_the_collation_does(pysql, store):
+    (pid, size, color), other = store[0], store[1]
+    order_id = OrderManager.place_orders_bulk(
+        pysql, [(pid, size, color, 2), (pid, size, color.upper(), 3), (pid.lower(), size, f" {color.lower()} ", 1),
+                (*other, 4)], chunk_size=2)
+    assert isinstance(order_id, str)
+    assert order_lines(pysql, order_id) == sorted([(pid, size, color, 6), (*other, 4)])
+
+
+def test_bulk_order_rejects_unknown_products(pysql, store):
+    assert OrderManager.place_orders_bulk(pysql, [(*store[0], 1), ("ZZZ-999", "S", "Red", 1)]) == 1
+    pysql.run("SELECT COUNT(*) FROM Orders")
+    assert pysql.scalar_result == 1     # only the store fixture's order
+
+
+def test_order_merges_repeated_lines(pysql, store):
+    pid, size, color = store[0]
+    order_id = OrderManager.place_order(pysql, [(pid, size, color, 1), (pid, size, color, 2)])
+    assert order_lines(pysql, order_id) == [(pid, size, color, 3)]
+
+
+def test_receipt_rejects_malformed_and_non_finite_quantities(pysql, store):
+    order_id = OrderManager.place_order(pysql, [(*store[0], 5)])
+    for quantity in ("abc", "NaN", "Infinity", "0"):
+        assert OrderManager.receive_order(pysql, order_id, [(*store[0], quantity)]) == 6
+    assert OrderManager.receive_order(pysql, order_id, [(*store[0], "2")]) == 0
+    assert order_lines(pysql, order_id) == [(*store[0], 5)]
+    pysql.run("SELECT ReceivedQuantity FROM OrdersOfProducts WHERE OrderID=%s", (order_id,))
+    assert int(pysql.scalar_result) == 2
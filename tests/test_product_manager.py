@@ -0,0 +1,35 @@
+# tests/test_product_manager.py
+
+from CmsLib.ProductManager import ProductManager, variant_key
+
+
+def row(product_id, size="S", color="Red"):
+    return (product_id, "Kurti", "Cotton", "1800.00", size, color, "5")
+
+
+def product_keys(pysql):
+    pysql.run("SELECT ProductID, Size, Color FROM Products ORDER BY ProductID, Size, Color")
+    return [tuple(key) for key in pysql.result]
+
+
+def test_variant_key_ignores_case_and_accents():
+    assert variant_key("KUR-001", "S", "Red") == variant_key("KUR-001", "S", "RED")
+    assert variant_key("KUR-001", "S", "Beige") == variant_key("KUR-001", "S", "Beigé")
+    assert variant_key("KUR-001", "S", "Red") != variant_key("KUR-001", "M", "Red")
+
+
+def test_duplicate_in_chunk_is_reported_per_row(pysql):
+    report = ProductManager.add_products_bulk(
+        pysql, [row("KUR-001"), row("KUR-001", color="red"), row("KUR-002")], chunk_size=10)
+    assert report == {"imported": 2, "errors": [(2, 1)]}
+    assert product_keys(pysql) == [("KUR-001", "S", "Red"), ("KUR-002", "S", "Red")]
+
+
+def test_rejected_chunk_keeps_its_good_rows(pysql):
+    pysql.run("CREATE TRIGGER reject_bad BEFORE INSERT ON Products WHEN NEW.ProductID = 'BAD-001' "
+              "BEGIN SELECT RAISE(ABORT, 'rejected'); END")
+    pysql.commit()
+    report = ProductManager.add_products_bulk(
+        pysql, [row("KUR-001"), row("BAD-001"), row("KUR-002"), row("KUR-003")], chunk_size=10)
+    assert report == {"imported": 3, "errors": [(2, 6)]}
+    assert product_keys(pysql) == [("KUR-001", "S", "Red"), ("KUR-002", "S", "Red"), ("KUR-003", "S", "Red")]
@@ -0,0 +1,205 @@
+# tests/test_pysql.py
+#
+# Statement retries and units of work on the embedded SQLite backend.
+
+import sqlite3
+
+import pytest
+
+
+def tokens(pysql):
+    pysql.run("SELECT TokenID, Assigned FROM Tokens ORDER BY TokenID")
+    return [(token_id, bool(assigned)) for token_id, assigned in pysql.result]
+
+
+def add_tokens(pysql, *token_ids):
+    pysql.run_many("INSERT INTO Tokens (TokenID) VALUES (%s)", [(token_id,) for token_id in token_ids])
+    pysql.commit()
+
+
+def assign_and_add(pysql):
+    pysql.run("UPDATE Tokens SET Assigned = TRUE WHERE TokenID = %s", ("TOK-01",))
+    pysql.run("INSERT INTO Tokens (TokenID) VALUES (%s)", ("TOK-02",))
+    return 0
+
+
+# ---------- RETRIES ----------
+
+def test_lost_connection_outside_a_transaction_is_retried(pysql, fail_once):
+    add_tokens(pysql, "TOK-01")
+    fail_once("SELECT TokenID", sqlite3.InterfaceError("connection lost"))
+    assert tokens(pysql) == [("TOK-01", False)]
+
+
+def test_lost_connection_is_retried_only_once(pysql, fail_once):
+    fail_once("SELECT TokenID", sqlite3.InterfaceError("connection lost"))
+    fail_once("SELECT TokenID", sqlite3.InterfaceError("connection lost again"))
+    with pytest.raises(RuntimeError):
+        tokens(pysql)
+    assert tokens(pysql) == []
+
+
+def test_operational_error_outside_a_transaction_is_not_retried(pysql, fail_once):
+    fail_once("SELECT TokenID", sqlite3.OperationalError("near SELECT: syntax error"))
+    with pytest.raises(RuntimeError):
+        tokens(pysql)
+    assert tokens(pysql) == []
+
+
+@pytest.mark.parametrize("error", [sqlite3.OperationalError("database is locked"),
+                                   sqlite3.InterfaceError("connection lost")])
+def test_error_inside_a_transaction_rolls_back_the_whole_unit(pysql, fail_once, error):
+    add_tokens(pysql, "TOK-01")
+    fail_once("INSERT INTO Tokens", error)
+    with pytest.raises(RuntimeError):
+        pysql.run_transaction(assign_and_add)
+    pysql.release()
+    assert tokens(pysql) == [("TOK-01", False)]
+
+
+def test_swallowed_error_does_not_commit_the_rest_of_the_unit(pysql, fail_once):
+    add_tokens(pysql, "TOK-01")
+
+    def careless(pysql):
+        pysql.run("UPDATE Tokens SET Assigned = TRUE WHERE TokenID = %s", ("TOK-01",))
+        try:
+            pysql.run("INSERT INTO Tokens (TokenID) VALUES (%s)", ("TOK-02",))
+        except RuntimeError:
+            pass
+        return 0
+
+    fail_once("INSERT INTO Tokens", sqlite3.OperationalError("database is locked"))
+    with pytest.raises(RuntimeError):
+        pysql.run_transaction(careless)
+    pysql.release()
+    assert tokens(pysql) == [("TOK-01", False)]
+    # The next unit of work on this thread starts clean
+    assert pysql.run_transaction(assign_and_add) == 0
+    assert tokens(pysql) == [("TOK-01", True), ("TOK-02", False)]
+
+
+
+def test_swallowed_bulk_error_does_not_commit_the_rest_of_the_unit(pysql, fail_once):
+    add_tokens(pysql, "TOK-01")
+
+    def careless(pysql):
+        pysql.run("UPDATE Tokens SET Assigned = TRUE WHERE TokenID = %s", ("TOK-01",))
+        try:
+            pysql.run_many("INSERT INTO Tokens (TokenID) VALUES (%s)", [("TOK-02",), ("TOK-03",)])
+        except RuntimeError:
+            pass
+        return 0
+
+    fail_once("INSERT INTO Tokens", sqlite3.OperationalError("database is locked"))
+    with pytest.raises(RuntimeError):
+        pysql.run_transaction(careless)
+    pysql.release()
+    assert tokens(pysql) == [("TOK-01", False)]
+    assert pysql.run_transaction(assign_and_add) == 0
+    assert tokens(pysql) == [("TOK-01", True), ("TOK-02", False)]
+
+# ---------- NESTED UNITS OF WORK ----------
+
+def test_nested_unit_rolls_back_to_its_savepoint(pysql):
+    add_tokens(pysql, "TOK-01")
+
+    def inner(pysql):
+        pysql.run("INSERT INTO Tokens (TokenID) VALUES (%s)", ("TOK-02",))
+        pysql.rollback()
+        return 1
+
+    def outer(pysql):
+        pysql.run("UPDATE Tokens SET Assigned = TRUE WHERE TokenID = %s", ("TOK-01",))
+        assert pysql.run_transaction(inner) == 1
+        pysql.run("INSERT INTO Tokens (TokenID) VALUES (%s)", ("TOK-03",))
+        return 0
+
+    assert pysql.run_transaction(outer) == 0
+    assert tokens(pysql) == [("TOK-01", True), ("TOK-03", False)]
+
+
+def test_nested_unit_commits_only_with_the_outer_unit(pysql):
+    def inner(pysql):
+        pysql.run("INSERT INTO Tokens (TokenID) VALUES (%s)", ("TOK-02",))
+        return 0
+
+    def outer(pysql, fail):
+        pysql.run("INSERT INTO Tokens (TokenID) VALUES (%s)", ("TOK-01",))
+        assert pysql.run_transaction(inner) == 0
+        if fail:
+            raise ValueError("outer unit failed after the inner one")
+        return 0
+
+    with pytest.raises(RuntimeError):
+        pysql.run_transaction(outer, True)
+    assert tokens(pysql) == []
+    assert pysql.run_transaction(outer, False) == 0
+    assert tokens(pysql) == [("TOK-01", False), ("TOK-02", False)]
+
+
+def test_nested_unit_error_undoes_only_its_statements(pysql):
+    def inner(pysql):
+        pysql.run("INSERT INTO Tokens (TokenID) VALUES (%s)", ("TOK-02",))
+        raise ValueError("bad scan")
+
+    def outer(pysql):
+        pysql.run("INSERT INTO Tokens (TokenID) VALUES (%s)", ("TOK-01",))
+        with pytest.raises(ValueError):
+            pysql.run_transaction(inner)
+        return 0
+
+    assert pysql.run_transaction(outer) == 0
+    assert tokens(pysql) == [("TOK-01", False)]
+
+
+def test_rollback_in_a_commit_false_unit_raises_and_commits_nothing(pysql):
+    def inner(pysql):
+        pysql.run("INSERT INTO Tokens (TokenID) VALUES (%s)", ("TOK-02",))
+        pysql.rollback()
+
+    def outer(pysql):
+        pysql.run("INSERT INTO Tokens (TokenID) VALUES (%s)", ("TOK-01",))
+        pysql.run_transaction(inner, commit=False)
+        pysql.run("INSERT INTO Tokens (TokenID) VALUES (%s)", ("TOK-03",))
+        return 0
+
+    with pytest.raises(RuntimeError):
+        pysql.run_transaction(outer)
+    assert tokens(pysql) == []
+
+
+def test_commit_false_unit_inside_a_savepoint_cannot_roll_it_back(pysql):
+    def reader(pysql):
+        pysql.rollback()
+
+    def middle(pysql):
+        pysql.run("INSERT INTO Tokens (TokenID) VALUES (%s)", ("TOK-02",))
+        pysql.run_transaction(reader, commit=False)
+
+    def outer(pysql):
+        pysql.run("INSERT INTO Tokens (TokenID) VALUES (%s)", ("TOK-01",))
+        with pytest.raises(RuntimeError):
+            pysql.run_transaction(middle)
+        return 0
+
+    assert pysql.run_transaction(outer) == 0
+    assert tokens(pysql) == [("TOK-01", False)]
+
+
+def test_lost_connection_in_a_nested_unit_aborts_the_outer_unit(pysql, fail_once):
+    def inner(pysql):
+        pysql.run("INSERT INTO Tokens (TokenID, Assigned) VALUES (%s, TRUE)", ("TOK-02",))
+
+    def outer(pysql):
+        pysql.run("INSERT INTO Tokens (TokenID) VALUES (%s)", ("TOK-01",))
+        try:
+            pysql.run_transaction(inner)
+        except RuntimeError:
+            pass
+        return 0
+
+    fail_once("Assigned) VALUES", sqlite3.InterfaceError("connection lost"))
+    with pytest.raises(RuntimeError):
+        pysql.run_transaction(outer)
+    pysql.release()
+    assert tokens(pysql) == []
@@ -0,0 +1,45 @@
+# tests/test_request_profiler.py
+import os
+
+from flask import Flask
+
+from CmsLib.PySql import PySql
+from CmsLib.QueryStats import QueryStats
+from CmsLib.RequestProfiler import RequestProfiler
+
+YAML_PATH = os.path.join(os.path.dirname(__file__), "..", "CmsLib", "db.yaml")
+ARM = "SELECT %s AS ProductID"
+
+
+class Lookup:
+    @staticmethod
+    def __batches(pysql):
+        for count in range(1, 7):
+            pysql.run(" UNION ALL ".join([ARM] * count), tuple(range(count)))
+
+    @staticmethod
+    def batches(pysql):
+        return pysql.run_transaction(Lookup.__batches, commit=False)
+
+
+def test_union_all_batches_share_a_fingerprint():
+    assert QueryStats.fingerprint(ARM) != QueryStats.fingerprint(" UNION ALL ".join([ARM] * 2))
+    assert QueryStats.fingerprint(" UNION ALL ".join([ARM] * 2)) == \
+        QueryStats.fingerprint(" UNION ALL ".join([ARM] * 40))
+
+
+def test_n_plus_one_label_is_method_and_hash():
+    app = Flask(__name__)
+    db = PySql(app, YAML_PATH, {"backend": "sqlite", "sqlite_path": ":memory:", "slow_query_log": None})
+    profiler = RequestProfiler(app, db)
+    app.add_url_rule("/lookup", "lookup", lambda: str(Lookup.batches(db)))
+
+    for _ in range(3):
+        assert app.test_client().get("/lookup").status_code == 200
+
+    [(route, statement, fingerprint, requests)] = profiler.n_plus_one_report()
+    assert (route, requests) == ("lookup", 3)
+    assert statement.startswith("Lookup.__batches#") and len(statement.split("#")[1]) == 8
+    assert fingerprint.endswith("UNION ALL ...")
+    assert f'statement="{statement}"' in profiler.render()
+    db.close()
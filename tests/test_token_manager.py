@@ -0,0 +1,28 @@
+# tests/test_token_manager.py
+
+from CmsLib.CounterManager import CounterManager
+from CmsLib.TokenManager import TokenManager
+
+
+def test_dashboard_reads_see_writes_from_other_processes(pysql, store):
+    filled = TokenManager.get_token(pysql)
+    empty = TokenManager.get_token(pysql)
+    assert CounterManager.add_items_to_token(pysql, filled, [(*store[0], 2)]) == 0
+    # Warm this process's in-memory feed model, then change a token behind
+    # its back the way another worker would
+    TokenManager.get_token_feed_snapshot(pysql)
+    pysql.run("INSERT INTO TokensSelectProducts (TokenID, ProductID, Quantity, Size, Color) "
+              "VALUES (%s, %s, 1, %s, %s)", (empty, *store[1]))
+    pysql.commit()
+
+    assert TokenManager.get_pending_tokens(pysql) == [filled, empty]
+    assert TokenManager.get_empty_tokens(pysql) == []
+    assert [row[0] for row in TokenManager.get_assigned_products(pysql)] == [filled, empty]
+    statuses = dict(TokenManager.get_all_tokens_status(pysql))
+    assert statuses[filled] and statuses[empty]
+
+
+def test_empty_tokens_are_assigned_tokens_without_products(pysql, store):
+    token_id = TokenManager.get_token(pysql)
+    assert TokenManager.get_empty_tokens(pysql) == [token_id]
+    assert TokenManager.get_pending_tokens(pysql) == []
@@ -0,0 +1,111 @@
+# tests/test_transaction_log.py
+
+from datetime import datetime
+
+import pytest
+
+from CmsLib.ProductManager import ProductManager
+from CmsLib.TransactionLog import TransactionLog
+
+
+@pytest.fixture
+def product(pysql):
+    assert ProductManager.add_product(pysql, "KUR-001", "Kurti", "Cotton", 1800.0, "M", "Red", 0) == 0
+    return "KUR-001", "M", "Red"
+
+
+def log_moves(pysql, product, count):
+    def move(pysql):
+        pysql.transaction_log.append(
+            [(f"TRC-{pysql.sequencer.next_value('TransactionID'):010d}", "INVENTORY_ADD", *product, 1)
+             for _ in range(count)])
+        return 0
+    return pysql.run_transaction(move)
+
+
+def logged(pysql):
+    pysql.run("SELECT TransactionID, Timestamp FROM InventoryTransactions ORDER BY TransactionID")
+    rows = pysql.result
+    pysql.release()
+    return rows
+
+
+def database_now(pysql):
+    pysql.run("SELECT CURRENT_TIMESTAMP")
+    now = pysql.scalar_result
+    pysql.release()
+    return now if isinstance(now, datetime) else datetime.fromisoformat(now)
+
+
+def assert_near(timestamp, now):
+    timestamp = timestamp if isinstance(timestamp, datetime) else datetime.fromisoformat(timestamp)
+    assert abs((timestamp - now).total_seconds()) < 5
+
+
+def test_rows_are_written_at_commit_with_the_database_clock(pysql, product):
+    assert log_moves(pysql, product, 3) == 0
+    rows = logged(pysql)
+    assert len(rows) == 3
+    now = database_now(pysql)
+    for _, timestamp in rows:
+        assert_near(timestamp, now)
+
+
+def test_rolled_back_rows_are_dropped(pysql, product):
+    def fail(pysql):
+        log_moves(pysql, product, 2)
+        raise ValueError("checkout abandoned")
+
+    with pytest.raises(RuntimeError):
+        pysql.run_transaction(fail)
+    assert logged(pysql) == ()
+
+
+def test_background_writer_survives_connect_failures(pysql, product):
+    attempts = []
+
+    def flaky_connect():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("Timed out waiting for a database connection")
+        return pysql.backend.connect()
+
+    pysql.transaction_log = TransactionLog(flaky_connect, background=True)
+    assert log_moves(pysql, product, 4) == 0
+    pysql.transaction_log.close()
+    assert pysql.transaction_log.stats()["written"] == 4
+    rows = logged(pysql)
+    assert len(rows) == 4
+    now = database_now(pysql)
+    for _, timestamp in rows:
+        assert_near(timestamp, now)
+
+
+def test_background_writer_counts_rows_it_cannot_write(pysql, product):
+    def broken_connect():
+        raise RuntimeError("Timed out waiting for a database connection")
+
+    pysql.transaction_log = TransactionLog(broken_connect, background=True, retries=2)
+    assert log_moves(pysql, product, 2) == 0
+    assert log_moves(pysql, product, 1) == 0
+    pysql.transaction_log.close()
+    assert pysql.transaction_log.stats()["failed"] == 3
+    assert logged(pysql) == ()
+
+
+def test_log_transaction_checks_type_variant_and_quantity_in_its_unit(pysql, product):
+    from CmsLib.InventoryManager import InventoryManager
+    from CmsLib.QueryPlan import QueryRegistry
+    missing = ("KUR-002", "M", "Red")
+    assert InventoryManager.log_transaction(pysql, "BOGUS", *missing, 1) == 1
+    assert InventoryManager.log_transaction(pysql, "INVENTORY_ADD", *missing, 1) == 2
+    assert InventoryManager.log_transaction(pysql, "INVENTORY_ADD", *product, 0) == 3
+    assert len(logged(pysql)) == 0
+
+    registry = pysql.query_registry = QueryRegistry()
+    assert InventoryManager.log_transaction(pysql, "INVENTORY_ADD", *product, 2) == 0
+    pysql.query_registry = None
+    assert len(logged(pysql)) == 1
+    # The existence check runs inside the unit of work that writes the row
+    [lookup] = [entry for entry in registry.statements() if "FROM Inventory" in entry["sql"]]
+    assert lookup["callers"] == ["InventoryManager.__log_checked_transaction"]